@@ -1,629 +1,176 @@
-﻿from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+﻿from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response
+from jinja2 import FileSystemBytecodeCache
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import os, json
+from concurrent.futures import TimeoutError as RenderTimeout
 from datetime import datetime
 import sqlite3
 import logging
 import random
 import base64
+import hmac
+from storage import JsonStore, VersionCounter
+from sharding import ShardedStore
+from changefeed import ChangeFeed
+from outbox import Outbox, decode_batch
+from notifications import Notifications, Channel, stand_in
+from prescriptions import Prescriptions
+from identity import Identities, link_records
+from archive import Archive
+from records import Patient, Animal, DietEntry
+import i18n
+import config
+import httpcache
+import fragments
+import assets
+import bulk
+import housekeeping
+import metrics
+import profiler
+import printing
+import timeline
+import prescriptions
+from scheduler import Scheduler, Job, RequestGauge, parse_window
+from httpcache import conditional
 
 app = Flask(__name__)
 app.secret_key = "healthkiosk_secret_key_2024"
+app.config['TEMPLATES_AUTO_RELOAD'] = not config.PRODUCTION
+if config.TEMPLATE_CACHE_DIR:
+    os.makedirs(config.TEMPLATE_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(config.TEMPLATE_CACHE_DIR)
 socketio = SocketIO(app, 
                    cors_allowed_origins="*",
                    async_mode='threading',
                    logger=True,
                    engineio_logger=True)
 
+# Socket emits and room joins go through these, so /metrics can time and count them
+def broadcast(event, *args, **kwargs):
+    """``socketio.emit``, usable outside Socket.IO handlers"""
+    return metrics.timed_emit(socketio.emit, event, *args, **kwargs)
+
+def reply(event, *args, **kwargs):
+    """``flask_socketio.emit`` from inside a Socket.IO handler"""
+    return metrics.timed_emit(emit, event, *args, **kwargs)
+
+def join(room):
+    join_room(room)
+    metrics.ROOMS.joined(request.sid, room)
+
 # Data storage
 PATIENTS_FILE = "patients_data.json"
 ANIMALS_FILE = "animals_data.json"
 BALANCE_DIET_FILE = "balance_diet_data.json"
+PATIENTS_SHARDS = "patients_shards"
+ANIMALS_SHARDS = "animals_shards"
+
+# Patients are sharded by city and animals by village, one file per region
+PATIENTS = ShardedStore(PATIENTS_SHARDS, 'city', record_class=Patient, workers=config.SHARD_WORKERS)
+ANIMALS = ShardedStore(ANIMALS_SHARDS, 'village', record_class=Animal, workers=config.SHARD_WORKERS)
+BALANCE_DIET = JsonStore(BALANCE_DIET_FILE, record_class=DietEntry)
+# Single-file stores from before sharding are split up on first start
+PATIENTS.migrate(PATIENTS_FILE)
+ANIMALS.migrate(ANIMALS_FILE)
+metrics.instrument_store(PATIENTS, 'patients')
+metrics.instrument_store(ANIMALS, 'animals')
+metrics.instrument_store(BALANCE_DIET, 'balance_diet')
+PATIENTS.add_listener(fragments.on_store_commit)
+ANIMALS.add_listener(fragments.on_store_commit)
+
+# Dashboard change streams: store, card fragment (id/record variable names) and the room told about changes
+CHANGE_STREAMS = {
+    'patients': (PATIENTS, 'fragments/doctor_patient_card.html', 'pid', 'pdata', 'doctors'),
+    'animals': (ANIMALS, 'fragments/veterinarian_animal_card.html', 'aid', 'adata', 'veterinarians'),
+}
+CHANGES = ChangeFeed(connection_factory=metrics.TimedConnection)
 
-def load_patients():
-    try:
-        if os.path.exists(PATIENTS_FILE):
-            with open(PATIENTS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except:
-        return {}
+def announce_changes(stream, seq):
+    broadcast('records_changed', {'stream': stream, 'seq': seq}, room=CHANGE_STREAMS[stream][4])
+
+CHANGES.watch(PATIENTS, 'patients', on_change=announce_changes)
+CHANGES.watch(ANIMALS, 'animals', on_change=announce_changes)
+CHANGES.watch(BALANCE_DIET, 'diets')
+
+# Cold storage for records the archive jobs moved out of the stores
+ARCHIVE = Archive()
+
+# Kiosk mode: submissions and chat messages are also queued for the central server
+OUTBOX = Outbox(kiosk_id=config.KIOSK_ID) if config.CENTRAL_URL else None
+
+# Submission and prescription notifications are queued in healthcare.db and
+# emitted by a background dispatcher, never inline in the request
+NOTIFICATIONS = Notifications()
+NOTIFICATIONS.add_channel(Channel('socket', lambda event, payload: broadcast(event, payload)), (
+    'new_patient_notification', 'new_animal_patient_notification',
+    'prescription_notification', 'animal_prescription_notification'))
+for kind in config.NOTIFY_STAND_INS:
+    NOTIFICATIONS.add_channel(Channel(kind, stand_in(kind), rate=5),
+                              ('prescription_notification', 'animal_prescription_notification'))
+
+# Prescriptions are doctor_records rows plus structured prescription_items;
+# records keep only the prescription_id and the text is rendered on demand
+PRESCRIPTIONS = Prescriptions(connection_factory=metrics.TimedConnection)
+
+# Repeat visits by the same person share a person_id, resolved on submit
+IDENTITIES = Identities(connection_factory=metrics.TimedConnection)
+
+# Printable prescriptions render on their own threads and are cached per slip version
+PRINTER = printing.Printer(app, PRESCRIPTIONS.text, workers=config.PRINT_WORKERS)
+
+def load_patients(region=None):
+    return PATIENTS.records(region)
 
 def save_patients(patients_data):
     try:
-        with open(PATIENTS_FILE, 'w') as f:
-            json.dump(patients_data, f, indent=2)
+        PATIENTS.save(patients_data)
         return True
-    except:
+    except Exception as e:
+        print(f"❌ Error saving patients: {e}")
         return False
 
-def load_animals():
-    try:
-        if os.path.exists(ANIMALS_FILE):
-            with open(ANIMALS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except:
-        return {}
+def load_animals(region=None):
+    return ANIMALS.records(region)
 
 def save_animals(animals_data):
     try:
-        with open(ANIMALS_FILE, 'w') as f:
-            json.dump(animals_data, f, indent=2)
+        ANIMALS.save(animals_data)
         return True
-    except:
+    except Exception as e:
+        print(f"❌ Error saving animals: {e}")
         return False
 
 def load_balance_diet():
-    try:
-        if os.path.exists(BALANCE_DIET_FILE):
-            with open(BALANCE_DIET_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except:
-        return {}
+    return BALANCE_DIET.records()
 
 def save_balance_diet(diet_data):
     try:
-        with open(BALANCE_DIET_FILE, 'w') as f:
-            json.dump(diet_data, f, indent=2)
+        BALANCE_DIET.save(diet_data)
         return True
-    except:
+    except Exception as e:
+        print(f"❌ Error saving balance diet: {e}")
         return False
 
-# Multi-language support
-LANGUAGES = {
-    'en': {
-        'health_kiosk': 'Health Kiosk',
-        'welcome': 'Welcome to Health Kiosk',
-        'complete_form': 'Complete your health form and get instant prescription',
-        'health_assessment': 'Health Assessment',
-        'animal_health': 'Animal Health',
-        'view_history': 'View History',
-        'patient_queue': 'Patient Queue',
-        'chat_with_doctor': 'Chat with Doctor',
-        'emergency_sos': 'Emergency SOS',
-        'your_health_priority': 'Your Health is Our Priority',
-        'english': 'English',
-        'hindi': 'Hindi',
-        'kannada': 'Kannada',
-        # Patient Form
-        'patient_form': 'Patient Health Form',
-        'name': 'Name',
-        'city': 'City',
-        'age': 'Age',
-        'weight': 'Weight (kg)',
-        'bp': 'Blood Pressure',
-        'sugar': 'Sugar Level',
-        'oxygen': 'Oxygen Level',
-        'blood_group': 'Blood Group',
-        'symptoms': 'Symptoms',
-        'submit': 'Submit',
-        'fill_all_fields': 'Please fill all fields!',
-        'submitted_success': 'Submitted successfully!',
-        # Animal Form
-        'animal_form': 'Animal Health Form',
-        'owner_name': 'Owner Name',
-        'animal_type': 'Animal Type',
-        'animal_name': 'Animal Name',
-        'gender': 'Gender',
-        'breed': 'Breed',
-        'condition': 'Condition',
-        'village': 'Village',
-        'contact': 'Contact Number',
-        'describe_symptoms': 'Describe the animal\'s symptoms in detail...',
-        'submit_animal_form': 'Submit Animal Health Form',
-        'check_prescription_status': 'Check Prescription Status',
-        'back_to_home': 'Back to Home',
-        'male': 'Male',
-        'female': 'Female',
-        'other': 'Other',
-        'select_animal_type': 'Select Animal Type',
-        'select_gender': 'Select Gender',
-        'select_condition': 'Select Condition',
-        # Doctor/Veterinarian
-        'doctor_dashboard': 'Doctor Dashboard',
-        'veterinarian_dashboard': 'Veterinarian Dashboard',
-        'welcome_doctor': 'Welcome, Dr. {}',
-        'animal_patients': 'Animal Patients',
-        'search_placeholder': 'Search by Animal ID, Name, Owner...',
-        'search': 'Search',
-        'clear': 'Clear',
-        'total_animals': 'Total Animals',
-        'write_prescription': 'Write Prescription',
-        'update_prescription': 'Update Prescription',
-        'prescription_details': 'Prescription Details',
-        'submit_prescription': 'Submit Prescription',
-        'back_to_dashboard': 'Back to Dashboard',
-        # Login
-        'doctor_login': 'Doctor Login',
-        'access_medical_dashboard': 'Access Medical Dashboard',
-        'login_instructions': 'Login Instructions',
-        'human_doctor_access': 'Access human patient dashboard',
-        'veterinarian_access': 'Access animal patient dashboard',
-        'username': 'Username',
-        'password': 'Password',
-        'login': 'Login',
-        'back_to_patient_portal': 'Back to Patient Portal',
-        'language': 'Language',
-        'manage_all_animals': 'Manage all animals',
-        'view_all_records': 'View all records',
-        'chat_with_owners': 'Chat with owners',
-        'end_session': 'End session',
-        'owner': 'Owner',
-        'no_animal_patients': 'No Animal Patients Found',
-        'no_matching_animals': 'No animal patients match your search criteria.',
-        'no_animals_waiting': 'There are no animal patients waiting for consultation yet.',
-        'view_all_animals': 'View All Animals',
-        'print': 'Print',
-        # Chat & Queue
-        'patient_chat': 'Patient Chat',
-        'chat_with_doctors': 'Chat with Doctors',
-        'type_message': 'Type your message...',
-        'send': 'Send',
-        'patient_queue': 'Patient Queue',
-        'waiting_patients': 'Waiting Patients',
-        'patient_id': 'Patient ID',
-        'patient_name': 'Patient Name',
-        'submission_time': 'Submission Time',
-        'status': 'Status',
-        'waiting': 'Waiting',
-        'prescribed': 'Prescribed',
-        'no_patients_waiting': 'No patients currently waiting',
-        'your_chat_id': 'Your Chat ID',
-        'start_chat': 'Start Chat',
-        'no_chat_selected': 'No chat selected',
-        # Chat specific translations
-        'chat_with_vet': 'Chat with Veterinarian',
-        'chat_with_doctor': 'Chat with Doctor',
-        'chat_with_patient': 'Chat with Patient',
-        'select_vet': 'Select Veterinarian',
-        'select_doctor': 'Select Doctor',
-        'enter_animal_id': 'Enter Animal ID',
-        'enter_patient_id': 'Enter Patient ID',
-        'select_vet_and_animal': 'Select a veterinarian and enter animal ID to start chatting',
-        'select_doctor_and_patient': 'Select a doctor and enter patient ID to start chatting',
-        'select_patient_to_chat': 'Select a patient from the list to start chatting',
-        'send_message': 'Send',
-        'take_photo': 'Take Photo',
-        'retake': 'Retake',
-        'send_photo': 'Send Photo',
-        'cancel': 'Cancel',
-        'capture': 'Capture',
-        'photo_attached': 'Photo attached',
-        'photo_sent': 'Photo sent',
-        'camera_error': 'Camera access denied or not available',
-        'error_sending_message': 'Error sending message',
-        'error_sending_photo': 'Error sending photo',
-        'network_error': 'Network error',
-        'no_messages': 'No messages yet',
-        'back': 'Back',
-        'patients': 'Patients',
-        'loading': 'Loading',
-        'refresh': 'Refresh',
-        'select_patient': 'Select Patient',
-        'human_patient': 'Human Patient',
-        'animal_patient': 'Animal Patient',
-        'new_message': 'New message',
-        'no_patients': 'No patients available',
-        'you': 'You',
-        'patient': 'Patient',
-        'error_sending': 'Error sending message',
-        'write_prescription': 'Write Prescription',
-        'prescription_placeholder': 'Enter prescription details...',
-        'send_prescription': 'Send Prescription',
-        'prescription_sent': 'Prescription sent successfully',
-        # New translations for balance diet
-        'view_prescription': 'View Prescription',
-        'balance_diet': 'Balance Diet',
-        'diet_type': 'Diet Type',
-        'select_diet_type': 'Select Diet Type',
-        'vegetarian': 'Vegetarian',
-        'eggitarian': 'Eggitarian',
-        'non_vegetarian': 'Non Vegetarian',
-        'occupation': 'Occupation',
-        'select_occupation': 'Select Occupation',
-        'school': 'School',
-        'college': 'College',
-        'job': 'Job',
-        'housewife': 'Housewife',
-        'disease': 'Disease',
-        'select_disease': 'Select Disease',
-        'no_disease': 'No Disease',
-        'diabetes': 'Diabetes',
-        'blood_pressure': 'Blood Pressure',
-        'thyroid': 'Thyroid',
-        'cholesterol': 'Cholesterol',
-        'finish': 'Finish',
-        'next': 'Next',
-        'previous': 'Previous',
-        'generate_diet': 'Generate Diet',
-        'five_day_diet_plan': '5-Day Diet Plan',
-        'day': 'Day',
-        'breakfast': 'Breakfast',
-        'lunch': 'Lunch',
-        'dinner': 'Dinner',
-        'snacks': 'Snacks',
-        'print_diet': 'Print Diet',
-    },
-    'hi': {
-        'health_kiosk': 'स्वास्थ्य कियोस्क',
-        'welcome': 'स्वास्थ्य कियोस्क में आपका स्वागत है',
-        'complete_form': 'अपना स्वास्थ्य फॉर्म पूरा करें और तुरंत प्रिस्क्रिप्शन प्राप्त करें',
-        'health_assessment': 'स्वास्थ्य मूल्यांकन',
-        'animal_health': 'पशु स्वास्थ्य',
-        'view_history': 'इतिहास देखें',
-        'patient_queue': 'रोगी कतार',
-        'chat_with_doctor': 'डॉक्टर से चैट करें',
-        'emergency_sos': 'आपातकालीन एसऒएस',
-        'your_health_priority': 'आपका स्वास्थ्य हमारी प्राथमिकता है',
-        'english': 'अंग्रेजी',
-        'hindi': 'हिंदी',
-        'kannada': 'कन्नड़',
-        # Patient Form
-        'patient_form': 'रोगी स्वास्थ्य फॉर्म',
-        'name': 'नाम',
-        'city': 'शहर',
-        'age': 'उम्र',
-        'weight': 'वजन (किलो)',
-        'bp': 'ब्लड प्रेशर',
-        'sugar': 'शुगर लेवल',
-        'oxygen': 'ऑक्सीजन लेवल',
-        'blood_group': 'ब्लड ग्रुप',
-        'symptoms': 'लक्षण',
-        'submit': 'जमा करें',
-        'fill_all_fields': 'कृपया सभी फ़ील्ड भरें!',
-        'submitted_success': 'सफलतापूर्वक जमा किया गया!',
-        # Animal Form
-        'animal_form': 'पशु स्वास्थ्य फॉर्म',
-        'owner_name': 'मालिक का नाम',
-        'animal_type': 'पशु प्रकार',
-        'animal_name': 'पशु का नाम',
-        'gender': 'लिंग',
-        'breed': 'नस्ल',
-        'condition': 'स्थिति',
-        'village': 'गाँव',
-        'contact': 'संपर्क नंबर',
-        'describe_symptoms': 'पशु के लक्षणों का विस्तार से वर्णन करें...',
-        'submit_animal_form': 'पशु स्वास्थ्य फॉर्म जमा करें',
-        'check_prescription_status': 'प्रिस्क्रिप्शन स्थिति जांचें',
-        'back_to_home': 'होम पर वापस जाएं',
-        'male': 'नर',
-        'female': 'मादा',
-        'other': 'अन्य',
-        'select_animal_type': 'पशु प्रकार चुनें',
-        'select_gender': 'लिंग चुनें',
-        'select_condition': 'स्थिति चुनें',
-        # Doctor/Veterinarian
-        'doctor_dashboard': 'डॉक्टर डैशबोर्ड',
-        'veterinarian_dashboard': 'पशु चिकित्सक डैशबोर्ड',
-        'welcome_doctor': 'स्वागत है, डॉ. {}',
-        'animal_patients': 'पशु रोगी',
-        'search_placeholder': 'पशु आईडी, नाम, मालिक से खोजें...',
-        'search': 'खोजें',
-        'clear': 'साफ़ करें',
-        'total_animals': 'कुल पशु',
-        'write_prescription': 'प्रिस्क्रिप्शन लिखें',
-        'update_prescription': 'प्रिस्क्रिप्शन अपडेट करें',
-        'prescription_details': 'प्रिस्क्रिप्शन विवरण',
-        'submit_prescription': 'प्रिस्क्रिप्शन जमा करें',
-        'back_to_dashboard': 'डैशबोर्ड पर वापस जाएं',
-        # Login
-        'doctor_login': 'डॉक्टर लॉगिन',
-        'access_medical_dashboard': 'मेडिकल डैशबोर्ड एक्सेस करें',
-        'login_instructions': 'लॉगिन निर्देश',
-        'human_doctor_access': 'मानव रोगी डैशबोर्ड एक्सेस करें',
-        'veterinarian_access': 'पशु रोगी डैशबोर्ड एक्सेस करें',
-        'username': 'यूजरनेम',
-        'password': 'पासवर्ड',
-        'login': 'लॉगिन',
-        'back_to_patient_portal': 'रोगी पोर्टल पर वापस जाएं',
-        'language': 'भाषा',
-        'manage_all_animals': 'सभी पशुओं को प्रबंधित करें',
-        'view_all_records': 'सभी रिकॉर्ड देखें',
-        'chat_with_owners': 'मालिकों से चैट करें',
-        'end_session': 'सत्र समाप्त करें',
-        'owner': 'मालिक',
-        'no_animal_patients': 'कोई पशु रोगी नहीं मिले',
-        'no_matching_animals': 'आपकी खोज मानदंड से कोई पशु रोगी मेल नहीं खाते।',
-        'no_animals_waiting': 'अभी तक कोई पशु रोगी परामर्श की प्रतीक्षा में नहीं हैं।',
-        'view_all_animals': 'सभी पशु देखें',
-        'print': 'प्रिंट',
-        # Chat & Queue
-        'patient_chat': 'रोगी चैट',
-        'chat_with_doctors': 'डॉक्टरों से चैट करें',
-        'type_message': 'अपना संदेश टाइप करें...',
-        'send': 'भेजें',
-        'patient_queue': 'रोगी कतार',
-        'waiting_patients': 'प्रतीक्षारत रोगी',
-        'patient_id': 'रोगी आईडी',
-        'patient_name': 'रोगी का नाम',
-        'submission_time': 'जमा करने का समय',
-        'status': 'स्थिति',
-        'waiting': 'प्रतीक्षा',
-        'prescribed': 'निर्धारित',
-        'no_patients_waiting': 'वर्तमान में कोई रोगी प्रतीक्षा में नहीं है',
-        'your_chat_id': 'आपकी चैट आईडी',
-        'start_chat': 'चैट शुरू करें',
-        'no_chat_selected': 'कोई चैट चयनित नहीं',
-        # Chat specific translations
-        'chat_with_vet': 'पशु चिकित्सक से चैट करें',
-        'chat_with_doctor': 'डॉक्टर से चैट करें',
-        'chat_with_patient': 'रोगी से चैट करें',
-        'select_vet': 'पशु चिकित्सक चुनें',
-        'select_doctor': 'डॉक्टर चुनें',
-        'enter_animal_id': 'पशु आईडी दर्ज करें',
-        'enter_patient_id': 'रोगी आईडी दर्ज करें',
-        'select_vet_and_animal': 'चैट शुरू करने के लिए पशु चिकित्सक चुनें और पशु आईडी दर्ज करें',
-        'select_doctor_and_patient': 'चैट शुरू करने के लिए डॉक्टर चुनें और रोगी आईडी दर्ज करें',
-        'select_patient_to_chat': 'चैट शुरू करने के लिए सूची से रोगी चुनें',
-        'send_message': 'भेजें',
-        'take_photo': 'फोटो लें',
-        'retake': 'फिर से लें',
-        'send_photo': 'फोटो भेजें',
-        'cancel': 'रद्द करें',
-        'capture': 'कैप्चर करें',
-        'photo_attached': 'फोटो संलग्न',
-        'photo_sent': 'फोटो भेज दी गई',
-        'camera_error': 'कैमरा एक्सेस अस्वीकृत या उपलब्ध नहीं',
-        'error_sending_message': 'संदेश भेजने में त्रुटि',
-        'error_sending_photo': 'फोटो भेजने में त्रुटि',
-        'network_error': 'नेट्वर्क त्रुटि',
-        'no_messages': 'अभी तक कोई संदेश नहीं',
-        'back': 'वापस',
-        'patients': 'रोगी',
-        'loading': 'लोड हो रहा है',
-        'refresh': 'ताज़ा करें',
-        'select_patient': 'रोगी चुनें',
-        'human_patient': 'मानव रोगी',
-        'animal_patient': 'पशु रोगी',
-        'new_message': 'नया संदेश',
-        'no_patients': 'कोई रोगी उपलब्ध नहीं',
-        'you': 'आप',
-        'patient': 'रोगी',
-        'error_sending': 'संदेश भेजने में त्रुटि',
-        'write_prescription': 'प्रिस्क्रिप्शन लिखें',
-        'prescription_placeholder': 'प्रिस्क्रिप्शन विवरण दर्ज करें...',
-        'send_prescription': 'प्रिस्क्रिप्शन भेजें',
-        'prescription_sent': 'प्रिस्क्रिप्शन सफलतापूर्वक भेज दिया गया',
-        # New translations for balance diet
-        'view_prescription': 'प्रिस्क्रिप्शन देखें',
-        'balance_diet': 'संतुलित आहार',
-        'diet_type': 'आहार प्रकार',
-        'select_diet_type': 'आहार प्रकार चुनें',
-        'vegetarian': 'शाकाहारी',
-        'eggitarian': 'अंडा खाने वाले',
-        'non_vegetarian': 'मांसाहारी',
-        'occupation': 'व्यवसाय',
-        'select_occupation': 'व्यवसाय चुनें',
-        'school': 'स्कूल',
-        'college': 'कॉलेज',
-        'job': 'नौकरी',
-        'housewife': 'गृहिणी',
-        'disease': 'बीमारी',
-        'select_disease': 'बीमारी चुनें',
-        'no_disease': 'कोई बीमारी नहीं',
-        'diabetes': 'मधुमेह',
-        'blood_pressure': 'ब्लड प्रेशर',
-        'thyroid': 'थायराइड',
-        'cholesterol': 'कोलेस्ट्रॉल',
-        'finish': 'समाप्त',
-        'next': 'अगला',
-        'previous': 'पिछला',
-        'generate_diet': 'आहार जनरेट करें',
-        'five_day_diet_plan': '5-दिवसीय आहार योजना',
-        'day': 'दिन',
-        'breakfast': 'नाश्ता',
-        'lunch': 'दोपहर का भोजन',
-        'dinner': 'रात का भोजन',
-        'snacks': 'स्नैक्स',
-        'print_diet': 'आहार प्रिंट करें',
-    },
-    'kn': {
-        'health_kiosk': 'ಹೆಲ್ತ್ ಕಿಯೋಸ್ಕ್',
-        'welcome': 'ಹೆಲ್ತ್ ಕಿಯೋಸ್ಕ್ ಗೆ ಸ್ವಾಗತ',
-        'complete_form': 'ನಿಮ್ಮ ಆರೋಗ್ಯ ಫಾರ್ಮ್ ಪೂರ್ಣಗೊಳಿಸಿ ಮತ್ತು ತಕ್ಷಣ ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ಪಡೆಯಿರಿ',
-        'health_assessment': 'ಆರೋಗ್ಯ ಮೌಲ್ಯಮಾಪನ',
-        'animal_health': 'ಪಶು ಆರೋಗ್ಯ',
-        'view_history': 'ಇತಿಹಾಸ ನೋಡಿ',
-        'patient_queue': 'ರೋಗಿ ಕ್ಯೂ',
-        'chat_with_doctor': 'ಡಾಕ್ಟರ್ ಜೊತೆ ಚಾಟ್ ಮಾಡಿ',
-        'emergency_sos': 'ಅತ್ಯಾಹತ ಎಸ್ಒಎಸ್',
-        'your_health_priority': 'ನಿಮ್ಮ ಆರೋಗ್ಯ ನಮ್ಮ ಪ್ರಾಮುಖ್ಯತೆ',
-        'english': 'ಇಂಗ್ಲಿಷ್',
-        'hindi': 'ಹಿಂದಿ',
-        'kannada': 'ಕನ್ನಡ',
-        # Patient Form
-        'patient_form': 'ರೋಗಿ ಆರೋಗ್ಯ ಫಾರ್ಮ್',
-        'name': 'ಹೆಸರು',
-        'city': 'ನಗರ',
-        'age': 'ವಯಸ್ಸು',
-        'weight': 'ತೂಕ (ಕೆಜಿ)',
-        'bp': 'ಬ್ಲಡ್ ಪ್ರೆಶರ್',
-        'sugar': 'ಶುಗರ್ ಲೆವೆಲ್',
-        'oxygen': 'ಆಕ್ಸಿಜನ್ ಲೆವೆಲ್',
-        'blood_group': 'ಬ್ಲಡ್ ಗ್ರೂಪ್',
-        'symptoms': 'ಲಕ್ಷಣಗಳು',
-        'submit': 'ಸಬ್ಮಿಟ್ ಮಾಡಿ',
-        'fill_all_fields': 'ದಯವಿಟ್ಟು ಎಲ್ಲಾ ಫೀಲ್ಡ್‌ಗಳನ್ನು ಪೂರೈಸಿ!',
-        'submitted_success': 'ಯಶಸ್ವಿಯಾಗಿ ಸಬ್ಮಿಟ್ ಆಯಿತು!',
-        # Animal Form
-        'animal_form': 'ಪಶು ಆರೋಗ್ಯ ಫಾರ್ಮ್',
-        'owner_name': 'ಮಾಲೀಕರ ಹೆಸರು',
-        'animal_type': 'ಪಶು ಪ್ರಕಾರ',
-        'animal_name': 'ಪಶುವಿನ ಹೆಸರು',
-        'gender': 'ಲಿಂಗ',
-        'breed': 'ಬ್ರೀಡ್',
-        'condition': 'ಸ್ಥಿತಿ',
-        'village': 'ಗ್ರಾಮ',
-        'contact': 'ಸಂಪರ್ಕ ಸಂಖ್ಯೆ',
-        'describe_symptoms': 'ಪಶುವಿನ ಲಕ್ಷಣಗಳನ್ನು ವಿವರವಾಗಿ ವಿವರಿಸಿ...',
-        'submit_animal_form': 'ಪಶು ಆರೋಗ್ಯ ಫಾರ್ಮ್ ಸಬ್ಮಿಟ್ ಮಾಡಿ',
-        'check_prescription_status': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ಸ್ಥಿತಿ ಪರಿಶೀಲಿಸಿ',
-        'back_to_home': 'ಹೋಮ್‌ಗೆ ಹಿಂತಿರುಗಿ',
-        'male': 'ಪುರುಷ',
-        'female': 'ಸ್ತ್ರೀ',
-        'other': 'ಇತರೆ',
-        'select_animal_type': 'ಪಶು ಪ್ರಕಾರ ಆಯ್ಕೆಮಾಡಿ',
-        'select_gender': 'ಲಿಂಗ ಆಯ್ಕೆಮಾಡಿ',
-        'select_condition': 'ಸ್ಥಿತಿ ಆಯ್ಕೆಮಾಡಿ',
-        # Doctor/Veterinarian
-        'doctor_dashboard': 'ಡಾಕ್ಟರ್ ಡ್ಯಾಶ್‌ಬೋರ್ಡ್',
-        'veterinarian_dashboard': 'ವೆಟರ್ನರಿ ಡ್ಯಾಶ್‌ಬೋರ್ಡ್',
-        'welcome_doctor': 'ಸ್ವಾಗತ, ಡಾ. {}',
-        'animal_patients': 'ಪಶು ರೋಗಿಗಳು',
-        'search_placeholder': 'ಪಶು ಐಡಿ, ಹೆಸರು, ಮಾಲೀಕರಿಂದ ಹುಡುಕಿ...',
-        'search': 'ಹುಡುಕಿ',
-        'clear': 'ಕ್ಲಿಯರ್',
-        'total_animals': 'ಒಟ್ಟು ಪಶುಗಳು',
-        'write_prescription': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ಬರೆಯಿರಿ',
-        'update_prescription': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ಅಪ್ಡೇಟ್ ಮಾಡಿ',
-        'prescription_details': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ವಿವರಗಳು',
-        'submit_prescription': 'ಪ್ರिस्क್ರಿಪ್ಷನ್ ಸಬ್ಮಿಟ್ ಮಾಡಿ',
-        'back_to_dashboard': 'ಡ್ಯಾಶ್‌ಬೋರ್ಡ್‌ಗೆ ಹಿಂತಿರುಗಿ',
-        # Login
-        'doctor_login': 'ಡಾಕ್ಟರ್ ಲಾಗಿನ್',
-        'access_medical_dashboard': 'ಮೆಡಿಕಲ್ ಡ್ಯಾಶ್‌ಬೋರ್ಡ್ ಪ್ರವೇಶಿಸಿ',
-        'login_instructions': 'ಲಾಗಿನ್ ಸೂಚನೆಗಳು',
-        'human_doctor_access': 'ಮಾನವ ರೋಗಿ ಡ್ಯಾಶ್‌ಬೋರ್ಡ್ ಪ್ರವೇಶಿಸಿ',
-        'veterinarian_access': 'ಪಶು ರೋಗಿ ಡ್ಯಾಶ್‌ಬೋರ್ಡ್ ಪ್ರವೇಶಿಸಿ',
-        'username': 'ಬಳಕೆದಾರಹೆಸರು',
-        'password': 'ಪಾಸ್ವರ್ಡ್',
-        'login': 'ಲಾಗಿನ್',
-        'back_to_patient_portal': 'ರೋಗಿ ಪೋರ್ಟಲ್‌ಗೆ ಹಿಂತಿರುಗಿ',
-        'language': 'ಭಾಷೆ',
-        'manage_all_animals': 'ಎಲ್ಲಾ ಪಶುಗಳನ್ನು ನಿರ್ವಹಿಸಿ',
-        'view_all_records': 'ಎಲ್ಲಾ ದಾಖಲೆಗಳನ್ನು ವೀಕ್ಷಿಸಿ',
-        'chat_with_owners': 'ಮಾಲೀಕರೊಂದಿಗೆ ಚಾಟ್ ಮಾಡಿ',
-        'end_session': 'ಅಧಿವೇಶನ ಮುಕ್ತಾಯಗೊಳಿಸಿ',
-        'owner': 'ಮಾಲೀಕ',
-        'no_animal_patients': 'ಯಾವುದೇ ಪಶು ರೋಗಿಗಳು ಕಂಡುಬಂದಿಲ್ಲ',
-        'no_matching_animals': 'ನಿಮ್ಮ ಹುಡುಕಾಟ ಮಾನದಂಡಕ್ಕೆ ಹೊಂದಿಕೆಯಾಗುವ ಯಾವುದೇ ಪಶು ರೋಗಿಗಳು ಇಲ್ಲ.',
-        'no_animals_waiting': 'ಇನ್ನೂ ಯಾವುದೇ ಪಶು ರೋಗಿಗಳು ಸಲಹೆಗಾಗಿ ಕಾಯುತ್ತಿಲ್ಲ.',
-        'view_all_animals': 'ಎಲ್ಲಾ ಪಶುಗಳನ್ನು ವೀಕ್ಷಿಸಿ',
-        'print': 'ಮುದ್ರಣ',
-        # Chat & Queue
-        'patient_chat': 'ರೋಗಿ ಚಾಟ್',
-        'chat_with_doctors': 'ಡಾಕ್ಟರ್‌ಗಳೊಂದಿಗೆ ಚಾಟ್ ಮಾಡಿ',
-        'type_message': 'ನಿಮ್ಮ ಸಂದೇಶವನ್ನು ಟೈಪ್ ಮಾಡಿ...',
-        'send': 'ಕಳುಹಿಸಿ',
-        'patient_queue': 'ರೋಗಿ ಕ್ಯೂ',
-        'waiting_patients': 'ಕಾಯುತ್ತಿರುವ ರೋಗಿಗಳು',
-        'patient_id': 'ರೋಗಿ ಐಡಿ',
-        'patient_name': 'ರೋಗಿಯ ಹೆಸರು',
-        'submission_time': 'ಸಲ್ಲಿಕೆ ಸಮಯ',
-        'status': 'ಸ್ಥಿತಿ',
-        'waiting': 'ಕಾಯುತ್ತಿದೆ',
-        'prescribed': 'ನಿರ್ದೇಶಿಸಲಾಗಿದೆ',
-        'no_patients_waiting': 'ಪ್ರಸ್ತುತ ಯಾವುದೇ ರೋಗಿಗಳು ಕಾಯುತ್ತಿಲ್ಲ',
-        'your_chat_id': 'ನಿಮ್ಮ ಚಾಟ್ ಐಡಿ',
-        'start_chat': 'ಚಾಟ್ ಪ್ರಾರಂಭಿಸಿ',
-        'no_chat_selected': 'ಯಾವುದೇ ಚಾಟ್ ಆಯ್ಕೆ ಮಾಡಲಾಗಿಲ್ಲ',
-        # Chat specific translations
-        'chat_with_vet': 'ವೆಟರ್ನರಿಯನ್ ಜೊತೆ ಚಾಟ್ ಮಾಡಿ',
-        'chat_with_doctor': 'ಡಾಕ್ಟರ್ ಜೊತೆ ಚಾಟ್ ಮಾಡಿ',
-        'chat_with_patient': 'ರೋಗಿಯೊಂದಿಗೆ ಚಾಟ್ ಮಾಡಿ',
-        'select_vet': 'ವೆಟರ್ನರಿಯನ್ ಆಯ್ಕೆಮಾಡಿ',
-        'select_doctor': 'ಡಾಕ್ಟರ್ ಆಯ್ಕೆಮಾಡಿ',
-        'enter_animal_id': 'ಪಶು ಐಡಿ ನಮೂದಿಸಿ',
-        'enter_patient_id': 'ರೋಗಿ ಐಡಿ ನಮೂದಿಸಿ',
-        'select_vet_and_animal': 'ಚಾಟ್ ಪ್ರಾರಂಭಿಸಲು ವೆಟರ್ನರಿಯನ್ ಆಯ್ಕೆಮಾಡಿ ಮತ್ತು ಪಶು ಐಡಿ ನಮೂದಿಸಿ',
-        'select_doctor_and_patient': 'ಚಾಟ್ ಪ್ರಾರಂಭಿಸಲು ಡಾಕ್ಟರ್ ಆಯ್ಕೆಮಾಡಿ ಮತ್ತು ರೋಗಿ ಐಡಿ ನಮೂದಿಸಿ',
-        'select_patient_to_chat': 'ಚಾಟ್ ಪ್ರಾರಂಭಿಸಲು ಪಟ್ಟಿಯಿಂದ ರೋಗಿಯನ್ನು ಆಯ್ಕೆಮಾಡಿ',
-        'send_message': 'ಕಳುಹಿಸಿ',
-        'take_photo': 'ಫೋಟೋ ತೆಗೆಯಿರಿ',
-        'retake': 'ಮರುತೆಗೆದುಕೊಳ್ಳಿ',
-        'send_photo': 'ಫೋಟೋ ಕಳುಹಿಸಿ',
-        'cancel': 'ರದ್ದುಮಾಡಿ',
-        'capture': 'ಕ್ಯಾಪ್ಚರ್ ಮಾಡಿ',
-        'photo_attached': 'ಫೋಟೋ ಲಗತ್ತಿಸಲಾಗಿದೆ',
-        'photo_sent': 'ಫೋಟೋ ಕಳುಹಿಸಲಾಗಿದೆ',
-        'camera_error': 'ಕ್ಯಾಮೆರಾ ಪ್ರವೇಶ ನಿರಾಕರಿಸಲಾಗಿದೆ ಅಥವಾ ಲಭ್ಯವಿಲ್ಲ',
-        'error_sending_message': 'ಸಂದೇಶ ಕಳುಹಿಸುವಲ್ಲಿ ದೋಷ',
-        'error_sending_photo': 'ಫೋಟೋ ಕಳುಹಿಸುವಲ್ಲಿ ದೋಷ',
-        'network_error': 'ನೆಟ್ವರ್ಕ್ ದೋಷ',
-        'no_messages': 'ಇನ್ನೂ ಯಾವುದೇ ಸಂದೇಶಗಳಿಲ್ಲ',
-        'back': 'ಹಿಂದೆ',
-        'patients': 'ರೋಗಿಗಳು',
-        'loading': 'ಲೋಡ್ ಆಗುತ್ತಿದೆ',
-        'refresh': 'ರಿಫ್ರೆಶ್ ಮಾಡಿ',
-        'select_patient': 'ರೋಗಿ ಆಯ್ಕೆಮಾಡಿ',
-        'human_patient': 'ಮಾನವ ರೋಗಿ',
-        'animal_patient': 'ಪಶು ರೋಗಿ',
-        'new_message': 'ಹೊಸ ಸಂದೇಶ',
-        'no_patients': 'ಯಾವುದೇ ರೋಗಿಗಳು ಲಭ್ಯವಿಲ್ಲ',
-        'you': 'ನೀವು',
-        'patient': 'ರೋಗಿ',
-        'error_sending': 'ಸಂದೇಶ ಕಳುಹಿಸುವಲ್ಲಿ ದೋಷ',
-        'write_prescription': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ಬರೆಯಿರಿ',
-        'prescription_placeholder': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ವಿವರಗಳನ್ನು ನಮೂದಿಸಿ...',
-        'send_prescription': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ಕಳುಹಿಸಿ',
-        'prescription_sent': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ಯಶಸ್ವಿಯಾಗಿ ಕಳುಹಿಸಲಾಗಿದೆ',
-        # New translations for balance diet
-        'view_prescription': 'ಪ್ರಿಸ್ಕ್ರಿಪ್ಷನ್ ವೀಕ್ಷಿಸಿ',
-        'balance_diet': 'ಸಮತೋಲಿತ ಆಹಾರ',
-        'diet_type': 'ಆಹಾರ ಪ್ರಕಾರ',
-        'select_diet_type': 'ಆಹಾರ ಪ್ರಕಾರ ಆಯ್ಕೆಮಾಡಿ',
-        'vegetarian': 'ಶಾಕಾಹಾರಿ',
-        'eggitarian': 'ಮೊಟ್ಟೆ ತಿನ್ನುವವರು',
-        'non_vegetarian': 'ಮಾಂಸಾಹಾರಿ',
-        'occupation': 'ವೃತ್ತಿ',
-        'select_occupation': 'ವೃತ್ತಿ ಆಯ್ಕೆಮಾಡಿ',
-        'school': 'ಶಾಲೆ',
-        'college': 'ಕಾಲೇಜು',
-        'job': 'ಉದ್ಯೋಗ',
-        'housewife': 'ಗೃಹಿಣಿ',
-        'disease': 'ರೋಗ',
-        'select_disease': 'ರೋಗ ಆಯ್ಕೆಮಾಡಿ',
-        'no_disease': 'ಯಾವುದೇ ರೋಗ ಇಲ್ಲ',
-        'diabetes': 'ಮಧುಮೇಹ',
-        'blood_pressure': 'ರಕ್ತದೊತ್ತಡ',
-        'thyroid': 'ಥೈರಾಯ್ಡ್',
-        'cholesterol': 'ಕೊಲೆಸ್ಟ್ರಾಲ್',
-        'finish': 'ಮುಗಿಸು',
-        'next': 'ಮುಂದೆ',
-        'previous': 'ಹಿಂದೆ',
-        'generate_diet': 'ಆಹಾರ ಉತ್ಪಾದಿಸಿ',
-        'five_day_diet_plan': '5-ದಿನದ ಆಹಾರ ಯೋಜನೆ',
-        'day': 'ದಿನ',
-        'breakfast': 'ಉಪಹಾರ',
-        'lunch': 'ಮಧ್ಯಾಹ್ನದ ಊಟ',
-        'dinner': 'ರಾತ್ರಿ ಊಟ',
-        'snacks': 'ಲಘು ಆಹಾರ',
-        'print_diet': 'ಆಹಾರ ಮುದ್ರಿಸಿ',
-    }
-}
-
 # Helper function for translations in routes
 def get_translation(key, lang=None):
     if lang is None:
         lang = session.get('lang', 'en')
-    return LANGUAGES.get(lang, LANGUAGES['en']).get(key, key)
+    return i18n.get_catalog(lang).translate(key)
 
 # Context processor for multi-language support
 @app.context_processor
 def utility_processor():
-    def get_current_language():
-        return session.get('lang', 'en')
-    
-    def t(key, *args):
-        lang = get_current_language()
-        translation = LANGUAGES.get(lang, LANGUAGES['en']).get(key, key)
-        # Format string if arguments are provided
-        if args:
-            try:
-                return translation.format(*args)
-            except:
-                return translation
-        return translation
-    
-    return dict(t=t, current_language=get_current_language())
+    lang = session.get('lang', 'en')
+    return dict(t=i18n.get_catalog(lang).t, current_language=lang)
 
 # Database setup for chat and records
 def init_db():
     conn = sqlite3.connect('healthcare.db')
     cursor = conn.cursor()
     
+    # WAL lets the dashboards read while chat and prescriptions write; the scheduler checkpoints it
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     # Create messages table for chat functionality
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS messages (
@@ -638,7 +185,8 @@ def init_db():
         )
     ''')
     
-    # Create doctor records table
+    # Create doctor records table; prescription text is only set on rows written before
+    # prescription_items existed (see prescriptions.py)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS doctor_records (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -652,16 +200,160 @@ def init_db():
         )
     ''')
     
+    # One patient's prescriptions and chat, newest first, for the timeline and chat views
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_doctor_records_patient ON doctor_records (patient_id, prescription_date, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_patient ON messages (patient_id, timestamp, id)')
+    
+    # Idempotency keys of kiosk outbox entries already applied by /api/ingest/batch
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_keys (
+            idempotency_key TEXT PRIMARY KEY,
+            kiosk_id TEXT,
+            received_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
     conn.commit()
     conn.close()
 
 def get_db_connection():
-    conn = sqlite3.connect('healthcare.db')
+    conn = sqlite3.connect('healthcare.db', factory=metrics.TimedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Bumped on every doctor_records insert so record APIs can answer conditional GETs
+RECORDS_VERSION = VersionCounter('healthcare.db.records.lock')
+
+def record_prescription(doctor_id, kind, patient_id, patient_name, village, items):
+    """Insert a doctor_records row with its prescription items and change-log event in
+    one transaction; returns the prescription id"""
+    conn = get_db_connection()
+    cursor = conn.execute('''
+        INSERT INTO doctor_records (doctor_id, patient_id, patient_name, village)
+        VALUES (?, ?, ?, ?)
+    ''', (doctor_id, patient_id, patient_name, village))
+    prescription_id = cursor.lastrowid
+    PRESCRIPTIONS.add(prescription_id, kind, patient_id, items, conn)
+    CHANGES.append('prescriptions', prescription_id, 'insert', {
+        'doctor_id': doctor_id,
+        'kind': kind,
+        'patient_id': patient_id,
+        'patient_name': patient_name,
+        'village': village,
+        'items': items
+    }, conn=conn)
+    conn.commit()
+    conn.close()
+    RECORDS_VERSION.bump()
+    return prescription_id
+
+def withdraw_prescription(prescription_id):
+    """Remove a prescription whose patient or animal record could not be linked to it"""
+    conn = get_db_connection()
+    conn.execute('DELETE FROM doctor_records WHERE id = ?', (prescription_id,))
+    PRESCRIPTIONS.remove(prescription_id, conn)
+    CHANGES.append('prescriptions', prescription_id, 'delete', conn=conn)
+    conn.commit()
+    conn.close()
+    RECORDS_VERSION.bump()
+
+def insert_message(conn, patient_id, doctor_id, content, sender_type, image_data):
+    """Insert a chat message and its change-log event on ``conn``; the caller commits.
+
+    Image bytes stay in the messages table, the event only flags them.
+    """
+    cursor = conn.execute('''
+        INSERT INTO messages (patient_id, doctor_id, message_type, content, sender_type, image_data)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (patient_id, doctor_id, 'text', content, sender_type, image_data))
+    CHANGES.append('messages', cursor.lastrowid, 'insert', {
+        'patient_id': patient_id,
+        'doctor_id': doctor_id,
+        'message_type': 'text',
+        'content': content,
+        'sender_type': sender_type,
+        'has_image': bool(image_data)
+    }, conn=conn)
+    if OUTBOX is not None:
+        OUTBOX.add('message', cursor.lastrowid, {
+            'patient_id': patient_id,
+            'doctor_id': doctor_id,
+            'content': content,
+            'sender_type': sender_type,
+            'image_data': image_data
+        }, conn=conn)
+    return cursor.lastrowid
+
+# Housekeeping. Archiving, vacuum and reindex wait for the maintenance window;
+# every job yields to in-flight requests between chunks.
+HOUR = 3600
+DAY = 24 * HOUR
+REQUESTS_IN_FLIGHT = RequestGauge()
+REQUESTS_IN_FLIGHT.init_app(app)
+SCHEDULER = Scheduler(parse_window(config.MAINTENANCE_WINDOW), gauge=REQUESTS_IN_FLIGHT)
+
+def maintain_change_log(ctx):
+    compacted, purged = CHANGES.maintain(config.EVENT_LOG_RETENTION_DAYS, config.EVENT_LOG_COMPACTION_LAG)
+    if OUTBOX is not None:
+        OUTBOX.prune()
+    if compacted or purged:
+        return f"compacted {compacted}, purged {purged} change-log events"
+
+SCHEDULER.add(Job('change_log', maintain_change_log, every=6 * HOUR, off_peak=False))
+SCHEDULER.add(Job('wal_checkpoint', housekeeping.checkpoint_wal('healthcare.db'), every=HOUR, off_peak=False))
+SCHEDULER.add(Job('archive_patients', housekeeping.archive_store(PATIENTS, 'patients', config.ARCHIVE_AFTER_DAYS),
+                  every=DAY))
+SCHEDULER.add(Job('archive_animals', housekeeping.archive_store(ANIMALS, 'animals', config.ARCHIVE_AFTER_DAYS),
+                  every=DAY))
+if config.MESSAGE_ARCHIVE_DAYS > 0:
+    SCHEDULER.add(Job('archive_messages',
+                      housekeeping.archive_messages('healthcare.db', config.MESSAGE_ARCHIVE_DAYS, CHANGES), every=DAY))
+SCHEDULER.add(Job('incremental_vacuum', housekeeping.incremental_vacuum('healthcare.db'), every=DAY))
+SCHEDULER.add(Job('analyze', housekeeping.analyze('healthcare.db'), every=DAY))
+SCHEDULER.add(Job('vacuum', housekeeping.vacuum('healthcare.db'), every=7 * DAY, budget=600))
+SCHEDULER.add(Job('reindex', housekeeping.reindex('healthcare.db'), every=7 * DAY, budget=600))
+
+def prune_notifications(ctx):
+    pruned = NOTIFICATIONS.prune()
+    if pruned:
+        return f"pruned {pruned} delivered notifications"
+
+SCHEDULER.add(Job('notifications', prune_notifications, every=DAY, off_peak=False))
+
+def warm_templates():
+    """Compile every template up front so the first visits after a restart are fast"""
+    count = 0
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+            count += 1
+        except Exception as e:
+            print(f"❌ Template {name} failed to compile: {e}")
+    return count
+
 # Initialize database
 init_db()
+CHANGES.init_db()
+if OUTBOX is not None:
+    OUTBOX.init_db()
+    socketio.start_background_task(OUTBOX.run_forever, config.CENTRAL_URL, config.SYNC_TOKEN, config.SYNC_INTERVAL)
+NOTIFICATIONS.init_db()
+socketio.start_background_task(NOTIFICATIONS.run_forever)
+PRESCRIPTIONS.init_db()
+PRESCRIPTIONS.backfill()
+IDENTITIES.init_db()
+SCHEDULER.init_db()
+if config.SCHEDULER_ENABLED:
+    socketio.start_background_task(SCHEDULER.run_forever)
+assets.init_app(app)
+metrics.init_app(app, config.METRICS_TOKEN, config.SLOW_QUERY_MS, config.SLOW_REQUEST_MS)
+metrics.registry.add(metrics.Gauge('healthkiosk_notifications_pending', 'Notifications waiting for delivery',
+                                   callback=lambda: NOTIFICATIONS.counts().get('pending', 0)))
+metrics.registry.add(metrics.Gauge('healthkiosk_print_renders_queued', 'Prescription slips waiting to render',
+                                   callback=PRINTER.queued))
+profiler.init_app(app)
+warm_templates()
+httpcache.init_app(app)
 
 # Routes
 @app.route('/')
@@ -679,15 +371,13 @@ def doctor_welcome():
 # Language route
 @app.route('/set_language/<lang>')
 def set_language(lang):
-    if lang in LANGUAGES:
+    if i18n.is_supported(lang):
         session['lang'] = lang
     return redirect(request.referrer or '/patient/welcome')
 
 # Patient Routes
 @app.route('/patient', methods=['GET', 'POST'])
 def patient():
-    patients_data = load_patients()
-    
     if request.method == 'POST':
         name = request.form.get("name", "").strip()
         city = request.form.get("city", "").strip()
@@ -698,6 +388,7 @@ def patient():
         oxygen = request.form.get("oxygen", "").strip()
         blood_group = request.form.get("blood_group", "").strip()
         symptoms = request.form.get("symptoms", "").strip()
+        contact = request.form.get("contact", "").strip()
 
         if not all([name, city, age, weight, bp, sugar, oxygen, blood_group, symptoms]):
             return render_template("patient.html", error=get_translation('fill_all_fields'))
@@ -705,17 +396,26 @@ def patient():
         ts = datetime.now().strftime("%Y%m%d%H%M%S")
         pid = f"{name.replace(' ', '_')}_{ts}"
 
-        patients_data[pid] = {
+        record = {
             "id": pid, "name": name, "city": city, "age": age, "weight": weight,
             "bp": bp, "sugar": sugar, "oxygen": oxygen, "blood_group": blood_group,
             "symptoms": symptoms, "prescription": "", "timestamp": ts,
             "status": "waiting", "doctor_name": "", "prescription_date": "",
-            "submission_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            "submission_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "contact": contact
         }
-
-        save_patients(patients_data)
-
-        socketio.emit('new_patient_notification', {
+        record["person_id"] = IDENTITIES.resolve(record)
+        # Queued before the write, so a crash after it cannot keep the submission from the central server
+        if OUTBOX is not None:
+            OUTBOX.add('patient', pid, record)
+        try:
+            PATIENTS.put(pid, record)
+        except Exception:
+            IDENTITIES.forget(pid)
+            if OUTBOX is not None:
+                OUTBOX.discard('patient', pid)
+            raise
+
+        NOTIFICATIONS.publish('new_patient_notification', {
             'patient_id': pid,
             'patient_name': name,
             'message': f'New patient {name} submitted form'
@@ -728,38 +428,68 @@ def patient():
 @app.route('/patient/history')
 def patient_history():
     patients_data = load_patients()
-    return render_template("patient_history.html", patients=patients_data)
+    patient_rows = fragments.render_rows('fragments/patient_history_row.html', patients_data.items(), 'pid', 'pdata')
+    return render_template("patient_history.html", patients=patients_data, patient_rows=patient_rows)
 
 @app.route('/patient/search', methods=['GET', 'POST'])
 def patient_search():
-    patients_data = load_patients()
     search_results = {}
     search_query = ""
     
     if request.method == 'POST':
         search_query = request.form.get("patient_id", "").strip()
         if search_query:
-            for pid, pdata in patients_data.items():
-                if search_query.lower() in pid.lower() or search_query.lower() in pdata.get('name', '').lower():
-                    search_results[pid] = pdata
+            needle = search_query.lower()
+            search_results = PATIENTS.search(
+                lambda pid, pdata: needle in pid.lower() or needle in pdata.get('name', '').lower())
     
     return render_template("patient_search.html", patients=search_results, search_query=search_query)
 
 @app.route('/patient/delete/<pid>', methods=['POST'])
 def patient_delete(pid):
-    patients_data = load_patients()
-    if pid in patients_data:
-        del patients_data[pid]
-        save_patients(patients_data)
+    PATIENTS.delete(pid)
     return redirect('/patient/history')
 
 @app.route('/patient/view/<pid>')
+@conditional(PATIENTS)
 def patient_view(pid):
     patients_data = load_patients()
     pdata = patients_data.get(pid)
+    archived = False
+    if not pdata:
+        row = ARCHIVE.lookup('patients', pid)
+        if row is None:
+            return "No record found for ID: " + pid, 404
+        pdata, archived = Patient.from_dict(row), True
+    return render_template("patient_view.html", pdata=pdata, prescription=PRESCRIPTIONS.text(pdata),
+                           archived=archived)
+
+def print_response(kind, record_id, record):
+    """The printable slip for a prescribed record, from the print cache or the render pool"""
+    if not record or not prescriptions.has_prescription(record):
+        return "No prescription to print for ID: " + record_id, 404
+    fmt = request.args.get('format', 'html')
+    if fmt not in printing.FORMATS:
+        return "Unknown print format: " + fmt, 400
+    try:
+        body = PRINTER.get(kind, record, fmt, session.get('lang', 'en'))
+    except RenderTimeout:
+        return "Printer queue is busy, please try again", 503, {'Retry-After': '2'}
+    response = Response(body, mimetype=printing.FORMATS[fmt])
+    if fmt == 'pdf':
+        filename = ''.join(ch if ch.isascii() and (ch.isalnum() or ch in '-_') else '_' for ch in record_id)
+        response.headers['Content-Disposition'] = f'inline; filename=prescription-{filename}.pdf'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(f"{printing.slip_version(kind, record)}-{fmt}-{session.get('lang', 'en')}")
+    return response.make_conditional(request)
+
+@app.route('/patient/print/<pid>')
+def patient_print(pid):
+    pdata = load_patients().get(pid)
     if not pdata:
-        return "No record found for ID: " + pid, 404
-    return render_template("patient_view.html", pdata=pdata)
+        row = ARCHIVE.lookup('patients', pid)
+        pdata = Patient.from_dict(row) if row is not None else None
+    return print_response('patient', pid, pdata)
 
 # Animal Routes
 @app.route('/animal/health')
@@ -769,9 +499,6 @@ def animal_health():
 @app.route('/animal/health/submit', methods=['POST'])
 def animal_health_submit():
     try:
-        # Load existing animal data
-        animals_data = load_animals()
-        
         # Get form data
         owner_name = request.form.get("owner_name", "").strip()
         animal_type = request.form.get("animal_type", "").strip()
@@ -794,7 +521,7 @@ def animal_health_submit():
         animal_id = f"animal_{animal_type}_{ts}"
         
         # Save animal data
-        animals_data[animal_id] = {
+        record = {
             "animal_id": animal_id,
             "owner_name": owner_name,
             "animal_type": animal_type,
@@ -813,11 +540,18 @@ def animal_health_submit():
             "submission_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "prescription_date": ""
         }
-        
-        save_animals(animals_data)
+        # Queued before the write, so a crash after it cannot keep the submission from the central server
+        if OUTBOX is not None:
+            OUTBOX.add('animal', animal_id, record)
+        try:
+            ANIMALS.put(animal_id, record)
+        except Exception:
+            if OUTBOX is not None:
+                OUTBOX.discard('animal', animal_id)
+            raise
         
         # Notify veterinarians via socket
-        socketio.emit('new_animal_patient_notification', {
+        NOTIFICATIONS.publish('new_animal_patient_notification', {
             'animal_id': animal_id,
             'animal_name': animal_name,
             'animal_type': animal_type,
@@ -837,40 +571,51 @@ def animal_health_submit():
 @app.route('/animal/history')
 def animal_history():
     animals_data = load_animals()
-    return render_template("animal_history.html", animals=animals_data)
+    animal_rows = fragments.render_rows('fragments/animal_history_row.html', animals_data.items(), 'animal_id', 'animal_data')
+    return render_template("animal_history.html", animals=animals_data, animal_rows=animal_rows)
 
 @app.route('/animal/search', methods=['GET', 'POST'])
 def animal_search():
-    animals_data = load_animals()
     search_results = {}
     search_query = ""
     
     if request.method == 'POST':
         search_query = request.form.get("animal_id", "").strip()
         if search_query:
-            for animal_id, animal_data in animals_data.items():
-                if (search_query.lower() in animal_id.lower() or 
-                    search_query.lower() in animal_data.get('animal_name', '').lower() or
-                    search_query.lower() in animal_data.get('owner_name', '').lower()):
-                    search_results[animal_id] = animal_data
+            needle = search_query.lower()
+            search_results = ANIMALS.search(
+                lambda animal_id, animal_data: (needle in animal_id.lower() or
+                                                needle in animal_data.get('animal_name', '').lower() or
+                                                needle in animal_data.get('owner_name', '').lower()))
     
     return render_template("animal_search.html", animals=search_results, search_query=search_query)
 
 @app.route('/animal/delete/<animal_id>', methods=['POST'])
 def animal_delete(animal_id):
-    animals_data = load_animals()
-    if animal_id in animals_data:
-        del animals_data[animal_id]
-        save_animals(animals_data)
+    ANIMALS.delete(animal_id)
     return redirect('/animal/history')
 
 @app.route('/animal/view/<animal_id>')
+@conditional(ANIMALS)
 def animal_view(animal_id):
     animals_data = load_animals()
     animal_data = animals_data.get(animal_id)
+    archived = False
     if not animal_data:
-        return "No animal record found for ID: " + animal_id, 404
-    return render_template("animal_view.html", animal_data=animal_data)
+        row = ARCHIVE.lookup('animals', animal_id)
+        if row is None:
+            return "No animal record found for ID: " + animal_id, 404
+        animal_data, archived = Animal.from_dict(row), True
+    return render_template("animal_view.html", animal_data=animal_data, prescription=PRESCRIPTIONS.text(animal_data),
+                           archived=archived)
+
+@app.route('/animal/print/<animal_id>')
+def animal_print(animal_id):
+    animal_data = load_animals().get(animal_id)
+    if not animal_data:
+        row = ARCHIVE.lookup('animals', animal_id)
+        animal_data = Animal.from_dict(row) if row is not None else None
+    return print_response('animal', animal_id, animal_data)
 
 # Doctor Routes - Fixed Login Credentials
 @app.route('/doctor/login', methods=['GET', 'POST'])
@@ -902,27 +647,60 @@ def doctor_login():
     return render_template("doctor_login.html")
 
 @app.route('/doctor/dashboard')
+@conditional(PATIENTS)
 def doctor_dashboard():
     if not session.get('doctor_logged_in'):
         return redirect('/doctor/login')
     
-    patients_data = load_patients()
     search_query = request.args.get('search', '')
+    region = request.args.get('region', '')
     
     if search_query:
-        filtered_patients = {}
-        for pid, pdata in patients_data.items():
-            if (search_query.lower() in pid.lower() or 
-                search_query.lower() in pdata.get('name', '').lower() or
-                search_query.lower() in pdata.get('city', '').lower()):
-                filtered_patients[pid] = pdata
-        patients_data = filtered_patients
+        needle = search_query.lower()
+        patients_data = PATIENTS.search(
+            lambda pid, pdata: (needle in pid.lower() or
+                                needle in pdata.get('name', '').lower() or
+                                needle in pdata.get('city', '').lower()),
+            regions=[region] if region else None)
+    else:
+        patients_data = load_patients(region or None)
     
+    patient_rows = fragments.render_rows('fragments/doctor_patient_card.html', patients_data.items(), 'pid', 'pdata')
     return render_template("doctor.html", 
                          patients=patients_data, 
+                         patient_rows=patient_rows,
+                         change_seq=CHANGES.latest('patients'),
                          search_query=search_query,
+                         region=region,
+                         regions=PATIENTS.regions(),
                          doctor_name=session.get('doctor_name'))
 
+def can_sync(stream):
+    if stream not in CHANGE_STREAMS or not session.get('doctor_logged_in'):
+        return False
+    return stream != 'animals' or session.get('doctor_type') == 'veterinarian'
+
+def changes_payload(stream, since):
+    """Records of ``stream`` changed after sequence ``since``, with their rendered dashboard cards"""
+    store, template_name, key_name, record_name, _ = CHANGE_STREAMS[stream]
+    seq, reset, record_ids = CHANGES.since(stream, since)
+    records = store.records()
+    changes = []
+    for record_id in record_ids:
+        record = records.get(record_id)
+        if record is None:
+            changes.append({'id': record_id, 'op': 'delete'})
+        else:
+            html = fragments.render_rows(template_name, [(record_id, record)], key_name, record_name)
+            changes.append({'id': record_id, 'op': 'upsert', 'record': record.to_dict(), 'html': str(html)})
+    return {'stream': stream, 'seq': seq, 'reset': reset, 'changes': changes}
+
+@app.route('/api/changes/<stream>')
+def get_changes(stream):
+    if not can_sync(stream):
+        return jsonify({'error': 'Not authorized'}), 401
+    return jsonify(changes_payload(stream, request.args.get('since', 0, type=int)))
+
 @app.route('/doctor/patient/<pid>', methods=['GET', 'POST'])
 def doctor_patient(pid):
     if not session.get('doctor_logged_in'):
@@ -939,37 +717,37 @@ def doctor_patient(pid):
         doctor_id = session.get('doctor_id')
         
         if not prescription:
-            return render_template("doctor_patient.html", pdata=pdata, error="Please write a prescription!")
-        
-        prescription_with_info = f"Patient ID: {pid}\nPatient Name: {pdata['name']}\nPrescribed by: Dr. {doctor_name}\nDate: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n--- PRESCRIPTION ---\n{prescription}"
-        
-        pdata["prescription"] = prescription_with_info
-        pdata["status"] = "prescribed"
-        pdata["doctor_name"] = doctor_name
-        pdata["prescription_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        patients_data[pid] = pdata
-        
-        save_patients(patients_data)
+            return render_template("doctor_patient.html", pdata=pdata, prescription=PRESCRIPTIONS.text(pdata),
+                                   error="Please write a prescription!")
         
         # Save to doctor records
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO doctor_records (doctor_id, patient_id, patient_name, village, prescription)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (doctor_id, pid, pdata['name'], pdata.get('city', ''), prescription))
-        conn.commit()
-        conn.close()
+        prescription_id = record_prescription(doctor_id, 'patient', pid, pdata['name'], pdata.get('city', ''),
+                                              prescriptions.parse(prescription))
+
+        changes = {
+            "prescription": "",
+            "prescription_id": prescription_id,
+            "status": "prescribed",
+            "doctor_name": doctor_name,
+            "prescription_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if not PATIENTS.patch(pid, changes):
+            # Deleted meanwhile: take the prescription back instead of leaving it unlinked
+            withdraw_prescription(prescription_id)
+            return "Patient not found: " + pid, 404
 
-        socketio.emit('prescription_notification', {
+        # Only once the record shows the prescription; the notification goes out from the dispatcher
+        NOTIFICATIONS.publish('prescription_notification', {
             'patient_id': pid,
             'patient_name': pdata['name'],
             'doctor_name': doctor_name,
             'message': f'Prescription ready from Dr. {doctor_name}'
         })
+        PRINTER.prefetch('patient', load_patients().get(pid), session.get('lang', 'en'))
 
         return redirect('/doctor/dashboard')
 
-    return render_template("doctor_patient.html", pdata=pdata)
+    return render_template("doctor_patient.html", pdata=pdata, prescription=PRESCRIPTIONS.text(pdata))
 
 @app.route('/doctor/logout')
 def doctor_logout():
@@ -1005,6 +783,7 @@ def doctor_chat():
 
 # Veterinarian-specific routes
 @app.route('/veterinarian/dashboard')
+@conditional(ANIMALS)
 def veterinarian_dashboard():
     if not session.get('doctor_logged_in'):
         return redirect('/doctor/login')
@@ -1013,22 +792,30 @@ def veterinarian_dashboard():
     if session.get('doctor_type') != 'veterinarian':
         return redirect('/doctor/dashboard')
     
-    animals_data = load_animals()
     search_query = request.args.get('search', '')
+    region = request.args.get('region', '')
     
     if search_query:
-        filtered_animals = {}
-        for animal_id, animal_data in animals_data.items():
-            if (search_query.lower() in animal_id.lower() or 
-                search_query.lower() in animal_data.get('animal_name', '').lower() or
-                search_query.lower() in animal_data.get('owner_name', '').lower() or
-                search_query.lower() in animal_data.get('village', '').lower()):
-                filtered_animals[animal_id] = animal_data
-        animals_data = filtered_animals
+        needle = search_query.lower()
+        animals_data = ANIMALS.search(
+            lambda animal_id, animal_data: (needle in animal_id.lower() or
+                                            needle in animal_data.get('animal_name', '').lower() or
+                                            needle in animal_data.get('owner_name', '').lower() or
+                                            needle in animal_data.get('village', '').lower()),
+            regions=[region] if region else None)
+    else:
+        animals_data = load_animals(region or None)
     
+    # Latest first
+    animal_rows = fragments.render_rows('fragments/veterinarian_animal_card.html',
+                                        reversed(list(animals_data.items())), 'aid', 'adata')
     return render_template("veterinarian_dashboard.html", 
                          animals=animals_data, 
+                         animal_rows=animal_rows,
+                         change_seq=CHANGES.latest('animals'),
                          search_query=search_query,
+                         region=region,
+                         regions=ANIMALS.regions(),
                          doctor_name=session.get('doctor_name'),
                          now=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
@@ -1054,38 +841,40 @@ def veterinarian_animal(animal_id):
         if not prescription:
             return render_template("veterinarian_animal.html", 
                                  animal_data=animal_data, 
+                                 prescription=PRESCRIPTIONS.text(animal_data),
                                  error="Please write a prescription!")
         
-        prescription_with_info = f"Animal ID: {animal_id}\nAnimal Name: {animal_data['animal_name']}\nAnimal Type: {animal_data['animal_type']}\nGender: {animal_data['gender']}\nBreed: {animal_data['breed']}\nCondition: {animal_data['condition']}\nOwner: {animal_data['owner_name']}\nPrescribed by: Dr. {veterinarian_name} (Veterinarian)\nDate: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n--- PRESCRIPTION ---\n{prescription}"
-        
-        animal_data["prescription"] = prescription_with_info
-        animal_data["status"] = "prescribed"
-        animal_data["veterinarian_name"] = veterinarian_name
-        animal_data["prescription_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        animals_data[animal_id] = animal_data
-        
-        save_animals(animals_data)
-        
         # Save to doctor records
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO doctor_records (doctor_id, patient_id, patient_name, village, prescription)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (doctor_id, animal_id, f"{animal_data['animal_name']} ({animal_data['animal_type']})", animal_data.get('village', ''), prescription))
-        conn.commit()
-        conn.close()
+        prescription_id = record_prescription(
+            doctor_id, 'animal', animal_id, f"{animal_data['animal_name']} ({animal_data['animal_type']})",
+            animal_data.get('village', ''), prescriptions.parse(prescription))
 
-        socketio.emit('animal_prescription_notification', {
+        changes = {
+            "prescription": "",
+            "prescription_id": prescription_id,
+            "status": "prescribed",
+            "veterinarian_name": veterinarian_name,
+            "prescription_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if not ANIMALS.patch(animal_id, changes):
+            # Deleted meanwhile: take the prescription back instead of leaving it unlinked
+            withdraw_prescription(prescription_id)
+            return "Animal patient not found: " + animal_id, 404
+
+        # Only once the record shows the prescription
+        NOTIFICATIONS.publish('animal_prescription_notification', {
             'animal_id': animal_id,
             'animal_name': animal_data['animal_name'],
             'owner_name': animal_data['owner_name'],
             'veterinarian_name': veterinarian_name,
             'message': f'Prescription ready from Dr. {veterinarian_name} for {animal_data["animal_name"]}'
         })
+        PRINTER.prefetch('animal', load_animals().get(animal_id), session.get('lang', 'en'))
 
         return redirect('/veterinarian/dashboard')
 
-    return render_template("veterinarian_animal.html", animal_data=animal_data)
+    return render_template("veterinarian_animal.html", animal_data=animal_data,
+                           prescription=PRESCRIPTIONS.text(animal_data))
 
 # Balance Diet Routes
 @app.route('/balance_diet')
@@ -1115,10 +904,9 @@ def generate_balance_diet():
         diet_plan = generate_diet_plan(diet_type, occupation, age_int, weight, disease)
         
         # Save diet data
-        diet_data = load_balance_diet()
         diet_id = f"diet_{datetime.now().strftime('%Y%m%d%H%M%S')}"
         
-        diet_data[diet_id] = {
+        BALANCE_DIET.put(diet_id, {
             "diet_id": diet_id,
             "diet_type": diet_type,
             "occupation": occupation,
@@ -1127,9 +915,7 @@ def generate_balance_diet():
             "disease": disease,
             "diet_plan": diet_plan,
             "generated_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        save_balance_diet(diet_data)
+        })
         
         return render_template("balance_diet_result.html", 
                              diet_plan=diet_plan,
@@ -1322,6 +1108,7 @@ def patient_emergency():
 
 # API Routes for Chat and Records
 @app.route('/api/doctor/records')
+@conditional(RECORDS_VERSION)
 def get_doctor_records():
     if not session.get('doctor_logged_in'):
         return jsonify({'error': 'Not authorized'}), 401
@@ -1334,6 +1121,7 @@ def get_doctor_records():
         ORDER BY prescription_date DESC
     ''', (doctor_id,)).fetchall()
     conn.close()
+    items = PRESCRIPTIONS.by_doctor(doctor_id)
     
     records_list = []
     for record in records:
@@ -1342,13 +1130,103 @@ def get_doctor_records():
             'patient_id': record['patient_id'],
             'patient_name': record['patient_name'],
             'village': record['village'],
-            'prescription': record['prescription'],
+            'prescription': prescriptions.render(items[record['id']]) if record['id'] in items
+                            else record['prescription'],
             'prescription_date': record['prescription_date'],
             'status': record['status']
         })
     
     return jsonify(records_list)
 
+@app.route('/api/doctor/prescriptions')
+def get_prescriptions_for_medicine():
+    """Patients/animals whose latest prescription includes ``medicine`` (``prefix=1``: names starting with it)"""
+    if not session.get('doctor_logged_in'):
+        return jsonify({'error': 'Not authorized'}), 401
+    medicine = request.args.get('medicine', '').strip()
+    if not medicine:
+        return jsonify({'error': 'medicine is required'}), 400
+    kind = request.args.get('kind')
+    stores = {'patient': load_patients(), 'animal': load_animals()}
+    results = []
+    for row in PRESCRIPTIONS.taking(medicine, kind=kind, prefix=bool(request.args.get('prefix'))):
+        record = stores[row['kind']].get(row['record_id'])
+        # Earlier prescriptions the patient has since moved on from do not count
+        if record is not None and record.get('prescription_id') == row['prescription_id']:
+            if not results or results[-1]['prescription_id'] != row['prescription_id']:
+                results.append(row)
+    return jsonify(results)
+
+@app.route('/api/timeline/<record_id>')
+def get_timeline(record_id):
+    """Submission, prescriptions and chat of one patient or animal, newest first, ``limit`` per page"""
+    if not session.get('doctor_logged_in'):
+        return jsonify({'error': 'Not authorized'}), 401
+    try:
+        cursor = timeline.decode_cursor(request.args.get('before'))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit = max(1, min(request.args.get('limit', timeline.DEFAULT_LIMIT, type=int), timeline.MAX_LIMIT))
+
+    kind, record, archived = 'patient', load_patients().get(record_id), False
+    if record is None:
+        kind, record = 'animal', load_animals().get(record_id)
+    if record is None:
+        for kind, stream, record_class in (('patient', 'patients', Patient), ('animal', 'animals', Animal)):
+            row = ARCHIVE.lookup(stream, record_id)
+            if row is not None:
+                record, archived = record_class.from_dict(row), True
+                break
+        else:
+            return jsonify({'error': 'Unknown record'}), 404
+
+    conn = get_db_connection()
+    events, next_cursor = timeline.page(conn, kind, record, archived, cursor, limit)
+    conn.close()
+    items = PRESCRIPTIONS.items_many(event['id'] for event in events if event['type'] == 'prescription')
+    for event in events:
+        if event['type'] == 'prescription':
+            legacy = event.pop('legacy_text')
+            event['items'] = items.get(event['id'], [])
+            event['text'] = prescriptions.render(event['items']) if event['items'] else prescriptions.legacy_text(legacy)
+    name = record.get('name') if kind == 'patient' else record.get('animal_name')
+    return jsonify({'record': {'kind': kind, 'id': record_id, 'name': name, 'archived': archived},
+                    'events': events, 'next': next_cursor})
+
+@app.route('/api/people')
+def find_people():
+    """People matching ``contact``, or ``name`` (and ``city``), most recently seen first"""
+    if not session.get('doctor_logged_in'):
+        return jsonify({'error': 'Not authorized'}), 401
+    people = IDENTITIES.find(request.args.get('name', ''), request.args.get('city', ''),
+                             request.args.get('contact', ''))
+    return jsonify([{'person_id': person_id, 'visits': visits, 'last_visit': last_visit}
+                    for person_id, visits, last_visit in people])
+
+@app.route('/api/people/<person_id>')
+def get_person(person_id):
+    """Every visit of one person, oldest first, with the vitals taken at each"""
+    if not session.get('doctor_logged_in'):
+        return jsonify({'error': 'Not authorized'}), 401
+    visit_ids = IDENTITIES.visits(person_id)
+    if not visit_ids:
+        return jsonify({'error': 'Unknown person'}), 404
+    patients_data = load_patients()
+    visits = []
+    for visit_id in visit_ids:
+        record, archived = patients_data.get(visit_id), False
+        if record is None:
+            row = ARCHIVE.lookup('patients', visit_id)
+            if row is None:
+                continue
+            record, archived = Patient.from_dict(row), True
+        visit = {name: record.get(name, '') for name in ('id', 'name', 'city', 'submission_date', 'age', 'weight',
+                                                        'bp', 'sugar', 'oxygen', 'blood_group', 'symptoms',
+                                                        'status', 'prescription_date')}
+        visit['archived'] = archived
+        visits.append(visit)
+    return jsonify({'person_id': person_id, 'visits': visits})
+
 @app.route('/api/doctor/chat-patients')
 def get_chat_patients():
     if not session.get('doctor_logged_in'):
@@ -1496,15 +1374,12 @@ def send_chat_message():
             return jsonify({'error': 'Message or image required'}), 400
         
         conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO messages (patient_id, doctor_id, message_type, content, sender_type, image_data)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (patient_id, doctor_id, 'text', message or 'Image message', sender_type, image_data))
+        insert_message(conn, patient_id, doctor_id, message or 'Image message', sender_type, image_data)
         conn.commit()
         conn.close()
         
         # Emit socket event for real-time updates
-        socketio.emit('new_message', {
+        broadcast('new_message', {
             'patient_id': patient_id,
             'doctor_id': doctor_id,
             'message': message,
@@ -1529,10 +1404,7 @@ def send_animal_chat_message():
         image_data = data.get('image_data')
         
         conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO messages (patient_id, doctor_id, message_type, content, sender_type, image_data)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (animal_id, doctor_id, 'text', message or 'Image message', sender_type, image_data))
+        insert_message(conn, animal_id, doctor_id, message or 'Image message', sender_type, image_data)
         conn.commit()
         conn.close()
         
@@ -1541,13 +1413,178 @@ def send_animal_chat_message():
     except Exception as e:
         return jsonify({'error': 'System error'}), 500
 
+def _insert_missing(records):
+    def apply(data):
+        for key, record in records.items():
+            data.setdefault(key, record)
+    return apply
+
+def apply_ingest_batch(kiosk_id, items):
+    """Apply a kiosk's outbox entries; returns ``{key: 'applied'|'duplicate'|'rejected'}``.
+
+    Submissions are only inserted if their id is not known yet, so a
+    replayed entry can never overwrite a prescription written here since.
+    """
+    conn = get_db_connection()
+    keys = [item['key'] for item in items]
+    known = set()
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        known.update(row[0] for row in conn.execute(
+            'SELECT idempotency_key FROM ingest_keys WHERE idempotency_key IN (%s)' % ','.join('?' * len(chunk)),
+            chunk))
+    conn.close()
+
+    results = {}
+    patients, animals, messages = {}, {}, []
+    for item in items:
+        key, kind, payload = item['key'], item.get('kind'), item['payload']
+        if key in known or key in results:
+            results[key] = 'duplicate'
+        elif kind == 'patient' and payload.get('id'):
+            patients[payload['id']] = payload
+            results[key] = 'applied'
+        elif kind == 'animal' and payload.get('animal_id'):
+            animals[payload['animal_id']] = payload
+            results[key] = 'applied'
+        elif kind == 'message' and payload.get('patient_id') and payload.get('doctor_id'):
+            messages.append(payload)
+            results[key] = 'applied'
+        else:
+            results[key] = 'rejected'
+
+    # One store commit per kind, however many submissions the batch carries. They run before
+    # the SQLite transaction is opened: store listeners write the change log on their own
+    # connection, and a replay after a failure below only finds the records already there
+    if patients:
+        PATIENTS.update(_insert_missing(patients), changed=tuple(patients))
+        link_records(IDENTITIES, PATIENTS, patients)
+    if animals:
+        ANIMALS.update(_insert_missing(animals), changed=tuple(animals))
+    conn = get_db_connection()
+    for payload in messages:
+        insert_message(conn, payload['patient_id'], payload['doctor_id'], payload.get('content') or 'Image message',
+                       payload.get('sender_type') or 'patient', payload.get('image_data'))
+    conn.executemany('INSERT OR IGNORE INTO ingest_keys (idempotency_key, kiosk_id) VALUES (?, ?)',
+                     [(key, kiosk_id) for key, result in results.items() if result == 'applied'])
+    conn.commit()
+    conn.close()
+    return results
+
+def has_sync_token():
+    token = request.headers.get('Authorization', '')
+    return bool(config.SYNC_TOKEN) and hmac.compare_digest(token.encode(), f"Bearer {config.SYNC_TOKEN}".encode())
+
+@app.route('/api/ingest/batch', methods=['POST'])
+def ingest_batch():
+    if not has_sync_token():
+        return jsonify({'error': 'Not authorized'}), 401
+    try:
+        batch = decode_batch(request.get_data(), request.headers.get('Content-Encoding'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    kiosk_id = str(batch.get('kiosk_id', ''))
+    results = apply_ingest_batch(kiosk_id, batch['items'])
+    applied = sum(1 for result in results.values() if result == 'applied')
+    print(f"📥 Ingested {applied}/{len(results)} entries from kiosk {kiosk_id}")
+    return jsonify({'results': results})
+
+# Bulk import/export: store and the room told about finished imports
+BULK_KINDS = {'patient': (PATIENTS, 'doctors'), 'animal': (ANIMALS, 'veterinarians')}
+
+@app.route('/api/import/<kind>', methods=['POST'])
+def bulk_import(kind):
+    """Import NDJSON or CSV (optionally gzip-encoded) in one store commit.
+
+    Query options: format=ndjson|csv (else from Content-Type),
+    on_conflict=skip|replace for ids that already exist, dry_run=1 to only
+    validate, strict=1 to write nothing if any line is invalid.
+    """
+    if kind not in BULK_KINDS:
+        return jsonify({'error': 'Unknown kind'}), 404
+    if not session.get('doctor_logged_in') and not has_sync_token():
+        return jsonify({'error': 'Not authorized'}), 401
+    fmt = bulk.detect_format(request.args.get('format'), request.mimetype)
+    on_conflict = request.args.get('on_conflict', 'skip')
+    if fmt not in bulk.FORMATS or on_conflict not in ('skip', 'replace'):
+        return jsonify({'error': 'Unsupported format or on_conflict'}), 400
+
+    report = bulk.parse(kind, request.stream, fmt, request.headers.get('Content-Encoding'))
+    summary = report.summary()
+    summary['imported'] = 0
+    if request.args.get('dry_run'):
+        return jsonify(summary)
+    if report.error_count and request.args.get('strict'):
+        return jsonify(summary), 400
+
+    store, room = BULK_KINDS[kind]
+    incoming = report.records
+    if on_conflict == 'skip':
+        existing = store.records()
+        incoming = {key: record for key, record in incoming.items() if key not in existing}
+
+    def apply(data):
+        count = 0
+        for key, record in incoming.items():
+            if on_conflict == 'replace' or key not in data:
+                data[key] = record
+                count += 1
+        return count
+
+    if incoming:
+        summary['imported'] = store.update(apply, changed=tuple(incoming))
+        if store is PATIENTS:
+            link_records(IDENTITIES, PATIENTS, incoming)
+    summary['skipped'] = len(report.records) - summary['imported']
+
+    # One summary instead of a notification per record
+    broadcast('bulk_import_completed', {
+        'kind': kind,
+        'imported': summary['imported'],
+        'skipped': summary['skipped'],
+        'invalid': summary['invalid']
+    }, room=room)
+    print(f"📥 Bulk import of {kind} records: {summary['imported']} imported, "
+          f"{summary['skipped']} skipped, {summary['invalid']} invalid")
+    return jsonify(summary)
+
+@app.route('/api/export/<kind>')
+def bulk_export(kind):
+    if kind not in BULK_KINDS:
+        return jsonify({'error': 'Unknown kind'}), 404
+    if not session.get('doctor_logged_in') and not has_sync_token():
+        return jsonify({'error': 'Not authorized'}), 401
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in bulk.FORMATS:
+        return jsonify({'error': 'Unsupported format'}), 400
+    store = BULK_KINDS[kind][0]
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(bulk.export_rows(kind, store.records(), fmt), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={kind}s.{fmt}'})
+
+@app.route('/api/maintenance/jobs')
+def maintenance_jobs():
+    if not session.get('doctor_logged_in'):
+        return jsonify({'error': 'Not authorized'}), 401
+    return jsonify({'window': config.MAINTENANCE_WINDOW, 'jobs': SCHEDULER.state()})
+
+@app.route('/api/maintenance/jobs/<name>/run', methods=['POST'])
+def run_maintenance_job(name):
+    """Queue a job for the scheduler's next tick, outside the window if need be"""
+    if not session.get('doctor_logged_in'):
+        return jsonify({'error': 'Not authorized'}), 401
+    try:
+        SCHEDULER.request(name)
+    except KeyError:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'queued': name})
+
 @app.route('/api/doctor/clear', methods=['POST'])
 def clear_all_patients():
     if not session.get('doctor_logged_in'):
         return jsonify({'error': 'Not authorized'}), 401
     
-    patients_data = {}
-    save_patients(patients_data)
+    PATIENTS.clear()
     return jsonify({'success': True})
 
 @app.route('/api/veterinarian/clear', methods=['POST'])
@@ -1559,8 +1596,7 @@ def clear_all_animals():
     if session.get('doctor_type') != 'veterinarian':
         return jsonify({'error': 'Not a veterinarian'}), 403
     
-    animals_data = {}
-    save_animals(animals_data)
+    ANIMALS.clear()
     return jsonify({'success': True})
 
 # Socket.IO Event Handlers
@@ -1568,19 +1604,23 @@ def clear_all_animals():
 def handle_connect():
     """Handle client connection"""
     print(f'🔌 Client connected: {request.sid}')
-    emit('connection_established', {'message': 'Connected to server', 'sid': request.sid})
+    metrics.SOCKET_CONNECTIONS.inc()
+    metrics.SOCKET_CONNECTS.inc()
+    reply('connection_established', {'message': 'Connected to server', 'sid': request.sid})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     print(f'❌ Client disconnected: {request.sid}')
+    metrics.SOCKET_CONNECTIONS.dec()
+    metrics.ROOMS.left(request.sid)
 
 @socketio.on('join_patient_room')
 def handle_join_patient_room(data):
     """Patient joins their specific room"""
     patient_id = data.get('patient_id')
     if patient_id:
-        join_room(f"patient_{patient_id}")
+        join(f"patient_{patient_id}")
         print(f'👤 Patient {patient_id} joined room')
 
 @socketio.on('join_doctor_room')
@@ -1588,7 +1628,7 @@ def handle_join_doctor_room(data):
     """Doctor joins their specific room"""
     doctor_id = data.get('doctor_id')
     if doctor_id:
-        join_room(f"doctor_{doctor_id}")
+        join(f"doctor_{doctor_id}")
         print(f'👨‍⚕️ Doctor {doctor_id} joined room')
 
 @socketio.on('join_chat_room')
@@ -1597,7 +1637,7 @@ def handle_join_chat_room(data):
     patient_id = data.get('patient_id')
     doctor_id = data.get('doctor_id')
     room_id = f"chat_{patient_id}_{doctor_id}"
-    join_room(room_id)
+    join(room_id)
     print(f'💬 User joined chat room: {room_id}')
 
 @socketio.on('send_message')
@@ -1612,15 +1652,12 @@ def handle_send_message(data):
         
         # Save to database
         conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO messages (patient_id, doctor_id, message_type, content, sender_type, image_data)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (patient_id, doctor_id, 'text', message or 'Image message', sender_type, image_data))
+        message_id = insert_message(conn, patient_id, doctor_id, message or 'Image message', sender_type, image_data)
         conn.commit()
         
         # Get the saved message with ID
         saved_message = conn.execute(
-            'SELECT * FROM messages WHERE id = last_insert_rowid()'
+            'SELECT * FROM messages WHERE id = ?', (message_id,)
         ).fetchone()
         conn.close()
         
@@ -1638,10 +1675,10 @@ def handle_send_message(data):
         
         # Broadcast to specific chat room
         room_id = f"chat_{patient_id}_{doctor_id}"
-        emit('new_message', message_data, room=room_id)
+        reply('new_message', message_data, room=room_id)
         
         # Also notify both participants in their personal rooms
-        emit('message_notification', {
+        reply('message_notification', {
             'patient_id': patient_id,
             'doctor_id': doctor_id,
             'message': message,
@@ -1649,7 +1686,7 @@ def handle_send_message(data):
             'timestamp': datetime.now().isoformat()
         }, room=f"patient_{patient_id}")
         
-        emit('message_notification', {
+        reply('message_notification', {
             'patient_id': patient_id,
             'doctor_id': doctor_id,
             'message': message,
@@ -1661,7 +1698,7 @@ def handle_send_message(data):
         
     except Exception as e:
         print(f'❌ Error sending message: {str(e)}')
-        emit('message_error', {'error': 'Failed to send message'})
+        reply('message_error', {'error': 'Failed to send message'})
 
 @socketio.on('typing_start')
 def handle_typing_start(data):
@@ -1671,7 +1708,7 @@ def handle_typing_start(data):
     sender_type = data.get('sender_type')
     
     room_id = f"chat_{patient_id}_{doctor_id}"
-    emit('user_typing', {
+    reply('user_typing', {
         'patient_id': patient_id,
         'doctor_id': doctor_id,
         'sender_type': sender_type,
@@ -1686,7 +1723,7 @@ def handle_typing_stop(data):
     sender_type = data.get('sender_type')
     
     room_id = f"chat_{patient_id}_{doctor_id}"
-    emit('user_typing', {
+    reply('user_typing', {
         'patient_id': patient_id,
         'doctor_id': doctor_id,
         'sender_type': sender_type,
@@ -1697,42 +1734,54 @@ def handle_typing_stop(data):
 @socketio.on('new_patient_notification')
 def handle_new_patient_notification(data):
     """Notify doctors about new patients"""
-    emit('new_patient_alert', data, room='doctors')
+    reply('new_patient_alert', data, room='doctors')
     print(f'🆕 New patient notification: {data}')
 
 @socketio.on('new_animal_patient_notification')
 def handle_new_animal_patient(data):
     """Notify veterinarians about new animal patients"""
-    emit('new_animal_patient_alert', data, room='veterinarians')
+    reply('new_animal_patient_alert', data, room='veterinarians')
     print(f'🐾 New animal patient: {data}')
 
 @socketio.on('prescription_notification')
 def handle_prescription_notification(data):
     """Notify patients about new prescriptions"""
     patient_id = data.get('patient_id')
-    emit('prescription_ready', data, room=f"patient_{patient_id}")
+    reply('prescription_ready', data, room=f"patient_{patient_id}")
     print(f'📝 Prescription ready for patient: {patient_id}')
 
 @socketio.on('animal_prescription_notification')
 def handle_animal_prescription(data):
     """Notify animal owners about prescriptions"""
     animal_id = data.get('animal_id')
-    emit('animal_prescription_ready', data, room=f"animal_{animal_id}")
+    reply('animal_prescription_ready', data, room=f"animal_{animal_id}")
     print(f'🐾 Animal prescription ready: {animal_id}')
 
 # Join specific notification rooms
 @socketio.on('join_doctors_room')
 def handle_join_doctors_room():
     """Doctors join the general doctors room for notifications"""
-    join_room('doctors')
+    join('doctors')
     print(f'👨‍⚕️ Doctor joined doctors room: {request.sid}')
 
 @socketio.on('join_veterinarians_room')
 def handle_join_veterinarians_room():
     """Veterinarians join their notification room"""
-    join_room('veterinarians')
+    join('veterinarians')
     print(f'🐾 Veterinarian joined room: {request.sid}')
 
+@socketio.on('sync_changes')
+def handle_sync_changes(data):
+    """Send a dashboard the records changed since the sequence it last applied"""
+    stream = data.get('stream')
+    if not can_sync(stream):
+        return
+    try:
+        since = int(data.get('since') or 0)
+    except (TypeError, ValueError):
+        since = 0
+    reply('changes', changes_payload(stream, since))
+
 if __name__ == '__main__':
     print("🚀 Health Kiosk Server Starting with Socket.IO...")
     print("📍 Patient Portal: http://127.0.0.1:5000/patient/welcome")
@@ -1754,5 +1803,5 @@ if __name__ == '__main__':
     socketio.run(app, 
                 host="0.0.0.0", 
                 port=5000, 
-                debug=True, 
+                debug=not config.PRODUCTION, 
                 allow_unsafe_werkzeug=True)
\ No newline at end of file
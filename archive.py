@@ -0,0 +1,145 @@
+"""Read-only cold storage for records moved out of the hot stores.
+
+The archive jobs write each batch of old records as one segment under
+``archive/<stream>/``:
+
+``<name>.seg``
+    independently gzip-compressed blocks of up to BLOCK_SIZE NDJSON records
+``<name>.idx``
+    small JSON index: record id -> block number, plus each block's
+    (offset, length) in the segment
+
+Looking a record up reads the indexes (cached until they change), then
+decompresses the one block that holds it. Segments are never modified; if
+a record is archived twice, the newest segment wins.
+"""
+import argparse
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+
+from storage import atomic_write
+
+ARCHIVE_DIR = 'archive'
+BLOCK_SIZE = 256
+INDEX_VERSION = 1
+
+
+def write_segment(stream, rows, key, root=ARCHIVE_DIR):
+    """Write ``rows`` (dicts carrying ``key``) as a new segment; returns its path"""
+    directory = os.path.join(root, stream)
+    os.makedirs(directory, exist_ok=True)
+    name = f"{datetime.now():%Y%m%d%H%M%S%f}"
+    blocks, ids, chunks, offset = [], {}, [], 0
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        for row in block:
+            ids[str(row[key])] = len(blocks)
+        data = gzip.compress(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in block).encode('utf-8'),
+                             compresslevel=9)
+        blocks.append((offset, len(data)))
+        chunks.append(data)
+        offset += len(data)
+    segment = os.path.join(directory, name + '.seg')
+    atomic_write(segment, b''.join(chunks))
+    # The index is written last: a segment without one is ignored by readers
+    index = {'version': INDEX_VERSION, 'stream': stream, 'key': key, 'count': len(rows),
+             'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'blocks': blocks, 'ids': ids}
+    atomic_write(os.path.join(directory, name + '.idx'), json.dumps(index, separators=(',', ':')).encode('utf-8'))
+    return segment
+
+
+class Archive:
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _index(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        entry = self._indexes.get(path)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        with open(path, 'rb') as f:
+            index = json.loads(f.read().decode('utf-8'))
+        with self._lock:
+            self._indexes[path] = (mtime, index)
+        return index
+
+    def segments(self, stream):
+        """Index paths for ``stream``, newest first"""
+        directory = os.path.join(self.root, stream)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name) for name in sorted(names, reverse=True) if name.endswith('.idx')]
+
+    def _read_block(self, index_path, index, block_no):
+        offset, length = index['blocks'][block_no]
+        with open(index_path[:-4] + '.seg', 'rb') as f:
+            f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        return [json.loads(line) for line in data.decode('utf-8').splitlines() if line]
+
+    def lookup(self, stream, record_id):
+        """Return the archived record ``record_id`` of ``stream`` as a dict, or None"""
+        record_id = str(record_id)
+        for path in self.segments(stream):
+            index = self._index(path)
+            block_no = index['ids'].get(record_id)
+            if block_no is None:
+                continue
+            for row in self._read_block(path, index, block_no):
+                if str(row.get(index['key'])) == record_id:
+                    return row
+        return None
+
+    def iter_records(self, stream):
+        """Yield every archived record of ``stream`` (older duplicates included)"""
+        for path in reversed(self.segments(stream)):
+            index = self._index(path)
+            for block_no in range(len(index['blocks'])):
+                yield from self._read_block(path, index, block_no)
+
+    def stats(self):
+        streams = {}
+        try:
+            names = sorted(os.listdir(self.root))
+        except FileNotFoundError:
+            return streams
+        for stream in names:
+            paths = self.segments(stream)
+            if not paths:
+                continue
+            size = sum(os.path.getsize(path[:-4] + '.seg') for path in paths)
+            streams[stream] = {'segments': len(paths), 'records': sum(self._index(p)['count'] for p in paths),
+                               'bytes': size}
+        return streams
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the Health Kiosk record archive")
+    parser.add_argument('--root', default=ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help="segments, records and bytes per stream")
+    get = sub.add_parser('get', help="print one archived record")
+    get.add_argument('stream')
+    get.add_argument('record_id')
+    args = parser.parse_args(argv)
+
+    archive = Archive(args.root)
+    if args.command == 'stats':
+        for stream, info in archive.stats().items():
+            print(f"🗄️ {stream}: {info['records']} records in {info['segments']} segments, {info['bytes']} bytes")
+    else:
+        record = archive.lookup(args.stream, args.record_id)
+        if record is None:
+            raise SystemExit(f"❌ {args.record_id} is not archived in {args.stream}")
+        print(json.dumps(record, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Static asset fingerprinting and response compression.
+
+``asset_url('js/doctor_chat.js')`` in a template points at
+``/assets/<digest>/js/doctor_chat.js``. The digest changes with the file's
+content, so those URLs are served with a one-year ``immutable``
+Cache-Control and browsers never revalidate them. HTML, JSON, JS and CSS
+responses are gzip-compressed (brotli when the ``brotli`` package is
+installed and the client accepts it), which matters most on 2G/3G links.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import abort, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+COMPRESSIBLE = ('text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript',
+                'text/javascript', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 500
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Dropping the client into static/vendor/ lets offline kiosks serve it locally
+SOCKETIO_CLIENT = 'vendor/socket.io.min.js'
+SOCKETIO_CLIENT_CDN = 'https://cdnjs.cloudflare.com/ajax/libs/socket.io/4.0.1/socket.io.min.js'
+
+
+class AssetManifest:
+    """Content digests of the files in the static folder, refreshed when a file's mtime changes"""
+
+    def __init__(self, root):
+        self.root = root
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def digest(self, filename):
+        path = safe_join(self.root, filename)
+        if path is None:
+            raise OSError(f"{filename} is outside the static folder")
+        mtime = os.stat(path).st_mtime_ns
+        entry = self._digests.get(filename)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        with open(path, 'rb') as f:
+            value = hashlib.sha1(f.read()).hexdigest()[:10]
+        with self._lock:
+            self._digests[filename] = (mtime, value)
+        return value
+
+    def warm(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                self.digest(os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/'))
+
+
+class CompressedCache:
+    """Compressed bodies of ETagged responses, so cached pages are not re-compressed"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+compressed_cache = CompressedCache()
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def negotiate(accept_encoding):
+    for encoding in ENCODINGS:
+        if encoding in accept_encoding:
+            return encoding
+    return None
+
+
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+
+    etag, weak = response.get_etag()
+    compressed = compressed_cache.get((etag, encoding)) if etag else None
+    if compressed is None:
+        compressed = _compress(body, encoding)
+        if etag:
+            compressed_cache.put((etag, encoding), compressed)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        # Each encoding is a distinct representation and needs its own tag
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def etag_variants(etag):
+    """All the tags a client may hold for ``etag`` after compression"""
+    return [etag] + [f"{etag}-{encoding}" for encoding in ('gzip', 'br')]
+
+
+def init_app(app):
+    manifest = AssetManifest(app.static_folder)
+    manifest.warm()
+
+    def asset_url(filename):
+        return url_for('fingerprinted_asset', digest=manifest.digest(filename), filename=filename)
+
+    @app.route('/assets/<digest>/<path:filename>')
+    def fingerprinted_asset(digest, filename):
+        try:
+            current = manifest.digest(filename)
+        except OSError:
+            abort(404)
+        response = send_from_directory(app.static_folder, filename)
+        if response.status_code == 200 and response.mimetype in COMPRESSIBLE:
+            # Buffer text assets so compress_response can serve them gzipped
+            response.direct_passthrough = False
+            response.set_data(response.get_data())
+            response.set_etag(current)
+        if digest == current:
+            response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    def socketio_client_url():
+        if os.path.exists(os.path.join(app.static_folder, SOCKETIO_CLIENT)):
+            return asset_url(SOCKETIO_CLIENT)
+        return SOCKETIO_CLIENT_CDN
+
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.jinja_env.globals['socketio_client_url'] = socketio_client_url
+    app.after_request(compress_response)
+    return manifest
@@ -0,0 +1,292 @@
+"""Latency of the kiosk's HTTP and Socket.IO paths.
+
+    python benchmarks/bench_app.py --json results.json
+    python benchmarks/bench_app.py --sizes 1000,10000 --compare results.json
+
+Imports app.py inside a scratch directory, so it gets its own stores and
+healthcare.db, and drives it with Flask's and Flask-SocketIO's test
+clients: no port is opened and the numbers leave out network time. Each
+case runs one untimed warm-up, then reports mean/p50/p95/max seconds
+(stores above 10k records get proportionally fewer iterations).
+With ``--compare``, cases whose p50 grew by more than ``--threshold``
+against an earlier results file are listed and the exit status is 1.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_codecs import make_patients
+
+DOCTOR = {'doctor_logged_in': True, 'doctor_name': 'Pratik', 'doctor_id': 'doc_pratik', 'doctor_type': 'human'}
+# Roughly what a phone camera photo is after the chat page scales it down
+IMAGE_DATA = 'data:image/jpeg;base64,' + 'A' * 60000
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(name, params, fn, iterations, before=None):
+    """Time ``fn(i)`` ``iterations`` times after one warm-up; ``before(i)`` runs untimed"""
+    samples = []
+    for i in range(-1, iterations):
+        if before is not None:
+            before(i)
+        start = time.perf_counter()
+        fn(i)
+        elapsed = time.perf_counter() - start
+        if i >= 0:
+            samples.append(elapsed)
+    ordered = sorted(samples)
+    mean = sum(samples) / len(samples)
+    return {
+        "name": name, "params": params, "iterations": len(samples),
+        "mean": mean, "p50": percentile(ordered, 0.5), "p95": percentile(ordered, 0.95), "max": ordered[-1],
+        "ops_per_second": 1 / mean if mean else None,
+    }
+
+
+def expect(response, status=200):
+    assert response.status_code == status, f"{response.request.path} returned {response.status_code}"
+    return response
+
+
+def load_app(workdir):
+    """Import app.py with ``workdir`` as its data directory"""
+    os.chdir(workdir)
+    os.environ['HEALTHKIOSK_SCHEDULER'] = '0'
+    os.environ['HEALTHKIOSK_TEMPLATE_CACHE'] = ''
+    os.environ['HEALTHKIOSK_CENTRAL_URL'] = ''
+    os.environ['HEALTHKIOSK_ENV'] = 'production'
+    # Socket.IO is created with logger=True; per-packet logging would dominate the timings
+    logging.disable(logging.INFO)
+    import app
+    return app
+
+
+def doctor_client(app):
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(DOCTOR)
+    return client
+
+
+def seed_messages(conversations, per_conversation, image_every=0, doctor_id='doc_pratik'):
+    """Insert chat history straight into SQLite, one second apart"""
+    start = datetime(2025, 1, 1)
+    rows = []
+    for patient_id in conversations:
+        for n in range(per_conversation):
+            image = IMAGE_DATA if image_every and n % image_every == 0 else None
+            rows.append((patient_id, doctor_id, f"message {n} about the fever",
+                         (start + timedelta(seconds=len(rows))).strftime("%Y-%m-%d %H:%M:%S"),
+                         'patient' if n % 2 else 'doctor', image))
+    conn = sqlite3.connect('healthcare.db')
+    conn.executemany('''
+        INSERT INTO messages (patient_id, doctor_id, message_type, content, timestamp, sender_type, image_data)
+        VALUES (?, ?, 'text', ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def clear_messages():
+    conn = sqlite3.connect('healthcare.db')
+    conn.execute('DELETE FROM messages')
+    conn.commit()
+    conn.close()
+
+
+def bench_store_paths(app, size, iterations):
+    """Form submission, dashboards and search against a store of ``size`` patients"""
+    app.PATIENTS.save(make_patients(size))
+    client = app.app.test_client()
+    doctor = doctor_client(app)
+    params = {"records": size}
+    results = []
+
+    def submit(i):
+        expect(client.post('/patient', data={
+            'name': f"bench patient {i + 1}", 'city': 'koppal', 'age': '34', 'weight': '61', 'bp': '120/80',
+            'sugar': '110', 'oxygen': '98', 'blood_group': 'O+', 'symptoms': 'fever and cough'}))
+    results.append(measure('patient_submit', params, submit, iterations))
+
+    results.append(measure('doctor_dashboard', params, lambda i: expect(doctor.get('/doctor/dashboard')), iterations))
+    results.append(measure('doctor_dashboard_uncached', params, lambda i: expect(doctor.get('/doctor/dashboard')),
+                           iterations, before=lambda i: app.httpcache.response_cache.clear()))
+    results.append(measure('doctor_dashboard_search', params,
+                           lambda i: expect(doctor.get('/doctor/dashboard?search=patient 1')), iterations,
+                           before=lambda i: app.httpcache.response_cache.clear()))
+    results.append(measure('patient_search', params,
+                           lambda i: expect(client.post('/patient/search', data={'patient_id': 'patient 1'})),
+                           iterations))
+    return results
+
+
+def bench_chat_messages(app, length, image_every, iterations):
+    clear_messages()
+    seed_messages(['patient_chat'], length, image_every)
+    client = app.app.test_client()
+
+    def fetch(i):
+        messages = expect(client.get('/api/chat/messages/patient_chat/doc_pratik')).get_json()['messages']
+        assert len(messages) == length
+    return measure('chat_messages', {"messages": length, "image_every": image_every}, fetch, iterations)
+
+
+def bench_chat_patients(app, conversations, iterations):
+    clear_messages()
+    patient_ids = list(app.PATIENTS.records())[:conversations]
+    assert len(patient_ids) == conversations, "store has fewer patients than conversations"
+    seed_messages(patient_ids, 5)
+    doctor = doctor_client(app)
+
+    def fetch(i):
+        assert len(expect(doctor.get('/api/doctor/chat-patients')).get_json()) == conversations
+    return measure('chat_patients', {"conversations": conversations}, fetch, iterations)
+
+
+def bench_socket_fanout(app, clients, iterations):
+    """One broadcast to the doctors room, delivered to ``clients`` connected dashboards"""
+    doctor = doctor_client(app)
+    sockets = [app.socketio.test_client(app.app, flask_test_client=doctor) for _ in range(clients)]
+    for socket in sockets:
+        socket.emit('join_doctors_room')
+        socket.get_received()
+
+    def drain(i):
+        for socket in sockets:
+            socket.get_received()
+
+    def broadcast(i):
+        app.socketio.emit('records_changed', {'stream': 'patients', 'seq': i}, room='doctors')
+
+    results = [measure('socket_fanout', {"clients": clients}, broadcast, iterations, before=drain)]
+    drain(None)
+    broadcast(None)
+    assert all(len(socket.get_received()) == 1 for socket in sockets), "broadcast not delivered to every client"
+
+    # Chat message from one participant: SQLite insert plus three room emits
+    sockets[0].emit('join_chat_room', {'patient_id': 'patient_chat', 'doctor_id': 'doc_pratik'})
+
+    def send(i):
+        sockets[0].emit('send_message', {'patient_id': 'patient_chat', 'doctor_id': 'doc_pratik',
+                                         'message': f"message {i}", 'sender_type': 'doctor'})
+    results.append(measure('socket_send_message', {"clients": clients}, send, iterations,
+                           before=lambda i: sockets[0].get_received()))
+    for socket in sockets:
+        socket.disconnect()
+    return results
+
+
+def run(args):
+    results = []
+    app = load_app(args.workdir)
+    for size in args.sizes:
+        print(f"⏱️ store paths with {size} patients", file=sys.stderr)
+        # A 100k-record save or uncached render takes seconds; fewer rounds keep the run short
+        iterations = max(3, min(args.iterations, args.iterations * 10000 // size))
+        results.extend(bench_store_paths(app, size, iterations))
+    for length in args.messages:
+        for image_every in (0, 10):
+            print(f"⏱️ chat history of {length} messages, image every {image_every or '-'}", file=sys.stderr)
+            results.append(bench_chat_messages(app, length, image_every, args.iterations))
+    app.PATIENTS.save(make_patients(max(args.conversations)))
+    for conversations in args.conversations:
+        print(f"⏱️ chat patient list with {conversations} conversations", file=sys.stderr)
+        results.append(bench_chat_patients(app, conversations, args.iterations))
+    for clients in args.clients:
+        print(f"⏱️ socket fan-out to {clients} clients", file=sys.stderr)
+        results.extend(bench_socket_fanout(app, clients, args.iterations))
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def result_key(result):
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """Return ``(result, baseline result, ratio)`` for cases slower than the baseline by ``threshold``"""
+    previous = {result_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before and before['p50']:
+            ratio = result['p50'] / before['p50']
+            if ratio > 1 + threshold:
+                regressions.append((result, before, ratio))
+    return regressions
+
+
+def int_list(value):
+    return [int(part) for part in value.split(',') if part]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int_list, default=[1000, 10000, 100000], help="patient store sizes")
+    parser.add_argument('--messages', type=int_list, default=[100, 1000], help="chat history lengths")
+    parser.add_argument('--conversations', type=int_list, default=[10, 100, 1000])
+    parser.add_argument('--clients', type=int_list, default=[10, 100, 500], help="connected Socket.IO clients")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--compare', help="results file from an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed p50 slowdown, 0.25 = 25%%")
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directory")
+    args = parser.parse_args()
+
+    args.workdir = tempfile.mkdtemp(prefix='healthkiosk-bench-')
+    try:
+        # Route handlers print per request; keep that out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            results = run(args)
+    finally:
+        os.chdir(ROOT)
+        if not args.keep:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    print(f"{'case':<28}{'params':<34}{'p50 ms':>10}{'p95 ms':>10}{'ops/s':>10}")
+    for r in results:
+        params = ' '.join(f"{k}={v}" for k, v in r['params'].items())
+        print(f"{r['name']:<28}{params:<34}{r['p50'] * 1000:>10.2f}{r['p95'] * 1000:>10.2f}{r['ops_per_second']:>10.1f}")
+    report = {"meta": metadata(), "results": results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for result, before, ratio in regressions:
+            print(f"❌ {result['name']} {result['params']}: p50 {before['p50'] * 1000:.2f} -> "
+                  f"{result['p50'] * 1000:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No case slower than {args.threshold:.0%} over the baseline")
+
+
+if __name__ == '__main__':
+    main()
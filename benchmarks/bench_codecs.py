@@ -0,0 +1,99 @@
+"""Load/save throughput of the record store codecs.
+
+    python benchmarks/bench_codecs.py --records 10000 --json results.json
+
+Builds synthetic patient and animal stores shaped like the ones written by
+app.py, then times encode/decode for every codec in serialization.CODECS.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialization
+
+VILLAGES = ['gangavathi', 'koppal', 'hospet', 'sindhanur', 'raichur', 'bellary']
+SYMPTOMS = ['fever and cough', 'headache', 'stomach pain since two days', 'joint pain', 'dizziness']
+
+
+def make_patients(count, seed=1):
+    rng = random.Random(seed)
+    patients = {}
+    for i in range(count):
+        ts = f"2025{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{i % 240000:06d}"
+        pid = f"patient_{i}_{ts}"
+        prescribed = rng.random() < 0.6
+        patients[pid] = {
+            "id": pid, "name": f"patient {i}", "city": rng.choice(VILLAGES),
+            "age": str(rng.randint(1, 90)), "weight": str(rng.randint(8, 110)),
+            "bp": f"{rng.randint(90, 160)}/{rng.randint(60, 100)}", "sugar": str(rng.randint(70, 300)),
+            "oxygen": str(rng.randint(85, 100)), "blood_group": rng.choice(['A+', 'B+', 'O+', 'AB+', 'O-']),
+            "symptoms": rng.choice(SYMPTOMS),
+            "prescription": "Paracetamol 500mg twice a day for 3 days" if prescribed else "",
+            "timestamp": ts, "status": "prescribed" if prescribed else "waiting",
+            "doctor_name": "Pratik" if prescribed else "", "prescription_date": "",
+            "submission_date": "2025-01-01 10:00:00"
+        }
+    return patients
+
+
+def make_diets(count, seed=1):
+    rng = random.Random(seed)
+    meal = {"breakfast": "Poha with vegetables", "lunch": "Rice, dal, sabzi", "snacks": "Fruit", "dinner": "Roti + dal"}
+    return {
+        f"diet_{i}": {
+            "diet_id": f"diet_{i}", "diet_type": rng.choice(['vegetarian', 'eggitarian', 'non_vegetarian']),
+            "age": str(rng.randint(7, 80)), "diet_plan": [dict(meal, day=day) for day in range(1, 6)]
+        }
+        for i in range(count)
+    }
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(records, repeat):
+    results = []
+    for dataset_name, data in (('patients', make_patients(records)), ('balance_diet', make_diets(records // 10 or 1))):
+        for name, codec in sorted(serialization.CODECS.items()):
+            payload = codec.encode(data)
+            assert codec.decode(payload) == data, f"{name} did not round-trip {dataset_name}"
+            save = best_of(lambda: codec.encode(data), repeat)
+            load = best_of(lambda: codec.decode(payload), repeat)
+            results.append({
+                "dataset": dataset_name, "codec": name, "records": len(data), "bytes": len(payload),
+                "save_seconds": save, "load_seconds": load,
+                "save_records_per_second": len(data) / save, "load_records_per_second": len(data) / load,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="also write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.records, args.repeat)
+    print(f"{'dataset':<14}{'codec':<13}{'bytes':>12}{'save ms':>10}{'load ms':>10}")
+    for r in results:
+        print(f"{r['dataset']:<14}{r['codec']:<13}{r['bytes']:>12}{r['save_seconds'] * 1000:>10.1f}{r['load_seconds'] * 1000:>10.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+"""Realistic synthetic kiosk data for benchmarks and capacity planning.
+
+    python benchmarks/datagen.py --out /tmp/kiosk --patients 1000000 --animals 200000 \\
+        --diets 20000 --conversations 50000
+    python benchmarks/datagen.py --out /tmp/kiosk-bin --codec binary --patients 1000000
+    python benchmarks/datagen.py --out /tmp/upload --format csv --patients 100000
+
+Records have the shapes written by patient(), animal_health_submit(),
+generate_balance_diet(), the prescription views and the chat handlers.
+Villages follow a long-tailed distribution, vitals depend on age,
+older submissions are more likely to be prescribed, and conversation
+lengths and photo sizes are log-normal.
+
+The default ``store`` format imports app.py with ``--out`` as its data
+directory. Each JSON store is then written in one save() with the chosen
+codec, and healthcare.db is filled with executemany() in batches. The
+change log records a reset for each store. ``ndjson`` and ``csv`` instead
+write upload files for /api/import/<kind>.
+"""
+import argparse
+import base64
+import csv
+import json
+import logging
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bulk
+import serialization
+from prescriptions import ITEM_FIELDS, parse as parse_prescription
+from records import Animal, Patient
+
+VILLAGES = ['gangavathi', 'koppal', 'hospet', 'sindhanur', 'raichur', 'kushtagi', 'yelburga', 'karatagi',
+            'kanakagiri', 'munirabad', 'hulagi', 'bhagyanagar', 'irakalgada', 'hitnal', 'alavandi', 'kinnal',
+            'tavaragera', 'hanumasagar', 'mudhol', 'kuknoor', 'bevoor', 'mangalore', 'talkal', 'hirebenakal',
+            'sriramanagar', 'maski', 'lingasugur', 'manvi', 'siruguppa', 'kampli', 'mariyammanahalli',
+            'hagaribommanahalli', 'huvina hadagali', 'kudligi', 'sandur', 'ballari', 'tekkalakote', 'gadag',
+            'mundargi', 'naregal']
+FIRST_NAMES = ['Ramesh', 'Suresh', 'Mahesh', 'Basavaraj', 'Hanumanthappa', 'Mallikarjun', 'Shivappa', 'Yallappa',
+               'Manjunath', 'Raghavendra', 'Pratik', 'Shreyas', 'Gavish', 'Preetam', 'Aditya', 'Lakshmi',
+               'Savitri', 'Gangamma', 'Renuka', 'Shantamma', 'Kavya', 'Pooja', 'Anitha', 'Sunitha', 'Meena',
+               'Parvati', 'Yellamma', 'Bhagya', 'Sharanamma', 'Nagaraj', 'Veeresh', 'Siddappa', 'Kotresh',
+               'Ravi', 'Anil', 'Sunil', 'Kiran', 'Prakash', 'Geetha', 'Jyothi']
+SURNAMES = ['Patil', 'Gowda', 'Naik', 'Hiremath', 'Kulkarni', 'Desai', 'Angadi', 'Badiger', 'Pujar', 'Talwar',
+            'Madiwalar', 'Hosamani', 'Kambar', 'Lamani', 'Nayak', 'Reddy', 'Shetty', 'Joshi', 'Biradar',
+            'Chalavadi', 'Doddamani', 'Kumbar', 'Walikar', 'Sajjan', 'Yadav']
+# Approximate ABO/Rh frequencies in Karnataka
+BLOOD_GROUPS = (('B+', 31), ('O+', 30), ('A+', 21), ('AB+', 8), ('O-', 3), ('B-', 3), ('A-', 2), ('AB-', 2))
+COMPLAINTS = ['fever', 'cough', 'cold', 'headache', 'body pain', 'stomach pain', 'loose motions', 'vomiting',
+              'joint pain', 'back pain', 'dizziness', 'weakness', 'chest pain', 'breathing difficulty',
+              'burning urination', 'skin rash', 'itching', 'eye irritation', 'ear pain', 'tooth pain',
+              'sore throat', 'swelling in legs', 'loss of appetite', 'sleeplessness', 'high sugar',
+              'blood pressure check', 'wound on foot', 'irregular periods']
+ANIMALS = {
+    'cow': (35, ['hallikar', 'amrit mahal', 'khillari', 'deoni', 'jersey cross', 'hf cross', 'local'], (1, 18), (90, 450)),
+    'buffalo': (25, ['murrah', 'surti', 'pandharpuri', 'local'], (1, 20), (150, 600)),
+    'goat': (18, ['osmanabadi', 'bidri', 'nandidurga', 'local'], (1, 10), (8, 60)),
+    'sheep': (10, ['deccani', 'bellary', 'mandya', 'local'], (1, 10), (10, 50)),
+    'dog': (7, ['pariah', 'mudhol hound', 'labrador', 'german shepherd'], (1, 14), (5, 40)),
+    'hen': (5, ['giriraja', 'swarnadhara', 'local'], (1, 5), (1, 4)),
+}
+ANIMAL_CONDITIONS = (('sick', 45), ('weak', 15), ('injured', 12), ('pregnant', 10), ('healthy', 18))
+ANIMAL_COMPLAINTS = ['not eating', 'fever', 'less milk', 'limping', 'swollen udder', 'diarrhoea', 'bloating',
+                     'cough', 'nasal discharge', 'wound on leg', 'ticks', 'mouth sores', 'not drinking water',
+                     'weakness', 'abortion', 'eye discharge', 'hair loss']
+MEDICINES = ['Paracetamol 500mg', 'Amoxicillin 500mg', 'Cetirizine 10mg', 'ORS sachets', 'Pantoprazole 40mg',
+             'Metformin 500mg', 'Amlodipine 5mg', 'Ibuprofen 400mg', 'Azithromycin 500mg', 'Iron and folic acid',
+             'Calcium + vitamin D3', 'Vitamin B complex', 'Cough syrup 10ml', 'Diclofenac gel']
+DOSAGES = ['once a day', 'twice a day after food', 'three times a day', 'at night', 'when needed']
+VET_MEDICINES = ['Oxytetracycline injection', 'Meloxicam', 'Ivermectin', 'Albendazole bolus', 'Mineral mixture 50g',
+                 'Calcium gel', 'Antiseptic spray', 'Liver tonic 50ml', 'Enrofloxacin']
+DOCTORS = (('doc_pratik', 'Pratik', 70), ('doc_3', 'Pratik. K', 15), ('doc_5', 'preetam', 10), ('doc_7', 'gavish', 5))
+VETERINARIAN = ('doc_shreyas', 'Shreyas')
+CHAT_LINES = ['hi', 'hello doctor', 'namaskara', 'fever is still there', 'I took the tablets', 'when should I come',
+              'thank you doctor', 'pain is less today', 'can I eat rice', 'please check the photo',
+              'sugar reading is high in morning', 'ok', 'yes', 'no', 'since yesterday night', 'how many days']
+DOCTOR_LINES = ['Hello, how are you feeling now?', 'Continue the tablets for three more days.',
+                'Please send a photo of the affected area.', 'Drink plenty of water and take rest.',
+                'Come to the kiosk tomorrow morning for a check.', 'Avoid oily food for a week.',
+                'Take the medicine after food.', 'If the fever continues, visit the PHC.', 'Ok, noted.']
+DIET_TYPES = (('vegetarian', 55), ('eggitarian', 20), ('non_vegetarian', 25))
+OCCUPATIONS = ['farmer', 'student', 'teacher', 'labourer', 'housewife', 'shopkeeper', 'driver', 'retired']
+DISEASES = (('none', 50), ('diabetes', 18), ('hypertension', 14), ('obesity', 8), ('anaemia', 6), ('thyroid', 4))
+
+
+def weighted(pairs):
+    values = [value for value, _ in pairs]
+    cumulative, total = [], 0
+    for _, weight in pairs:
+        total += weight
+        cumulative.append(total)
+    return values, cumulative
+
+
+def clip(value, low, high):
+    return max(low, min(high, value))
+
+
+class Generator:
+    """Seeded record factory; each method returns one record dict"""
+
+    def __init__(self, seed=1, days=365, image_rate=0.06, now=None):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.image_rate = image_rate
+        self.now = now or datetime.now().replace(microsecond=0)
+        # Zipf-like: a few big villages send most of the visitors
+        self.villages = weighted([(name, 1 / (rank + 1) ** 1.1) for rank, name in enumerate(VILLAGES)])
+        self.blood_groups = weighted(BLOOD_GROUPS)
+        self.animal_types = weighted([(name, spec[0]) for name, spec in ANIMALS.items()])
+        self.conditions = weighted(ANIMAL_CONDITIONS)
+        self.doctors = weighted([((doctor_id, name), weight) for doctor_id, name, weight in DOCTORS])
+        self.diet_types = weighted(DIET_TYPES)
+        self.diseases = weighted(DISEASES)
+        self.ids = set()
+        # Chat photos are JPEG: incompressible bytes, so slices of one random pool will do
+        self.image_pool = bytes(self.rng.getrandbits(8) for _ in range(1 << 16)) * 32
+
+    def pick(self, table):
+        values, cumulative = table
+        return self.rng.choices(values, cum_weights=cumulative)[0]
+
+    def unique(self, key):
+        # The forms build ids from a second-resolution timestamp; bulk loads need a suffix on collisions
+        candidate, n = key, 1
+        while candidate in self.ids:
+            n += 1
+            candidate = f"{key}_{n}"
+        self.ids.add(candidate)
+        return candidate
+
+    def moment(self):
+        """A submission time within ``days``, mostly during kiosk hours"""
+        rng = self.rng
+        day = self.now - timedelta(days=rng.random() * self.days)
+        hour = clip(int(rng.gauss(12.5, 2.8)), 7, 20)
+        return min(self.now, day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60)))
+
+    def reply_delay(self):
+        """Minutes until a doctor answers: median ~40, long tail"""
+        return timedelta(minutes=clip(self.rng.lognormvariate(math.log(40), 1.0), 2, 3 * 24 * 60))
+
+    def is_prescribed(self, submitted):
+        age_hours = (self.now - submitted).total_seconds() / 3600
+        return self.rng.random() < (0.97 if age_hours > 48 else 0.5)
+
+    def person_name(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(SURNAMES)}"
+
+    def symptoms(self, pool):
+        rng = self.rng
+        parts = rng.sample(pool, rng.choices((1, 2, 3), (55, 35, 10))[0])
+        text = ' and '.join(parts)
+        if rng.random() < 0.6:
+            text += f" since {rng.choice(('1', '2', '3', '4', '5', '7', '10', '15'))} days"
+        return text.capitalize() if rng.random() < 0.5 else text
+
+    def prescription(self, medicines):
+        rng = self.rng
+        lines = [f"{name} {rng.choice(DOSAGES)} for {rng.choice((3, 5, 7, 10))} days"
+                 for name in rng.sample(medicines, rng.choice((1, 2, 2, 3)))]
+        return '\n'.join(lines)
+
+    def patient(self):
+        rng = self.rng
+        submitted = self.moment()
+        age = int(rng.choices((rng.uniform(1, 15), rng.uniform(15, 30), rng.uniform(30, 45), rng.uniform(45, 60),
+                               rng.uniform(60, 90)), (18, 22, 22, 20, 18))[0])
+        weight = 3 + 2.6 * age + rng.gauss(0, 3) if age < 15 else rng.gauss(58, 11)
+        systolic = clip(int(rng.gauss(115 + 0.5 * max(0, age - 30), 15)), 85, 210)
+        diastolic = clip(int(systolic * 0.62 + rng.gauss(0, 7)), 50, 130)
+        if rng.random() < 0.14:
+            sugar = clip(int(rng.lognormvariate(math.log(210), 0.3)), 90, 450)
+        else:
+            sugar = clip(int(rng.gauss(105, 16)), 65, 180)
+        oxygen = rng.gauss(97.5, 1.2) if rng.random() < 0.92 else rng.gauss(91, 3)
+        name = self.person_name()
+        ts = submitted.strftime("%Y%m%d%H%M%S")
+        pid = self.unique(f"{name.replace(' ', '_')}_{ts}")
+        record = {
+            "id": pid, "name": name, "city": self.pick(self.villages), "age": str(age),
+            "weight": str(int(clip(weight, 3, 130))), "bp": f"{systolic}/{diastolic}", "sugar": str(sugar),
+            "oxygen": str(int(clip(oxygen, 75, 100))), "blood_group": self.pick(self.blood_groups),
+            "symptoms": self.symptoms(COMPLAINTS), "prescription": "", "timestamp": ts,
+            "status": "waiting", "doctor_name": "", "prescription_date": "",
+            "submission_date": submitted.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        prescription = None
+        if self.is_prescribed(submitted):
+            doctor_id, doctor_name = self.pick(self.doctors)
+            prescribed = min(self.now, submitted + self.reply_delay()).strftime("%Y-%m-%d %H:%M:%S")
+            prescription = (doctor_id, self.prescription(MEDICINES), prescribed)
+            record.update({
+                "prescription": f"Patient ID: {pid}\nPatient Name: {name}\nPrescribed by: Dr. {doctor_name}\n"
+                                f"Date: {prescribed}\n\n--- PRESCRIPTION ---\n{prescription[1]}",
+                "status": "prescribed", "doctor_name": doctor_name, "prescription_date": prescribed
+            })
+        return record, prescription
+
+    def animal(self):
+        rng = self.rng
+        submitted = self.moment()
+        animal_type = self.pick(self.animal_types)
+        _, breeds, (min_age, max_age), (min_weight, max_weight) = ANIMALS[animal_type]
+        ts = submitted.strftime("%Y%m%d%H%M%S")
+        animal_id = self.unique(f"animal_{animal_type}_{ts}")
+        record = {
+            "animal_id": animal_id, "owner_name": self.person_name(), "animal_type": animal_type,
+            "animal_name": rng.choice(('lakshmi', 'gowri', 'nandi', 'kaveri', 'ganga', 'raja', 'moti', 'tiger',
+                                       'kempi', 'bili', 'kariya', 'sundari')),
+            "gender": rng.choice(('female', 'female', 'female', 'male')), "breed": rng.choice(breeds),
+            "condition": self.pick(self.conditions), "age": str(rng.randint(min_age, max_age)),
+            "weight": str(int(rng.triangular(min_weight, max_weight))), "symptoms": self.symptoms(ANIMAL_COMPLAINTS),
+            "village": self.pick(self.villages),
+            "contact": f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}" if rng.random() < 0.85 else "",
+            "status": "waiting", "prescription": "", "veterinarian_name": "",
+            "submission_date": submitted.strftime("%Y-%m-%d %H:%M:%S"), "prescription_date": ""
+        }
+        prescription = None
+        if self.is_prescribed(submitted):
+            doctor_id, vet_name = VETERINARIAN
+            prescribed = min(self.now, submitted + self.reply_delay()).strftime("%Y-%m-%d %H:%M:%S")
+            prescription = (doctor_id, self.prescription(VET_MEDICINES), prescribed)
+            record.update({
+                "prescription": f"Animal ID: {animal_id}\nAnimal Name: {record['animal_name']}\n"
+                                f"Animal Type: {animal_type}\nGender: {record['gender']}\nBreed: {record['breed']}\n"
+                                f"Condition: {record['condition']}\nOwner: {record['owner_name']}\n"
+                                f"Prescribed by: Dr. {vet_name} (Veterinarian)\nDate: {prescribed}\n\n"
+                                f"--- PRESCRIPTION ---\n{prescription[1]}",
+                "status": "prescribed", "veterinarian_name": vet_name, "prescription_date": prescribed
+            })
+        return record, prescription
+
+    def diet(self, plan_for):
+        """``plan_for(diet_type, occupation, age, weight, disease)`` builds the 5-day plan"""
+        rng = self.rng
+        generated = self.moment()
+        age = rng.randint(7, 80)
+        diet_type, occupation, disease = self.pick(self.diet_types), rng.choice(OCCUPATIONS), self.pick(self.diseases)
+        weight = str(int(clip(rng.gauss(58, 12), 20, 120)))
+        diet_id = self.unique(f"diet_{generated:%Y%m%d%H%M%S}")
+        return {
+            "diet_id": diet_id, "diet_type": diet_type, "occupation": occupation, "age": str(age),
+            "weight": weight, "disease": disease, "diet_plan": plan_for(diet_type, occupation, age, weight, disease),
+            "generated_date": generated.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def image(self):
+        """Base64 JPEG as the chat pages send it: median ~70 KB, up to ~1.5 MB"""
+        size = int(clip(self.rng.lognormvariate(math.log(70000), 0.6), 8000, 1500000))
+        start = self.rng.randrange(len(self.image_pool) - size)
+        return base64.b64encode(self.image_pool[start:start + size]).decode('ascii')
+
+    def conversation(self, patient_id, doctor_id, started, owner_type='patient'):
+        """Yield ``(patient_id, doctor_id, content, timestamp, sender_type, image_data)`` rows"""
+        rng = self.rng
+        length = int(clip(rng.lognormvariate(math.log(6), 0.9), 1, 600))
+        moment = started
+        sender = owner_type
+        for _ in range(length):
+            moment += timedelta(seconds=clip(rng.lognormvariate(math.log(90), 1.6), 2, 6 * 3600))
+            if moment > self.now:
+                break
+            image = None
+            if sender == owner_type:
+                content = rng.choice(CHAT_LINES)
+                if rng.random() < self.image_rate:
+                    image = self.image()
+                    content = content if rng.random() < 0.3 else 'Image message'
+            else:
+                content = rng.choice(DOCTOR_LINES)
+            yield patient_id, doctor_id, content, moment.strftime("%Y-%m-%d %H:%M:%S"), sender, image
+            if rng.random() < 0.7:
+                sender = 'doctor' if sender == owner_type else owner_type
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_rows(conn, sql, rows, batch_size=10000):
+    count = 0
+    for batch in batches(rows, batch_size):
+        conn.executemany(sql, batch)
+        conn.commit()
+        count += len(batch)
+    return count
+
+
+def conversation_rows(gen, patients, animals, count):
+    """Chats for ``count`` randomly chosen submissions, humans and animals in proportion"""
+    owners = [(pid, 'patient') for pid in patients] + [(aid, 'animal_owner') for aid in animals]
+    for record_id, owner_type in gen.rng.sample(owners, min(count, len(owners))):
+        if owner_type == 'patient':
+            record = patients[record_id]
+            doctor_id = gen.pick(gen.doctors)[0]
+        else:
+            record = animals[record_id]
+            doctor_id = VETERINARIAN[0]
+        started = datetime.strptime(record['submission_date'], "%Y-%m-%d %H:%M:%S")
+        yield from gen.conversation(record_id, doctor_id, started, owner_type)
+
+
+def generate(args):
+    gen = Generator(args.seed, args.days, args.image_rate)
+    patients, animals, prescriptions = {}, {}, []
+    for _ in range(args.patients):
+        record, prescription = gen.patient()
+        patients[record['id']] = record
+        if prescription:
+            doctor_id, text, date = prescription
+            prescriptions.append((doctor_id, record['id'], record['name'], record['city'], text, date))
+    for _ in range(args.animals):
+        record, prescription = gen.animal()
+        animals[record['animal_id']] = record
+        if prescription:
+            doctor_id, text, date = prescription
+            prescriptions.append((doctor_id, record['animal_id'], f"{record['animal_name']} ({record['animal_type']})",
+                                  record['village'], text, date))
+    return gen, patients, animals, prescriptions
+
+
+def write_store_format(args, gen, patients, animals, prescriptions):
+    os.chdir(args.out)
+    os.environ['HEALTHKIOSK_SCHEDULER'] = '0'
+    os.environ['HEALTHKIOSK_CENTRAL_URL'] = ''
+    os.environ['HEALTHKIOSK_TEMPLATE_CACHE'] = ''
+    if args.codec:
+        os.environ['HEALTHKIOSK_STORE_CODEC'] = args.codec
+    logging.disable(logging.INFO)
+    import app
+
+    # Prescriptions the way the views store them: records link to a doctor_records
+    # row by id and the text lives in prescription_items
+    conn = sqlite3.connect('healthcare.db')
+    first_id = (conn.execute('SELECT MAX(id) FROM doctor_records').fetchone()[0] or 0) + 1
+    conn.close()
+    prescriptions = sorted(prescriptions, key=lambda row: row[5])
+    for prescription_id, row in enumerate(prescriptions, first_id):
+        record = patients.get(row[1]) or animals[row[1]]
+        record.update({"prescription": "", "prescription_id": prescription_id})
+
+    timings = {}
+    started = time.perf_counter()
+    app.PATIENTS.save(patients)
+    app.ANIMALS.save(animals)
+    app.BALANCE_DIET.save({diet['diet_id']: diet for diet in
+                           (gen.diet(app.generate_diet_plan) for _ in range(args.diets))})
+    timings['stores'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    conn = sqlite3.connect('healthcare.db')
+    conn.execute('PRAGMA synchronous=OFF')
+    records = write_rows(conn, '''
+        INSERT INTO doctor_records (id, doctor_id, patient_id, patient_name, village, prescription_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', ((prescription_id, doctor_id, record_id, name, village, date)
+          for prescription_id, (doctor_id, record_id, name, village, text, date) in enumerate(prescriptions, first_id)))
+    write_rows(conn, '''
+        INSERT INTO prescription_items
+            (prescription_id, kind, record_id, position, text, medicine, dose, frequency, duration, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((prescription_id, 'patient' if record_id in patients else 'animal', record_id, position)
+          + tuple(item[name] for name in ITEM_FIELDS)
+          for prescription_id, (_, record_id, _, _, text, _) in enumerate(prescriptions, first_id)
+          for position, item in enumerate(parse_prescription(text))))
+    messages = write_rows(conn, '''
+        INSERT INTO messages (patient_id, doctor_id, message_type, content, timestamp, sender_type, image_data)
+        VALUES (?, ?, 'text', ?, ?, ?, ?)
+    ''', conversation_rows(gen, patients, animals, args.conversations))
+    conn.close()
+    timings['sqlite'] = time.perf_counter() - started
+    return {'doctor_records': records, 'messages': messages}, timings
+
+
+def write_upload_format(args, patients, animals):
+    extension = 'ndjson' if args.format == 'ndjson' else 'csv'
+    started = time.perf_counter()
+    for kind, record_class, records in (('patient', Patient, patients), ('animal', Animal, animals)):
+        if not records:
+            continue
+        typed = {key: record_class.from_dict(record) for key, record in records.items()}
+        with open(os.path.join(args.out, f"{kind}s.{extension}"), 'w', encoding='utf-8', newline='') as f:
+            for chunk in bulk.export_rows(kind, typed, args.format):
+                f.write(chunk)
+    return {}, {'files': time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', required=True, help="data directory to fill (created if missing)")
+    parser.add_argument('--format', choices=('store',) + bulk.FORMATS, default='store')
+    parser.add_argument('--codec', choices=sorted(serialization.CODECS),
+                        help="store codec (default: HEALTHKIOSK_STORE_CODEC or json)")
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--animals', type=int, default=2000)
+    parser.add_argument('--diets', type=int, default=500)
+    parser.add_argument('--conversations', type=int, default=1000, help="chats, each a few to hundreds of messages")
+    parser.add_argument('--image-rate', type=float, default=0.06, help="share of patient messages with a photo")
+    parser.add_argument('--days', type=int, default=365, help="spread submissions over this many days")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    args.out = os.path.abspath(args.out)
+    os.makedirs(args.out, exist_ok=True)
+
+    started = time.perf_counter()
+    gen, patients, animals, prescriptions = generate(args)
+    print(f"🧪 Generated {len(patients)} patients, {len(animals)} animals, {len(prescriptions)} prescriptions "
+          f"in {time.perf_counter() - started:.1f}s")
+    if args.format == 'store':
+        counts, timings = write_store_format(args, gen, patients, animals, prescriptions)
+    else:
+        counts, timings = write_upload_format(args, patients, animals)
+    for name, count in counts.items():
+        print(f"🧪 Wrote {count} {name} rows")
+    sizes = {name: os.path.getsize(os.path.join(args.out, name)) for name in sorted(os.listdir(args.out))
+             if os.path.isfile(os.path.join(args.out, name)) and not name.startswith('.')}
+    print(json.dumps({'counts': counts, 'seconds': timings, 'bytes': sizes}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Bulk import/export of patient and animal records as NDJSON or CSV.
+
+Imports are parsed and validated one line at a time straight off the
+request stream, so a 100k-record upload never exists as one big string.
+Valid records are collected and written by the caller in a single store
+commit; invalid lines are reported with their line numbers.
+"""
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+from records import Animal, Patient
+
+FORMATS = ('ndjson', 'csv')
+MAX_REPORTED_ERRORS = 100
+
+# Same required fields as the /patient and /animal/health/submit forms
+KINDS = {
+    'patient': {
+        'record_class': Patient,
+        'required': ('name', 'city', 'age', 'weight', 'bp', 'sugar', 'oxygen', 'blood_group', 'symptoms'),
+        'defaults': {'status': 'waiting'},
+    },
+    'animal': {
+        'record_class': Animal,
+        'required': ('owner_name', 'animal_type', 'animal_name', 'gender', 'breed', 'condition', 'age',
+                     'weight', 'symptoms', 'village'),
+        'defaults': {'status': 'waiting'},
+    },
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.records = {}
+        self.errors = []
+        self.error_count = 0
+        self.lines = 0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def summary(self):
+        return {'lines': self.lines, 'valid': len(self.records), 'invalid': self.error_count,
+                'errors': self.errors}
+
+
+def detect_format(fmt, mimetype):
+    if fmt:
+        return fmt
+    if mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    return 'ndjson'
+
+
+def _text_stream(stream, content_encoding=None):
+    if content_encoding == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def _rows(text, fmt):
+    """Yield ``(line number, dict or error string)``"""
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, "more values than header columns"
+            else:
+                yield reader.line_num, row
+        return
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, f"invalid JSON: {e.msg}"
+            continue
+        yield number, row if isinstance(row, dict) else "each line must be a JSON object"
+
+
+def _validate(kind, row, number, stamp):
+    """Return a record dict ready to store, or an error string"""
+    spec = KINDS[kind]
+    record = {}
+    for name, value in row.items():
+        if type(value) is not str:
+            if value is None:
+                value = ''
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            else:
+                return f"field {name} must be a string or number"
+        record[name] = value.strip()
+    missing = [name for name in spec['required'] if not record.get(name)]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    for name, value in spec['defaults'].items():
+        if not record.get(name):
+            record[name] = value
+    if not record.get('submission_date'):
+        record['submission_date'] = stamp.strftime("%Y-%m-%d %H:%M:%S")
+
+    key = spec['record_class'].KEY
+    if not record.get(key):
+        ts = stamp.strftime("%Y%m%d%H%M%S")
+        # Same id shapes as the forms, with the line number so one upload cannot collide with itself
+        if kind == 'patient':
+            record[key] = f"{record['name'].replace(' ', '_')}_{ts}_{number}"
+            record.setdefault('timestamp', ts)
+        else:
+            record[key] = f"animal_{record['animal_type']}_{ts}_{number}"
+    for name in spec['record_class'].FIELDS:
+        record.setdefault(name, '')
+    return record
+
+
+def parse(kind, stream, fmt='ndjson', content_encoding=None):
+    """Validate an upload; returns an ImportReport holding the valid records by id"""
+    report = ImportReport()
+    stamp = datetime.now()
+    text = _text_stream(stream, content_encoding)
+    try:
+        for number, row in _rows(text, fmt):
+            report.lines += 1
+            if isinstance(row, str):
+                report.error(number, row)
+                continue
+            result = _validate(kind, row, number, stamp)
+            if isinstance(result, str):
+                report.error(number, result)
+                continue
+            key = result[KINDS[kind]['record_class'].KEY]
+            if key in report.records:
+                report.error(number, f"duplicate id {key} in upload")
+                continue
+            report.records[key] = result
+    except (UnicodeDecodeError, OSError, csv.Error) as e:
+        report.error(report.lines + 1, f"unreadable upload: {e}")
+    return report
+
+
+def export_rows(kind, records, fmt='ndjson'):
+    """Yield the encoded export in chunks, for a streamed response.
+
+    CSV has one column per known field; fields outside the record schema
+    only appear in NDJSON exports.
+    """
+    if fmt == 'csv':
+        fields = KINDS[kind]['record_class'].FIELDS
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for count, record in enumerate(records.values(), 1):
+            writer.writerow(record.to_dict())
+            if count % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        return
+    chunk = []
+    for record in records.values():
+        chunk.append(json.dumps(record.to_dict(), ensure_ascii=False))
+        if len(chunk) == 1000:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
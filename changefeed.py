@@ -0,0 +1,343 @@
+"""Append-only change log for every mutation in the kiosk.
+
+Patient, animal and diet store commits, prescriptions and chat messages
+each append an event to ``change_log`` in healthcare.db::
+
+    seq       offset; SQLite AUTOINCREMENT keeps it strictly increasing
+    stream    'patients', 'animals', 'diets', 'prescriptions', 'messages'
+    record_id key within the stream; NULL marks a reset (store cleared)
+    op        'upsert', 'delete', 'insert' or 'reset'
+    payload   JSON of the record/row after the change
+
+Consumers (dashboards, replicas, indexes) remember the last offset they
+applied and read forward from it. ``compact()`` drops events superseded by
+a later event for the same key, so the log never outgrows the data;
+``purge()`` applies the retention window to tombstones and to append-only
+streams and records how far each stream was cut, so a consumer that fell
+behind that point knows it must rebuild instead of applying a delta.
+"""
+import argparse
+import json
+import sqlite3
+import threading
+from collections import deque
+
+from storage import FileLock
+
+DB_PATH = 'healthcare.db'
+MAX_DELTA = 500
+
+# Streams whose latest event per key is the current state and is kept forever
+COMPACTED_STREAMS = ('patients', 'animals', 'diets')
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+class ChangeFeed:
+    def __init__(self, db_path=DB_PATH, compacted=COMPACTED_STREAMS, connection_factory=sqlite3.Connection):
+        self.db_path = db_path
+        self.compacted = tuple(compacted)
+        self.connection_factory = connection_factory
+        # Store commits waiting for their writer to let go of the store locks
+        self._pending = deque()
+        self._flush_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, factory=self.connection_factory)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                stream TEXT NOT NULL,
+                record_id TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(change_log)')}
+        if 'op' not in columns:
+            conn.execute("ALTER TABLE change_log ADD COLUMN op TEXT NOT NULL DEFAULT 'upsert'")
+        if 'payload' not in columns:
+            conn.execute('ALTER TABLE change_log ADD COLUMN payload TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_change_log_stream_seq ON change_log (stream, seq)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_change_log_key ON change_log (stream, record_id, seq)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS change_log_watermarks (
+                stream TEXT PRIMARY KEY,
+                purged_through INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS change_log_consumers (
+                name TEXT PRIMARY KEY,
+                committed INTEGER NOT NULL,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    # Writing
+
+    def append(self, stream, record_id, op, payload=None, conn=None):
+        """Append one event and return its offset.
+
+        Pass the caller's ``conn`` to write the event in the same
+        transaction as the row it describes; the caller commits.
+        """
+        own = conn is None
+        if own:
+            conn = self._connect()
+        cursor = conn.execute(
+            'INSERT INTO change_log (stream, record_id, op, payload) VALUES (?, ?, ?, ?)',
+            (stream, None if record_id is None else str(record_id), op,
+             None if payload is None else _encode(payload)))
+        if own:
+            conn.commit()
+            conn.close()
+        return cursor.lastrowid
+
+    def record(self, stream, record_ids, records=None):
+        """Append the events for one store commit and return the last offset.
+
+        ``record_ids`` None means the whole stream was replaced. ``records``
+        is the store's state after the commit; ids missing from it are
+        logged as deletes.
+        """
+        if record_ids is None:
+            return self.append(stream, None, 'reset')
+        rows = []
+        for record_id in record_ids:
+            record = records.get(record_id) if records is not None else None
+            if record is None:
+                rows.append((stream, record_id, 'delete', None))
+            else:
+                payload = record.to_dict() if hasattr(record, 'to_dict') else dict(record)
+                rows.append((stream, record_id, 'upsert', _encode(payload)))
+        conn = self._connect()
+        conn.executemany('INSERT INTO change_log (stream, record_id, op, payload) VALUES (?, ?, ?, ?)', rows)
+        conn.commit()
+        seq = conn.execute('SELECT MAX(seq) FROM change_log WHERE stream = ?', (stream,)).fetchone()[0]
+        conn.close()
+        return seq
+
+    def watch(self, store, stream, on_change=None):
+        """Log every commit of ``store`` under ``stream``.
+
+        The commit is only noted while the store is locked; its events are
+        written once the writer has let go of its locks, so a busy
+        healthcare.db never holds up record writes. ``on_change(stream,
+        seq)`` runs afterwards, e.g. to push a socket event telling clients
+        to pull the delta.
+        """
+        def listener(_store, keys, data):
+            records = None
+            if keys is not None:
+                from_dict = _store.record_class.from_dict if _store.record_class else dict
+                records = {key: from_dict(data[key]) for key in keys if key in data}
+            # Queued under the store lock, so the log keeps the order of the commits
+            self._pending.append((stream, keys, records, on_change))
+            FileLock.defer(self.flush)
+        store.add_listener(listener)
+
+    def flush(self):
+        """Append the queued store commits to the log in order, then announce them"""
+        announced = []
+        with self._flush_lock:
+            while self._pending:
+                stream, keys, records, on_change = self._pending.popleft()
+                try:
+                    seq = self.record(stream, keys, records)
+                except sqlite3.Error as e:
+                    print(f"❌ Could not log {stream} changes {keys}: {e}")
+                    continue
+                if on_change is not None:
+                    announced.append((on_change, stream, seq))
+        for on_change, stream, seq in announced:
+            on_change(stream, seq)
+
+    # Reading
+
+    def latest(self, stream=None):
+        """Offset a new consumer of ``stream`` (or of the whole log) starts from"""
+        conn = self._connect()
+        if stream is None:
+            seq = conn.execute('SELECT MAX(seq) FROM change_log').fetchone()[0]
+            purged = conn.execute('SELECT MAX(purged_through) FROM change_log_watermarks').fetchone()[0]
+        else:
+            seq = conn.execute('SELECT MAX(seq) FROM change_log WHERE stream = ?', (stream,)).fetchone()[0]
+            purged = self.purged_through(conn, stream)
+        conn.close()
+        return max(seq or 0, purged or 0)
+
+    def purged_through(self, conn, stream):
+        row = conn.execute('SELECT purged_through FROM change_log_watermarks WHERE stream = ?', (stream,)).fetchone()
+        return row[0] if row else 0
+
+    def read(self, offset, streams=None, limit=1000):
+        """Return events after ``offset`` in order, as dicts with a decoded payload"""
+        conn = self._connect()
+        query = 'SELECT seq, stream, record_id, op, payload, created_at FROM change_log WHERE seq > ?'
+        params = [offset]
+        if streams:
+            query += ' AND stream IN (%s)' % ','.join('?' * len(streams))
+            params.extend(streams)
+        query += ' ORDER BY seq LIMIT ?'
+        params.append(limit)
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return [{
+            'seq': row['seq'],
+            'stream': row['stream'],
+            'id': row['record_id'],
+            'op': row['op'],
+            'payload': json.loads(row['payload']) if row['payload'] else None,
+            'created_at': row['created_at'],
+        } for row in rows]
+
+    def since(self, stream, seq, limit=MAX_DELTA):
+        """Return ``(latest seq, reset, record ids)`` for changes after ``seq``.
+
+        ``reset`` is True when the stream was replaced wholesale, when
+        retention has removed events the caller has not seen, or when too
+        much changed for a delta to be worthwhile; the client should reload.
+        Ids are de-duplicated and ordered by their latest change.
+        """
+        conn = self._connect()
+        purged = self.purged_through(conn, stream)
+        rows = conn.execute('''
+            SELECT seq, record_id FROM change_log
+            WHERE stream = ? AND seq > ?
+            ORDER BY seq
+            LIMIT ?
+        ''', (stream, seq, limit + 1)).fetchall()
+        conn.close()
+        if not rows:
+            return max(seq, purged), purged > seq, []
+        latest = rows[-1][0]
+        if purged > seq or len(rows) > limit or any(record_id is None for _, record_id in rows):
+            return max(latest, purged), True, []
+        order = {}
+        for _, record_id in rows:
+            order.pop(record_id, None)
+            order[record_id] = True
+        return latest, False, list(order)
+
+    # Consumer offsets
+
+    def committed(self, consumer):
+        conn = self._connect()
+        row = conn.execute('SELECT committed FROM change_log_consumers WHERE name = ?', (consumer,)).fetchone()
+        conn.close()
+        return row[0] if row else 0
+
+    def commit(self, consumer, offset):
+        conn = self._connect()
+        conn.execute('''
+            INSERT INTO change_log_consumers (name, committed) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET committed = excluded.committed, updated_at = CURRENT_TIMESTAMP
+        ''', (consumer, offset))
+        conn.commit()
+        conn.close()
+
+    def poll(self, consumer, streams=None, limit=1000):
+        """Events after ``consumer``'s committed offset; commit once applied"""
+        return self.read(self.committed(consumer), streams, limit)
+
+    # Maintenance
+
+    def compact(self, min_age_seconds=3600):
+        """Delete events older than ``min_age_seconds`` that a later event for
+        the same key (or a later reset of the stream) supersedes. Returns the
+        number removed.
+        """
+        conn = self._connect()
+        cursor = conn.execute('''
+            DELETE FROM change_log WHERE seq IN (
+                SELECT older.seq FROM change_log AS older
+                WHERE older.created_at < datetime('now', ?)
+                  AND EXISTS (
+                      SELECT 1 FROM change_log AS newer
+                      WHERE newer.stream = older.stream AND newer.seq > older.seq
+                        AND (newer.record_id = older.record_id OR newer.record_id IS NULL)
+                  )
+            )
+        ''', (f'-{int(min_age_seconds)} seconds',))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+
+    def purge(self, retention_days=30):
+        """Apply the retention window and return the number of events removed.
+
+        Append-only streams lose everything older than the window; compacted
+        streams only lose tombstones and resets, since their surviving
+        upserts are the current state.
+        """
+        compacted = ','.join('?' * len(self.compacted)) or "''"
+        condition = f'''
+            created_at < datetime('now', ?)
+            AND (stream NOT IN ({compacted}) OR op IN ('delete', 'reset') OR record_id IS NULL)
+        '''
+        params = (f'-{int(retention_days)} days',) + self.compacted
+        conn = self._connect()
+        cut = conn.execute(f'SELECT stream, MAX(seq) FROM change_log WHERE {condition} GROUP BY stream',
+                           params).fetchall()
+        conn.executemany('''
+            INSERT INTO change_log_watermarks (stream, purged_through) VALUES (?, ?)
+            ON CONFLICT(stream) DO UPDATE SET purged_through = MAX(purged_through, excluded.purged_through)
+        ''', [(row[0], row[1]) for row in cut])
+        cursor = conn.execute(f'DELETE FROM change_log WHERE {condition}', params)
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+
+    def maintain(self, retention_days=30, min_age_seconds=3600):
+        return self.compact(min_age_seconds), self.purge(retention_days)
+
+    def stats(self):
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT stream, COUNT(*), MIN(seq), MAX(seq) FROM change_log GROUP BY stream ORDER BY stream
+        ''').fetchall()
+        consumers = conn.execute('SELECT name, committed FROM change_log_consumers ORDER BY name').fetchall()
+        conn.close()
+        return ({row[0]: {'events': row[1], 'first': row[2], 'last': row[3]} for row in rows},
+                {row[0]: row[1] for row in consumers})
+
+
+def main(argv=None):
+    import config
+
+    parser = argparse.ArgumentParser(description="Inspect and maintain the Health Kiosk change log")
+    parser.add_argument('--db', default=DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help="events per stream and consumer offsets")
+    sub.add_parser('maintain', help="compact superseded events and apply retention")
+    tail = sub.add_parser('tail', help="print events after an offset as JSON lines")
+    tail.add_argument('--since', type=int, default=0)
+    tail.add_argument('--stream', action='append')
+    tail.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    feed = ChangeFeed(args.db)
+    feed.init_db()
+    if args.command == 'stats':
+        streams, consumers = feed.stats()
+        for stream, info in streams.items():
+            print(f"📜 {stream}: {info['events']} events, offsets {info['first']}-{info['last']}")
+        for name, offset in consumers.items():
+            print(f"👀 {name}: committed {offset}")
+    elif args.command == 'maintain':
+        compacted, purged = feed.maintain(config.EVENT_LOG_RETENTION_DAYS, config.EVENT_LOG_COMPACTION_LAG)
+        print(f"✅ Compacted {compacted} events, purged {purged} past retention")
+    else:
+        for event in feed.read(args.since, args.stream, args.limit):
+            print(json.dumps(event, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
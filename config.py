@@ -0,0 +1,60 @@
+"""Deployment settings, read from environment variables at startup"""
+import os
+import socket
+
+# Format used when saving the patient/animal/diet stores: json, json-pretty,
+# binary (or msgpack when installed). Files in any format are still readable.
+STORE_CODEC = os.environ.get('HEALTHKIOSK_STORE_CODEC', 'json')
+
+# 'production' turns off debug mode and per-render template mtime checks
+PRODUCTION = os.environ.get('HEALTHKIOSK_ENV', 'development') == 'production'
+
+# Compiled template bytecode survives restarts here; empty disables it
+TEMPLATE_CACHE_DIR = os.environ.get('HEALTHKIOSK_TEMPLATE_CACHE', '.template_cache')
+
+# Change log: events older than this are dropped, except the latest state of
+# each patient/animal record
+EVENT_LOG_RETENTION_DAYS = int(os.environ.get('HEALTHKIOSK_EVENT_RETENTION_DAYS', '30'))
+
+# Superseded change-log events are kept this many seconds before compaction
+EVENT_LOG_COMPACTION_LAG = int(os.environ.get('HEALTHKIOSK_EVENT_COMPACTION_LAG', '3600'))
+
+# Kiosk mode: submissions and chat messages are also queued locally and
+# uploaded in batches to this central server; empty runs standalone
+CENTRAL_URL = os.environ.get('HEALTHKIOSK_CENTRAL_URL', '')
+KIOSK_ID = os.environ.get('HEALTHKIOSK_KIOSK_ID', socket.gethostname())
+SYNC_INTERVAL = int(os.environ.get('HEALTHKIOSK_SYNC_INTERVAL', '60'))
+
+# Shared secret for /api/ingest/batch, sent by kiosks; empty disables ingest
+SYNC_TOKEN = os.environ.get('HEALTHKIOSK_SYNC_TOKEN', '')
+
+# Housekeeping jobs (archiving, vacuum, reindex) start only inside this
+# local-time window, e.g. "1-5" for 01:00-05:00; light jobs run any time
+SCHEDULER_ENABLED = os.environ.get('HEALTHKIOSK_SCHEDULER', '1') != '0'
+MAINTENANCE_WINDOW = os.environ.get('HEALTHKIOSK_MAINTENANCE_WINDOW', '1-5')
+
+# Prescribed patients/animals older than this many days move to gzip files
+# under archive/. Chat messages are only archived when
+# MESSAGE_ARCHIVE_DAYS is set: the chat and the timeline read the messages
+# table alone, so archived conversations disappear from them; 0 disables
+ARCHIVE_AFTER_DAYS = int(os.environ.get('HEALTHKIOSK_ARCHIVE_AFTER_DAYS', '180'))
+MESSAGE_ARCHIVE_DAYS = int(os.environ.get('HEALTHKIOSK_MESSAGE_ARCHIVE_DAYS', '0'))
+
+# Bearer token required to scrape /metrics; empty leaves it open
+METRICS_TOKEN = os.environ.get('HEALTHKIOSK_METRICS_TOKEN', '')
+
+# Log SQLite statements (with parameters and EXPLAIN QUERY PLAN) and HTTP
+# requests (with a store/db/render breakdown) slower than this; 0 disables
+SLOW_QUERY_MS = float(os.environ.get('HEALTHKIOSK_SLOW_QUERY_MS', '100'))
+SLOW_REQUEST_MS = float(os.environ.get('HEALTHKIOSK_SLOW_REQUEST_MS', '1000'))
+
+# Extra notification channels besides Socket.IO: "sms", "email" (comma
+# separated). They are log-only stand-ins until real gateways are wired up
+NOTIFY_STAND_INS = [name.strip() for name in os.environ.get('HEALTHKIOSK_NOTIFY_STAND_INS', '').split(',') if name.strip()]
+
+# Threads rendering printable prescriptions (HTML/PDF) off the request path
+PRINT_WORKERS = int(os.environ.get('HEALTHKIOSK_PRINT_WORKERS', '2'))
+
+# Patients and animals are stored in one file per city/village; cross-region
+# searches run on this many threads, one region per task
+SHARD_WORKERS = int(os.environ.get('HEALTHKIOSK_SHARD_WORKERS', '4'))
@@ -1,15 +1,18 @@
-import json
 import os
 from datetime import datetime
+from records import Patient
+from sharding import ShardedStore
+from storage import JsonStore
+
+# The same region shards app.py reads
+PATIENTS = ShardedStore('patients_shards', 'city', record_class=Patient)
+DOCTORS = JsonStore('doctors_data.json', codec='json-pretty')
 
 def init_db():
     """Initialize database files if they don't exist"""
     try:
-        # Create patients data file if it doesn't exist
-        if not os.path.exists('patients_data.json'):
-            with open('patients_data.json', 'w') as f:
-                json.dump({}, f)
-            print("✅ Created patients_data.json")
+        # Split a patients file from before sharding into region shards
+        PATIENTS.migrate('patients_data.json')
         
         # Create doctors data file if it doesn't exist  
         if not os.path.exists('doctors_data.json'):
@@ -21,8 +24,7 @@ def init_db():
                 "drwilson": "health2024",
                 "drsarah": "medic123"
             }
-            with open('doctors_data.json', 'w') as f:
-                json.dump(predefined_doctors, f, indent=2)
+            DOCTORS.save(predefined_doctors)
             print("✅ Created doctors_data.json with predefined doctors")
         
         print("✅ Database initialized successfully")
@@ -34,10 +36,9 @@ def load_doctors():
     """Load predefined doctors from JSON file"""
     try:
         if os.path.exists('doctors_data.json'):
-            with open('doctors_data.json', 'r') as f:
-                doctors = json.load(f)
-                print(f"✅ Loaded {len(doctors)} predefined doctors from file")
-                return doctors
+            doctors = DOCTORS.read()
+            print(f"✅ Loaded {len(doctors)} predefined doctors from file")
+            return doctors
         else:
             print("❌ doctors_data.json not found")
             return {}
@@ -46,32 +47,21 @@ def load_doctors():
         return {}
 
 def load_patients():
-    """Load patients from JSON file"""
+    """Load patients from the region shards"""
     try:
-        if os.path.exists('patients_data.json'):
-            with open('patients_data.json', 'r') as f:
-                patients = json.load(f)
-                print(f"✅ Loaded {len(patients)} patients from file")
-                return patients
-        else:
-            print("❌ patients_data.json not found")
-            return {}
+        patients = PATIENTS.read()
+        print(f"✅ Loaded {len(patients)} patients from {len(PATIENTS.regions())} regions")
+        return patients
     except Exception as e:
         print(f"❌ Error loading patients: {e}")
         return {}
 
 def save_patient(patient_data):
-    """Save patient to JSON file"""
+    """Save patient to its region's shard"""
     try:
-        patients = load_patients()
-        
         # Add or update patient
         patient_id = patient_data['id']
-        patients[patient_id] = patient_data
-        
-        # Save to file
-        with open('patients_data.json', 'w') as f:
-            json.dump(patients, f, indent=2)
+        PATIENTS.put(patient_id, patient_data)
         
         print(f"✅ Saved patient: {patient_data['name']} (ID: {patient_id})")
         return True
@@ -81,17 +71,9 @@ def save_patient(patient_data):
         return False
 
 def delete_patient(patient_id):
-    """Delete patient from JSON file"""
+    """Delete patient from its region's shard"""
     try:
-        patients = load_patients()
-        
-        if patient_id in patients:
-            del patients[patient_id]
-            
-            # Save updated data to file
-            with open('patients_data.json', 'w') as f:
-                json.dump(patients, f, indent=2)
-            
+        if PATIENTS.delete(patient_id):
             print(f"✅ Deleted patient: {patient_id}")
             return True
         else:
@@ -0,0 +1,92 @@
+"""Cache of rendered per-record HTML fragments (dashboard cards, history rows).
+
+A fragment is keyed by (template, record id, record revision, language),
+so a row is rendered through Jinja once and then reused until that record
+changes. Store listeners drop a record's fragments as soon as it is saved;
+entries left behind by other processes simply age out of the LRU.
+"""
+import threading
+from collections import OrderedDict
+
+from flask import render_template, session
+from markupsafe import Markup
+
+
+class FragmentCache:
+    def __init__(self, maxsize=5000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._by_record = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        record_id = key[1]
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            self._by_record.setdefault(record_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget(old_key)
+
+    def _forget(self, key):
+        keys = self._by_record.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_record[key[1]]
+
+    def invalidate(self, record_ids=None):
+        """Drop fragments for ``record_ids``, or everything if None"""
+        with self._lock:
+            if record_ids is None:
+                self._entries.clear()
+                self._by_record.clear()
+                return
+            for record_id in record_ids:
+                for key in self._by_record.pop(record_id, ()):
+                    self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+cache = FragmentCache()
+
+
+def on_store_commit(store, keys, data):
+    """JsonStore listener that keeps the cache in step with saves"""
+    cache.invalidate(keys)
+
+
+def render_rows(template_name, items, key_name, record_name, **context):
+    """Render ``(id, record)`` pairs with a fragment template and join them.
+
+    ``key_name``/``record_name`` are the variable names the fragment uses
+    for the id and the record. Extra ``context`` must not vary between
+    rows, since it is not part of the cache key.
+    """
+    lang = session.get('lang', 'en')
+    parts = []
+    for record_id, record in items:
+        key = (template_name, record_id, record.revision, lang)
+        html = cache.get(key)
+        if html is None:
+            context[key_name] = record_id
+            context[record_name] = record
+            html = render_template(template_name, **context)
+            cache.put(key, html)
+        parts.append(html)
+    return Markup(''.join(parts))
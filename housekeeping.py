@@ -0,0 +1,153 @@
+"""Housekeeping jobs for the scheduler.
+
+Each factory returns a ``job(ctx)`` callable that works in chunks, calls
+``ctx.pace()`` between them and returns a one-line summary.
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+from archive import write_segment
+
+
+def _connect(db_path, autocommit=False):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None if autocommit else '')
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _archive_date(record):
+    return record.get('prescription_date') or record.get('submission_date') or ''
+
+
+def archive_store(store, stream, days, batch=5000):
+    """Move ``prescribed`` records last touched more than ``days`` ago out of ``store``"""
+    def job(ctx):
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        moved = 0
+        while True:
+            old = []
+            for key, record in store.records().items():
+                date = _archive_date(record)
+                if record.get('status') == 'prescribed' and date and date < cutoff:
+                    old.append((key, record.to_dict()))
+                    if len(old) == batch:
+                        break
+            if not old:
+                break
+            write_segment(stream, [record for _, record in old], store.record_class.KEY)
+            archived = dict(old)
+
+            def remove(data):
+                count = 0
+                for key, record in archived.items():
+                    # Leave records that were updated after they were read
+                    if key in data and _archive_date(data[key]) == _archive_date(record):
+                        del data[key]
+                        count += 1
+                return count
+
+            moved += store.update(remove, changed=tuple(archived))
+            if len(old) < batch or not ctx.pace(len(old)):
+                break
+        return f"archived {moved} {stream} records" if moved else None
+    return job
+
+
+def archive_messages(db_path, days, changes=None, batch=1000):
+    """Move chat messages (and their inline images) older than ``days`` out of SQLite"""
+    def job(ctx):
+        conn = _connect(db_path)
+        moved = 0
+        try:
+            while True:
+                rows = conn.execute('''
+                    SELECT * FROM messages WHERE timestamp < datetime('now', ?) ORDER BY id LIMIT ?
+                ''', (f'-{int(days)} days', batch)).fetchall()
+                if not rows:
+                    break
+                write_segment('messages', [dict(row) for row in rows], 'id')
+                ids = [row['id'] for row in rows]
+                conn.execute('DELETE FROM messages WHERE id IN (%s)' % ','.join('?' * len(ids)), ids)
+                if changes is not None:
+                    for message_id in ids:
+                        changes.append('messages', message_id, 'archive', conn=conn)
+                conn.commit()
+                moved += len(ids)
+                if len(rows) < batch or not ctx.pace(len(rows)):
+                    break
+        finally:
+            conn.close()
+        return f"archived {moved} messages" if moved else None
+    return job
+
+
+def checkpoint_wal(db_path):
+    def job(ctx):
+        conn = _connect(db_path, autocommit=True)
+        busy, log_pages, checkpointed = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        conn.close()
+        if log_pages <= 0:
+            return None
+        return f"checkpointed {checkpointed}/{log_pages} WAL pages" + (" (busy)" if busy else "")
+    return job
+
+
+def analyze(db_path):
+    def job(ctx):
+        conn = _connect(db_path, autocommit=True)
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA optimize')
+        conn.close()
+        return "analyzed"
+    return job
+
+
+def incremental_vacuum(db_path, pages=256):
+    """Return free pages to the filesystem a few at a time"""
+    def job(ctx):
+        conn = _connect(db_path, autocommit=True)
+        freed = 0
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                return None  # the full vacuum job switches the database to incremental mode
+            while True:
+                free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if not free:
+                    break
+                conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+                freed += min(free, pages)
+                if not ctx.pace():
+                    break
+        finally:
+            conn.close()
+        return f"freed {freed} pages" if freed else None
+    return job
+
+
+def vacuum(db_path, min_free_ratio=0.25):
+    """Full VACUUM, only when worthwhile; also enables incremental auto-vacuum"""
+    def job(ctx):
+        conn = _connect(db_path, autocommit=True)
+        try:
+            mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            pages = conn.execute('PRAGMA page_count').fetchone()[0]
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if mode == 2 and (not pages or free / pages < min_free_ratio):
+                return None
+            # Changing auto_vacuum on an existing database only takes effect through VACUUM
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            after = conn.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            conn.close()
+        return f"vacuumed {pages} -> {after} pages"
+    return job
+
+
+def reindex(db_path):
+    def job(ctx):
+        conn = _connect(db_path, autocommit=True)
+        conn.execute('REINDEX')
+        conn.close()
+        return "reindexed"
+    return job
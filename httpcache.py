@@ -0,0 +1,121 @@
+"""Conditional GET support for pages and APIs built from the record stores.
+
+``@conditional(PATIENTS)`` derives an ETag from the version tokens of the
+stores a view reads, plus the session fields and URL that change its
+output. A request whose ``If-None-Match`` matches gets a 304 before the
+view runs, so nothing is loaded or rendered; other clients asking for the
+same variant are served the cached body from a small LRU.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, session, make_response
+from werkzeug.http import http_date
+
+from assets import etag_variants
+
+SESSION_KEYS = ('lang', 'doctor_logged_in', 'doctor_id', 'doctor_name', 'doctor_type')
+CACHE_CONTROL = 'private, no-cache'
+
+_build_id = ''
+
+
+def init_app(app):
+    """Fold the code and template files into every ETag, so a deploy invalidates them"""
+    global _build_id
+    digest = hashlib.sha1()
+    paths = [os.path.join(app.root_path, name) for name in sorted(os.listdir(app.root_path)) if name.endswith('.py')]
+    for root in app.jinja_loader.searchpath:
+        for directory, _, names in sorted(os.walk(root)):
+            paths.extend(os.path.join(directory, name) for name in sorted(names))
+    for path in paths:
+        st = os.stat(path)
+        digest.update(f"{path}:{st.st_mtime_ns}:{st.st_size};".encode())
+    _build_id = digest.hexdigest()[:12]
+
+
+class ResponseCache:
+    """LRU of rendered 200 responses keyed by ETag"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is not None:
+                self._entries.move_to_end(etag)
+            return entry
+
+    def put(self, etag, entry):
+        with self._lock:
+            self._entries[etag] = entry
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _source_state(source):
+    if hasattr(source, 'signature'):
+        return source.signature(), source.last_modified()
+    return source.value, source.last_modified()
+
+
+def current_etag(sources):
+    """Return ``(etag, last_modified)`` for the current request"""
+    parts = [_build_id, request.full_path]
+    parts.extend(str(session.get(key)) for key in SESSION_KEYS)
+    last_modified = None
+    for source in sources:
+        token, modified = _source_state(source)
+        parts.append(repr(token))
+        if modified is not None and (last_modified is None or modified > last_modified):
+            last_modified = modified
+    etag = hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()[:20]
+    return etag, last_modified
+
+
+def _stamp(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def conditional(*sources):
+    """Serve 304s and cached bodies for views whose output depends only on
+    ``sources`` (JsonStores or VersionCounters), the URL and the session.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, last_modified = current_etag(sources)
+            for tag in etag_variants(etag):
+                if request.if_none_match.contains(tag):
+                    return _stamp(make_response('', 304), tag, last_modified)
+
+            cached = response_cache.get(etag)
+            if cached is not None:
+                body, mimetype = cached
+                return _stamp(make_response(body, 200, {'Content-Type': mimetype}), etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed and not session.modified:
+                response_cache.put(etag, (response.get_data(), response.headers.get('Content-Type')))
+                _stamp(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
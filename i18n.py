@@ -0,0 +1,99 @@
+"""Translation catalogs for the kiosk UI.
+
+Each language lives in ``locales/<lang>.json`` and is only read the first
+time it is needed. Loading compiles it into a flat lookup table (English
+fills any missing keys) and pre-parses the few strings that take
+arguments, so ``t()`` is a dict lookup plus, at most, a join.
+"""
+import json
+import os
+import threading
+from string import Formatter
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locales')
+DEFAULT_LANGUAGE = 'en'
+
+_catalogs = {}
+_load_lock = threading.RLock()
+_available = None
+
+
+def _compile(text):
+    """Pre-parse ``text`` into literal strings and positional arg indexes.
+
+    Returns None when the template uses anything beyond ``{}``/``{0}``
+    (format specs, conversions, named fields); those use str.format.
+    """
+    parts = []
+    auto_index = 0
+    for literal, field, spec, conversion in Formatter().parse(text):
+        if literal:
+            parts.append(literal)
+        if field is None:
+            continue
+        if spec or conversion or not (field == '' or field.isdigit()):
+            return None
+        if field == '':
+            parts.append(auto_index)
+            auto_index += 1
+        else:
+            parts.append(int(field))
+    return tuple(parts)
+
+
+class Catalog:
+    def __init__(self, lang, messages):
+        self.lang = lang
+        self.messages = messages
+        self.templates = {}
+        for key, text in messages.items():
+            if '{' in text or '}' in text:
+                self.templates[key] = _compile(text)
+        # Bound once so the context processor can hand out the same callable
+        # on every render instead of building a closure per request
+        self.t = self.translate
+
+    def translate(self, key, *args):
+        text = self.messages.get(key, key)
+        if not args or key not in self.templates:
+            return text
+        parts = self.templates[key]
+        try:
+            if parts is None:
+                return text.format(*args)
+            return ''.join(part if type(part) is str else str(args[part]) for part in parts)
+        except (IndexError, KeyError, ValueError):
+            return text
+
+
+def available_languages():
+    global _available
+    if _available is None:
+        _available = frozenset(name[:-5] for name in os.listdir(LOCALES_DIR) if name.endswith('.json'))
+    return _available
+
+
+def is_supported(lang):
+    return lang in available_languages()
+
+
+def _read_messages(lang):
+    with open(os.path.join(LOCALES_DIR, lang + '.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_catalog(lang):
+    """Return the compiled catalog for ``lang``, falling back to English"""
+    catalog = _catalogs.get(lang)
+    if catalog is not None:
+        return catalog
+    if not is_supported(lang):
+        return get_catalog(DEFAULT_LANGUAGE)
+    with _load_lock:
+        catalog = _catalogs.get(lang)
+        if catalog is None:
+            messages = _read_messages(lang)
+            if lang != DEFAULT_LANGUAGE:
+                messages = dict(get_catalog(DEFAULT_LANGUAGE).messages, **messages)
+            catalog = _catalogs[lang] = Catalog(lang, messages)
+    return catalog
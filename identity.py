@@ -0,0 +1,237 @@
+"""Links repeat visits by the same person to a stable person id.
+
+Every /patient submission is a new record with its own id. The
+``identities`` table maps each visit to a person::
+
+    visit_id     patient record id
+    person_id    shared by every visit of one person
+    name_key, city_key, contact_key   normalized name, city and phone number
+    birth_year   submission year minus the stated age
+    blood_group
+
+``resolve()`` runs on submit, and ``link_records()`` after kiosk
+uploads and bulk imports write their records. The visit joins the most recent person with
+the same name whose birth year is within BIRTH_YEAR_SLACK and whose
+blood group and contact do not contradict it, looked for first among
+visits with the same contact number (in any city), then among visits
+from the same city. A household sharing one phone stays separate people.
+Anything else starts a new person. Both lookups are index searches, so
+linking costs the same with ten visits on file or a million, and a
+person's visits (and through the store, their vitals over time) are a
+single index read. Records from before the index existed are linked once
+with ``python identity.py link``.
+"""
+import argparse
+import re
+import sqlite3
+import unicodedata
+import uuid
+
+DB_PATH = 'healthcare.db'
+BIRTH_YEAR_SLACK = 2
+HONORIFICS = frozenset(('mr', 'mrs', 'ms', 'miss', 'smt', 'shri', 'sri', 'kum', 'dr'))
+
+
+def normalize(text):
+    """Casefolded words without punctuation or honorifics; Indic vowel signs are kept"""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = ''.join(' ' if unicodedata.category(ch)[0] in 'PSZ' else ch for ch in text)
+    return ' '.join(word for word in text.split() if word not in HONORIFICS)
+
+
+def contact_key(text):
+    """The last ten digits of a phone number, or '' for anything too short to be one"""
+    digits = re.sub(r'\D', '', text or '')
+    return digits[-10:] if len(digits) >= 7 else ''
+
+
+def birth_year(record):
+    try:
+        return int(record['submission_date'][:4]) - int(float(record.get('age') or ''))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def blood_group_key(text):
+    return re.sub(r'\s', '', text or '').upper()
+
+
+def compatible(candidate, year, blood_group, contact):
+    if contact and candidate['contact_key'] and candidate['contact_key'] != contact:
+        return False
+    if year is not None and candidate['birth_year'] is not None and \
+            abs(candidate['birth_year'] - year) > BIRTH_YEAR_SLACK:
+        return False
+    return not (blood_group and candidate['blood_group'] and candidate['blood_group'] != blood_group)
+
+
+class Identities:
+    def __init__(self, db_path=DB_PATH, connection_factory=sqlite3.Connection):
+        self.db_path = db_path
+        self.connection_factory = connection_factory
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, factory=self.connection_factory, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS identities (
+                visit_id TEXT PRIMARY KEY,
+                person_id TEXT NOT NULL,
+                name_key TEXT NOT NULL,
+                city_key TEXT NOT NULL,
+                contact_key TEXT NOT NULL DEFAULT '',
+                birth_year INTEGER,
+                blood_group TEXT NOT NULL DEFAULT '',
+                submitted_at TEXT NOT NULL DEFAULT ''
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_identities_person ON identities (person_id, submitted_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_identities_name ON identities (name_key, city_key, submitted_at)')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_identities_contact ON identities (contact_key, submitted_at) "
+                     "WHERE contact_key != ''")
+        conn.close()
+
+    def _match(self, conn, name, city, contact, year, blood_group):
+        if contact:
+            # The contact only narrows the candidates: family members share a phone
+            for candidate in conn.execute('''
+                SELECT person_id, name_key, contact_key, birth_year, blood_group FROM identities
+                WHERE contact_key = ? AND contact_key != '' ORDER BY submitted_at DESC
+            ''', (contact,)):
+                if candidate['name_key'] == name and compatible(candidate, year, blood_group, contact):
+                    return candidate['person_id']
+        for candidate in conn.execute('''
+            SELECT person_id, contact_key, birth_year, blood_group FROM identities
+            WHERE name_key = ? AND city_key = ? ORDER BY submitted_at DESC
+        ''', (name, city)):
+            if compatible(candidate, year, blood_group, contact):
+                return candidate['person_id']
+        return None
+
+    def resolve(self, record):
+        """Link the patient ``record`` (a dict or Patient) to a person; returns the person id"""
+        conn = self._connect()
+        try:
+            # Serializes linking, so two first visits of one person cannot start two people
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT person_id FROM identities WHERE visit_id = ?', (record['id'],)).fetchone()
+            if row is not None:
+                conn.execute('COMMIT')
+                return row['person_id']
+            name, city = normalize(record.get('name')), normalize(record.get('city'))
+            contact, year = contact_key(record.get('contact')), birth_year(record)
+            blood_group = blood_group_key(record.get('blood_group'))
+            person_id = self._match(conn, name, city, contact, year, blood_group) or f"person_{uuid.uuid4().hex[:12]}"
+            conn.execute('''
+                INSERT INTO identities
+                    (visit_id, person_id, name_key, city_key, contact_key, birth_year, blood_group, submitted_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (record['id'], person_id, name, city, contact, year, blood_group,
+                  record.get('submission_date') or ''))
+            conn.execute('COMMIT')
+            return person_id
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def forget(self, visit_id):
+        """Drop the link of a visit whose record was never written"""
+        conn = self._connect()
+        conn.execute('DELETE FROM identities WHERE visit_id = ?', (visit_id,))
+        conn.close()
+
+    def visits(self, person_id):
+        """Visit (patient record) ids of ``person_id``, oldest first"""
+        conn = self._connect()
+        rows = conn.execute('SELECT visit_id FROM identities WHERE person_id = ? ORDER BY submitted_at',
+                            (person_id,)).fetchall()
+        conn.close()
+        return [row['visit_id'] for row in rows]
+
+    def find(self, name='', city='', contact=''):
+        """``[(person_id, visits, last visit)]`` matching a contact number, or a name (and city)"""
+        contact = contact_key(contact)
+        if contact:
+            where, params = "contact_key = ? AND contact_key != ''", (contact,)
+        elif normalize(name):
+            where, params = 'name_key = ?', (normalize(name),)
+            if normalize(city):
+                where, params = where + ' AND city_key = ?', params + (normalize(city),)
+        else:
+            return []
+        conn = self._connect()
+        people = [row['person_id'] for row in conn.execute(
+            f'SELECT DISTINCT person_id FROM identities WHERE {where}', params)]
+        results = []
+        for person_id in people:
+            row = conn.execute('SELECT COUNT(*), MAX(submitted_at) FROM identities WHERE person_id = ?',
+                               (person_id,)).fetchone()
+            results.append((person_id, row[0], row[1]))
+        conn.close()
+        return sorted(results, key=lambda result: result[2] or '', reverse=True)
+
+
+def _submitted(record):
+    return record.get('submission_date') or ''
+
+
+def link_records(identities, store, keys):
+    """Link the records ``keys`` of ``store`` that have no person id yet, in one
+    store commit; returns how many were linked"""
+    records = store.records()
+    pending = sorted((records[key] for key in keys if key in records and not records[key].get('person_id')),
+                     key=_submitted)
+    if not pending:
+        return 0
+    people = {record['id']: identities.resolve(record) for record in pending}
+
+    def apply(data):
+        count = 0
+        for key, person_id in people.items():
+            if key in data and not data[key].get('person_id'):
+                data[key].update({'person_id': person_id})
+                count += 1
+        return count
+
+    return store.update(apply, changed=tuple(people))
+
+
+def link_store(identities, store, batch=1000):
+    """One-off backfill: link every record of ``store`` without a person id,
+    oldest first (records from before the index existed)"""
+    unlinked = sorted((record for record in store.records().values() if not record.get('person_id')),
+                      key=_submitted)
+    linked = 0
+    for start in range(0, len(unlinked), batch):
+        linked += link_records(identities, store, [record['id'] for record in unlinked[start:start + batch]])
+    return linked
+
+
+def main(argv=None):
+    from changefeed import ChangeFeed
+    from records import Patient
+    from sharding import ShardedStore
+
+    parser = argparse.ArgumentParser(description="Link Health Kiosk patient visits to people")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--shards', default='patients_shards')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('link', help="give every patient record without a person id one")
+    args = parser.parse_args(argv)
+
+    identities = Identities(args.db)
+    identities.init_db()
+    store = ShardedStore(args.shards, 'city', record_class=Patient)
+    ChangeFeed(args.db).watch(store, 'patients')
+    print(f"✅ Linked {link_store(identities, store)} visits to people")
+
+
+if __name__ == '__main__':
+    main()
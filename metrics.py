@@ -0,0 +1,453 @@
+"""Request, storage, database, template and socket metrics in Prometheus format.
+
+A small in-process registry (no client library needed): counters, gauges
+and histograms keyed by label values, each guarded by its own lock, so an
+observation costs a dict lookup, a bisect and a few additions. ``/metrics``
+renders the text exposition format on demand.
+"""
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+from flask.signals import before_render_template, template_rendered
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, values)} {_number(value)}' for values, value in items]
+
+
+class Gauge(Counter):
+    """A settable value, or one computed at scrape time by ``callback``.
+
+    ``callback`` returns a number, or ``{label values tuple: number}``.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), callback=None):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            values = value if isinstance(value, dict) else {(): value}
+            return [f'{self.name}{_labels(self.labelnames, key)} {_number(v)}' for key, v in values.items()]
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(values, list(state)) for values, state in self._values.items()]
+        lines = []
+        for values, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, values)} {_number(state[-2])}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, values)} {state[-1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            samples = metric.samples()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.add(Histogram(
+    'healthkiosk_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status')))
+STORE_SECONDS = registry.add(Histogram(
+    'healthkiosk_store_duration_seconds', 'JSON store load/build/save time', ('store', 'operation')))
+DB_SECONDS = registry.add(Histogram(
+    'healthkiosk_db_query_duration_seconds', 'SQLite statement time, execute and fetch', ('operation', 'table')))
+TEMPLATE_SECONDS = registry.add(Histogram(
+    'healthkiosk_template_render_seconds', 'Jinja template render time', ('template',)))
+EMIT_SECONDS = registry.add(Histogram(
+    'healthkiosk_socket_emit_seconds', 'Socket.IO emit time', ('event',)))
+SOCKET_CONNECTIONS = registry.add(Gauge(
+    'healthkiosk_socket_connections', 'Connected Socket.IO clients'))
+SOCKET_CONNECTS = registry.add(Counter(
+    'healthkiosk_socket_connects_total', 'Socket.IO connections accepted'))
+ROOM_JOINS = registry.add(Counter(
+    'healthkiosk_socket_room_joins_total', 'Socket.IO room joins by room kind', ('kind',)))
+
+_STATEMENT = re.compile(r'^\s*(\w+)(?:\s+(?:OR\s+\w+\s+)?(\w+)\s+SET\b|.*?\b(?:FROM|INTO|TABLE|ON)\s+'
+                        r'(?:IF\s+NOT\s+EXISTS\s+)?(\w+))?', re.IGNORECASE | re.DOTALL)
+_EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete', 'replace')
+_render_starts = threading.local()
+# Per-thread {kind: [seconds, count]} for the request being served, or None
+_request_times = threading.local()
+
+# Set by init_app(); 0 turns the log off
+slow_query_seconds = 0
+slow_request_seconds = 0
+
+
+def statement_labels(sql):
+    """``(operation, table)`` for a statement, kept low-cardinality"""
+    match = _STATEMENT.match(sql)
+    if not match:
+        return 'other', ''
+    return match.group(1).lower(), (match.group(2) or match.group(3) or '').lower()
+
+
+def _add_request_time(kind, seconds):
+    breakdown = getattr(_request_times, 'breakdown', None)
+    if breakdown is not None:
+        entry = breakdown.get(kind)
+        if entry is None:
+            breakdown[kind] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+
+def _short(value, limit=80):
+    """Parameters as logged: long strings (inline images) cut down"""
+    if isinstance(value, (str, bytes)) and len(value) > limit:
+        return f"{value[:40]!r}... ({len(value)} {'chars' if isinstance(value, str) else 'bytes'})"
+    return repr(value)
+
+
+def query_plan(conn, sql, parameters):
+    """``EXPLAIN QUERY PLAN`` lines, indented by depth, or [] if it cannot be explained"""
+    if statement_labels(sql)[0] not in _EXPLAINABLE:
+        return []
+    try:
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    depth = {0: -1}
+    lines = []
+    for row in rows:
+        node, parent, detail = row[0], row[1], row[-1]
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return lines
+
+
+def log_slow_query(conn, sql, parameters, seconds, many=False):
+    if many:
+        # Explain with the first row of parameters, when it can be read without consuming an iterator
+        rows = parameters if isinstance(parameters, (list, tuple)) else ()
+        parameters = rows[0] if rows else None
+    text = ' '.join(sql.split())
+    print(f"🐢 Slow query {seconds * 1000:.1f} ms: {text}")
+    if parameters is not None:
+        if isinstance(parameters, dict):
+            values = ', '.join(f"{name}={_short(value)}" for name, value in parameters.items())
+        else:
+            values = ', '.join(_short(value) for value in parameters)
+        print(f"   params: {values}" + (" (first row)" if many else ""))
+        for number, line in enumerate(query_plan(conn, sql, parameters)):
+            print(f"   {'plan: ' if number == 0 else '      '}{line}")
+
+
+def _observe_statement(conn, sql, parameters, seconds, many):
+    operation, table = statement_labels(sql)
+    DB_SECONDS.observe(seconds, operation, table)
+    _add_request_time('db', seconds)
+    if slow_query_seconds and seconds >= slow_query_seconds:
+        log_slow_query(conn, sql, parameters, seconds, many)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Times a statement from execute() until its rows are read.
+
+    The time is recorded when the result is exhausted or fetched with
+    fetchall(), when the cursor runs its next statement, or when it is
+    closed or garbage collected (``conn.execute(...).fetchone()``).
+    """
+    _statement = None
+    _seconds = 0.0
+
+    def _run(self, method, sql, parameters, many):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            method(self, sql, parameters)
+        finally:
+            self._statement = (sql, parameters, many)
+            self._seconds = time.perf_counter() - started
+            if self.description is None:
+                self._finish()
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._run(sqlite3.Cursor.execute, sql, parameters, False)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_parameters, True)
+
+    def _finish(self):
+        statement = self._statement
+        if statement is not None:
+            self._statement = None
+            _observe_statement(self.connection, statement[0], statement[1], self._seconds, statement[2])
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        result = method(self, *args)
+        self._seconds += time.perf_counter() - started
+        return result
+
+    def fetchone(self):
+        row = self._timed(sqlite3.Cursor.fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(sqlite3.Cursor.fetchmany, *args)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(sqlite3.Cursor.fetchall)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._timed(sqlite3.Cursor.__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose statements are timed by TimedCursor"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def instrument_store(store, name):
+    def timer(_store, operation, seconds):
+        STORE_SECONDS.observe(seconds, name, operation)
+        _add_request_time('store', seconds)
+    store.timer = timer
+
+
+def timed_emit(emit, event, *args, **kwargs):
+    """Call ``emit(event, ...)`` (``socketio.emit`` or ``flask_socketio.emit``) and time it"""
+    started = time.perf_counter()
+    try:
+        return emit(event, *args, **kwargs)
+    finally:
+        EMIT_SECONDS.observe(time.perf_counter() - started, event)
+
+
+def room_kind(room):
+    """'chat_p1_doc' -> 'chat'; per-user rooms must not become label values"""
+    return room.split('_', 1)[0] if room else ''
+
+
+class Rooms:
+    """Socket.IO room membership as reported by the app's join and disconnect handlers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_sid = {}
+        self._members = {}
+
+    def joined(self, sid, room):
+        ROOM_JOINS.inc(room_kind(room))
+        with self._lock:
+            rooms = self._by_sid.setdefault(sid, set())
+            if room not in rooms:
+                rooms.add(room)
+                self._members[room] = self._members.get(room, 0) + 1
+
+    def left(self, sid, room=None):
+        """``room`` None: the client disconnected and left every room"""
+        with self._lock:
+            rooms = self._by_sid.get(sid, set())
+            for name in list(rooms) if room is None else [room] if room in rooms else []:
+                rooms.discard(name)
+                self._members[name] -= 1
+                if not self._members[name]:
+                    del self._members[name]
+            if not rooms:
+                self._by_sid.pop(sid, None)
+
+    def count(self):
+        with self._lock:
+            return len(self._members)
+
+
+ROOMS = Rooms()
+registry.add(Gauge('healthkiosk_socket_rooms', 'Named Socket.IO rooms with members', callback=ROOMS.count))
+
+
+def _before_render(sender, template, context, **extra):
+    stack = getattr(_render_starts, 'stack', None)
+    if stack is None:
+        stack = _render_starts.stack = []
+    stack.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    stack = getattr(_render_starts, 'stack', None)
+    if stack:
+        seconds = time.perf_counter() - stack.pop()
+        TEMPLATE_SECONDS.observe(seconds, template.name or 'string')
+        if not stack:
+            # Templates rendered inside another render are already part of its time
+            _add_request_time('render', seconds)
+
+
+def log_slow_request(seconds, breakdown):
+    parts = []
+    accounted = 0.0
+    for kind in ('store', 'db', 'render'):
+        spent, count = breakdown.get(kind, (0.0, 0))
+        accounted += spent
+        parts.append(f"{kind} {spent * 1000:.1f} ms ({count})")
+    parts.append(f"view {max(0.0, seconds - accounted) * 1000:.1f} ms")
+    print(f"🐢 Slow request {request.method} {request.full_path.rstrip('?')} in {seconds * 1000:.1f} ms: "
+          + ', '.join(parts))
+
+
+def init_app(app, token='', slow_query_ms=0, slow_request_ms=0):
+    """Register the request timers and /metrics.
+
+    Statements slower than ``slow_query_ms`` are logged with their
+    parameters and query plan; requests slower than ``slow_request_ms``
+    with the time spent in the stores, SQLite, templates and the view.
+    """
+    global slow_query_seconds, slow_request_seconds
+    slow_query_seconds = slow_query_ms / 1000
+    slow_request_seconds = slow_request_ms / 1000
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        _request_times.breakdown = {}
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        breakdown, _request_times.breakdown = getattr(_request_times, 'breakdown', None), None
+        if started is not None:
+            seconds = time.perf_counter() - started
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_SECONDS.observe(seconds, request.method, route, response.status_code)
+            if slow_request_seconds and seconds >= slow_request_seconds and breakdown is not None:
+                log_slow_request(seconds, breakdown)
+        return response
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.route('/metrics')
+    def metrics():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Not authorized\n', 401)
+        return Response(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
@@ -0,0 +1,246 @@
+"""Durable notification queue, delivered off the request path.
+
+Handlers call ``publish(event, payload)``, which only inserts rows into the
+``notifications`` table: one per channel subscribed to the event, in the
+caller's transaction when given ``conn``. A background dispatcher claims
+due rows in batches and hands each to its channel (Socket.IO emits, and
+SMS/email stand-ins until real gateways exist), so a slow emit or a
+locked database never holds up the page a doctor is waiting for.
+
+A failed delivery is retried with exponential backoff and parked as
+``dead`` after MAX_ATTEMPTS. A failing channel is paused for the same
+backoff, and a channel with a ``rate`` only takes that many deliveries per
+second. Rows held back either way stay queued with their next attempt
+moved to when the channel can take them, and a paused channel's rows are
+not selected at all, so they neither spin the dispatcher nor crowd out
+healthy channels. A slow or unavailable downstream never loses
+notifications and never slows the handlers that publish them.
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+DB_PATH = 'healthcare.db'
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+BASE_DELAY = 2.0
+MAX_DELAY = 600.0
+
+
+class Channel:
+    """A delivery target: ``send(event, payload)`` raises to ask for a retry"""
+
+    def __init__(self, name, send, rate=None):
+        self.name = name
+        self.send = send
+        self.rate = rate
+        self.failures = 0
+        self.paused_until = 0.0
+        self._allowance = rate or 0.0
+        self._checked = time.monotonic()
+
+    def ready(self, now):
+        """True if a delivery may go out now; takes one token when rate-limited"""
+        if now < self.paused_until:
+            return False
+        if self.rate is None:
+            return True
+        self._allowance = min(self.rate, self._allowance + (now - self._checked) * self.rate)
+        self._checked = now
+        if self._allowance < 1:
+            return False
+        self._allowance -= 1
+        return True
+
+    def wait(self, now):
+        """Seconds until ready() could say yes again"""
+        wait = self.paused_until - now
+        if self.rate is not None:
+            wait = max(wait, (1 - self._allowance) / self.rate)
+        return max(wait, 0.0)
+
+
+def stand_in(kind):
+    """SMS/email channel that only logs what a gateway would be asked to send"""
+    icon = {'sms': '📱', 'email': '📧'}.get(kind, '📨')
+
+    def send(event, payload):
+        recipient = payload.get('patient_id') or payload.get('animal_id') or '?'
+        print(f"{icon} [{kind} stand-in] {event} for {recipient}: {payload.get('message', '')}")
+    return send
+
+
+def backoff(attempts, base=BASE_DELAY, maximum=MAX_DELAY):
+    return min(maximum, base * 2 ** max(0, attempts - 1))
+
+
+class Notifications:
+    def __init__(self, db_path=DB_PATH, batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.channels = {}
+        self.routes = {}
+        self._wake = threading.Event()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                sent_at DATETIME
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications (status, next_attempt, id)')
+        conn.commit()
+        conn.close()
+
+    def add_channel(self, channel, events):
+        """Deliver ``events`` through ``channel`` from now on"""
+        self.channels[channel.name] = channel
+        for event in events:
+            self.routes.setdefault(event, []).append(channel.name)
+        return channel
+
+    def publish(self, event, payload, conn=None):
+        """Queue ``event`` for every channel subscribed to it.
+
+        With ``conn`` the rows join the caller's transaction; call
+        ``wake()`` after committing so the dispatcher picks them up at once.
+        """
+        channels = self.routes.get(event)
+        if not channels:
+            return
+        body = json.dumps(payload, ensure_ascii=False)
+        own = conn is None
+        if own:
+            conn = self._connect()
+        conn.executemany('INSERT INTO notifications (event, channel, payload) VALUES (?, ?, ?)',
+                         [(event, channel, body) for channel in channels])
+        if own:
+            conn.commit()
+            conn.close()
+            self.wake()
+
+    def wake(self):
+        self._wake.set()
+
+    def dispatch(self):
+        """Deliver one batch of due notifications; returns how many were sent, retried or given up"""
+        now = time.time()
+        paused = [name for name, channel in self.channels.items() if channel.paused_until > time.monotonic()]
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT id, event, channel, payload, attempts FROM notifications
+            WHERE status = 'pending' AND next_attempt <= ? AND channel NOT IN (%s) ORDER BY id LIMIT ?
+        ''' % ','.join('?' * len(paused)), [now] + paused + [self.batch_size]).fetchall()
+        conn.close()
+        if not rows:
+            return 0
+
+        sent, retries, dead, held = [], [], [], []
+        for row in rows:
+            channel = self.channels.get(row['channel'])
+            if channel is None:
+                dead.append((row['attempts'], f"no channel {row['channel']}", row['id']))
+                continue
+            if not channel.ready(time.monotonic()):
+                # Paused or over its rate: stays queued until the channel can take it
+                held.append((now + channel.wait(time.monotonic()), row['id']))
+                continue
+            try:
+                channel.send(row['event'], json.loads(row['payload']))
+            except Exception as e:
+                attempts = row['attempts'] + 1
+                channel.failures += 1
+                channel.paused_until = time.monotonic() + backoff(channel.failures)
+                if attempts >= self.max_attempts:
+                    dead.append((attempts, str(e), row['id']))
+                    print(f"❌ Notification {row['id']} ({row['event']} via {row['channel']}) gave up: {e}")
+                else:
+                    retries.append((attempts, now + backoff(attempts), str(e), row['id']))
+                continue
+            channel.failures = 0
+            sent.append((row['id'],))
+
+        conn = self._connect()
+        conn.executemany("UPDATE notifications SET status = 'sent', sent_at = CURRENT_TIMESTAMP WHERE id = ?", sent)
+        conn.executemany('UPDATE notifications SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?',
+                         retries)
+        conn.executemany("UPDATE notifications SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?", dead)
+        conn.executemany('UPDATE notifications SET next_attempt = ? WHERE id = ?', held)
+        conn.commit()
+        conn.close()
+        return len(sent) + len(retries) + len(dead)
+
+    def run_forever(self, interval=1.0):
+        """Dispatch whenever woken by publish(), and every ``interval`` seconds for retries"""
+        while True:
+            self._wake.clear()
+            try:
+                handled = self.dispatch()
+            except Exception as e:
+                print(f"❌ Notification dispatcher error: {e}")
+                handled = 0
+            # A full batch means more may be waiting; anything less, or nothing delivered, sleeps
+            if handled < self.batch_size:
+                self._wake.wait(interval)
+
+    def counts(self):
+        conn = self._connect()
+        counts = dict(conn.execute('SELECT status, COUNT(*) FROM notifications GROUP BY status').fetchall())
+        conn.close()
+        return counts
+
+    def requeue_dead(self):
+        conn = self._connect()
+        cursor = conn.execute("UPDATE notifications SET status = 'pending', attempts = 0, next_attempt = 0 "
+                              "WHERE status = 'dead'")
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+
+    def prune(self, days=7):
+        """Forget notifications delivered more than ``days`` ago"""
+        conn = self._connect()
+        cursor = conn.execute("DELETE FROM notifications WHERE status = 'sent' AND sent_at < datetime('now', ?)",
+                              (f'-{int(days)} days',))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the notification queue")
+    parser.add_argument('--db', default=DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help="count notifications by status")
+    sub.add_parser('requeue', help="retry notifications that gave up")
+    args = parser.parse_args(argv)
+
+    queue = Notifications(args.db)
+    queue.init_db()
+    if args.command == 'status':
+        counts = queue.counts()
+        print(f"🔔 {counts.get('pending', 0)} pending, {counts.get('sent', 0)} sent, {counts.get('dead', 0)} dead")
+    else:
+        print(f"🔔 Requeued {queue.requeue_dead()} notifications")
+
+
+if __name__ == '__main__':
+    main()
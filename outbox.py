@@ -0,0 +1,225 @@
+"""Store-and-forward queue for kiosks with unreliable connectivity.
+
+In kiosk mode (``HEALTHKIOSK_CENTRAL_URL`` set) every patient/animal
+submission and chat message is saved locally as usual and also appended to
+the ``outbox`` table in the same database. A background loop uploads
+pending entries to the central server's ``/api/ingest/batch`` in gzip
+batches of up to a few hundred entries, so reconnecting after a day
+offline costs a handful of requests. Submissions are queued before the
+record is written, so a crash in between cannot keep one from the central
+server; if the write fails, the entry is discarded again. Each entry
+carries an idempotency key (kiosk id, kind, local id); the server
+remembers keys it has applied, so a batch that is retried after a lost
+response is not applied twice.
+"""
+import argparse
+import gzip
+import json
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+
+DB_PATH = 'healthcare.db'
+BATCH_SIZE = 500
+MAX_BATCH_BYTES = 8 * 1024 * 1024  # uncompressed; chat images make entries large
+KINDS = ('patient', 'animal', 'message')
+INGEST_PATH = '/api/ingest/batch'
+
+
+class OutboxError(Exception):
+    """The central server could not be reached or refused a batch"""
+
+
+def encode_batch(kiosk_id, items):
+    body = json.dumps({'kiosk_id': kiosk_id, 'items': items}, ensure_ascii=False, separators=(',', ':'))
+    return gzip.compress(body.encode('utf-8'), compresslevel=6)
+
+
+def decode_batch(body, content_encoding=None):
+    """Parse an ingest request body; raises ValueError if it is malformed"""
+    if content_encoding == 'gzip':
+        try:
+            body = gzip.decompress(body)
+        except OSError as e:
+            raise ValueError(f"bad gzip body: {e}")
+    elif content_encoding not in (None, '', 'identity'):
+        raise ValueError(f"unsupported Content-Encoding {content_encoding}")
+    try:
+        batch = json.loads(body.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"bad JSON body: {e}")
+    if not isinstance(batch, dict) or not isinstance(batch.get('items'), list):
+        raise ValueError("batch must be an object with an items list")
+    for item in batch['items']:
+        if not isinstance(item, dict) or not isinstance(item.get('key'), str) or not isinstance(item.get('payload'), dict):
+            raise ValueError("every item needs a string key and an object payload")
+    return batch
+
+
+def post_batch(central_url, token, body, timeout=60):
+    request = urllib.request.Request(
+        central_url.rstrip('/') + INGEST_PATH, data=body, method='POST',
+        headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip',
+                 'Authorization': f'Bearer {token}'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        raise OutboxError(f"central server answered {e.code}")
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise OutboxError(f"central server unreachable: {e}")
+
+
+class Outbox:
+    def __init__(self, db_path=DB_PATH, kiosk_id='kiosk'):
+        self.db_path = db_path
+        self.kiosk_id = kiosk_id
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT UNIQUE NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                sent_at DATETIME,
+                result TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (sent_at, seq)')
+        conn.commit()
+        conn.close()
+
+    def key(self, kind, local_id):
+        return f"{self.kiosk_id}:{kind}:{local_id}"
+
+    def add(self, kind, local_id, payload, conn=None):
+        """Queue one entry. With ``conn`` it joins the caller's transaction."""
+        own = conn is None
+        if own:
+            conn = self._connect()
+        conn.execute('INSERT OR IGNORE INTO outbox (idempotency_key, kind, payload) VALUES (?, ?, ?)',
+                     (self.key(kind, local_id), kind, json.dumps(payload, ensure_ascii=False)))
+        if own:
+            conn.commit()
+            conn.close()
+
+    def discard(self, kind, local_id):
+        """Drop an entry that has not been sent, e.g. because its local write failed"""
+        conn = self._connect()
+        conn.execute('DELETE FROM outbox WHERE idempotency_key = ? AND sent_at IS NULL', (self.key(kind, local_id),))
+        conn.commit()
+        conn.close()
+
+    def pending(self, limit=BATCH_SIZE, max_bytes=MAX_BATCH_BYTES):
+        """Oldest unsent entries, at most ``limit`` and roughly ``max_bytes``"""
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT idempotency_key, kind, payload FROM outbox
+            WHERE sent_at IS NULL ORDER BY seq LIMIT ?
+        ''', (limit,)).fetchall()
+        conn.close()
+        items, size = [], 0
+        for row in rows:
+            size += len(row['payload'])
+            if items and size > max_bytes:
+                break
+            items.append({'key': row['idempotency_key'], 'kind': row['kind'], 'payload': json.loads(row['payload'])})
+        return items
+
+    def mark_sent(self, results):
+        """Record the server's verdict (``{key: result}``) for delivered entries"""
+        conn = self._connect()
+        conn.executemany('UPDATE outbox SET sent_at = CURRENT_TIMESTAMP, result = ? WHERE idempotency_key = ?',
+                         [(result, key) for key, result in results.items()])
+        conn.commit()
+        conn.close()
+
+    def counts(self):
+        conn = self._connect()
+        pending, sent = conn.execute('''
+            SELECT COALESCE(SUM(sent_at IS NULL), 0), COALESCE(SUM(sent_at IS NOT NULL), 0) FROM outbox
+        ''').fetchone()
+        conn.close()
+        return pending, sent
+
+    def prune(self, days=7):
+        """Forget entries the server acknowledged more than ``days`` ago"""
+        conn = self._connect()
+        cursor = conn.execute("DELETE FROM outbox WHERE sent_at < datetime('now', ?)", (f'-{int(days)} days',))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+
+    def flush(self, central_url, token, batch_size=BATCH_SIZE):
+        """Upload everything pending; returns the number of entries delivered.
+
+        Raises OutboxError when the server cannot be reached. Entries stay
+        queued until the server has answered for them.
+        """
+        delivered = 0
+        while True:
+            items = self.pending(batch_size)
+            if not items:
+                return delivered
+            response = post_batch(central_url, token, encode_batch(self.kiosk_id, items))
+            results = response.get('results') or {}
+            answered = {item['key']: results[item['key']] for item in items if item['key'] in results}
+            if not answered:
+                raise OutboxError("central server did not acknowledge the batch")
+            self.mark_sent(answered)
+            delivered += len(answered)
+            for key, result in answered.items():
+                if result == 'rejected':
+                    print(f"❌ Central server rejected outbox entry {key}")
+
+    def run_forever(self, central_url, token, interval=60, batch_size=BATCH_SIZE, max_backoff=900):
+        """Flush every ``interval`` seconds, backing off while offline"""
+        delay = interval
+        while True:
+            try:
+                delivered = self.flush(central_url, token, batch_size)
+                if delivered:
+                    print(f"📤 Synced {delivered} queued entries to {central_url}")
+                delay = interval
+            except OutboxError as e:
+                delay = min(delay * 2, max_backoff)
+                print(f"📴 Outbox sync failed ({e}); retrying in {delay}s")
+            except Exception as e:
+                delay = min(delay * 2, max_backoff)
+                print(f"❌ Outbox sync error: {e}")
+            time.sleep(delay)
+
+
+def main(argv=None):
+    import config
+
+    parser = argparse.ArgumentParser(description="Inspect or flush the kiosk outbox")
+    parser.add_argument('--db', default=DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help="count pending and delivered entries")
+    sub.add_parser('flush', help="upload pending entries to the central server now")
+    args = parser.parse_args(argv)
+
+    box = Outbox(args.db, config.KIOSK_ID)
+    box.init_db()
+    if args.command == 'status':
+        pending, sent = box.counts()
+        print(f"📦 {pending} pending, {sent} delivered")
+    else:
+        if not config.CENTRAL_URL:
+            parser.error("HEALTHKIOSK_CENTRAL_URL is not set")
+        delivered = box.flush(config.CENTRAL_URL, config.SYNC_TOKEN)
+        print(f"📤 Delivered {delivered} entries")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Prescriptions stored as structured rows instead of text.
+
+A prescription is one ``doctor_records`` row (who prescribed, for whom,
+when) plus one ``prescription_items`` row per line the doctor wrote::
+
+    prescription_id  doctor_records.id
+    kind, record_id  'patient'/'animal' and its id in the JSON store
+    position         line number within the prescription
+    text             the line exactly as the doctor wrote it
+    medicine, dose, frequency, duration
+    notes            what is left of the line; advice lines are all notes
+
+Doctors still type free text. ``parse()`` splits each line into those
+fields, which only feed the medicine index and search: ``render()``
+shows the lines as written. Patient/animal records only keep the
+``prescription_id``. ``medicine`` compares case-insensitively and is
+indexed, so "everyone on amoxicillin" is an index lookup.
+"""
+import re
+import sqlite3
+
+DB_PATH = 'healthcare.db'
+ITEM_FIELDS = ('text', 'medicine', 'dose', 'frequency', 'duration', 'notes')
+
+_UNITS = (r'mg|mcg|g|gm|ml|iu|units?|tabs?|tablets?|caps?|capsules?|drops?|sachets?|puffs?|'
+          r'bolus(?:es)?|injections?')
+DOSE = re.compile(rf'\b\d+(?:\.\d+)?\s*(?:{_UNITS})\b', re.IGNORECASE)
+FREQUENCY = re.compile(
+    r'\b(?:(?:once|twice|thrice|(?:one|two|three|four|\d+) times?)\s+(?:a\s+|per\s+)?(?:day|daily|week|weekly)'
+    r'(?:\s+(?:after|before|with)\s+(?:food|meals?))?'
+    r'|every\s+\d+\s+(?:hours?|hrs?|days?)|at\s+(?:night|bedtime)|(?:when|as|if)\s+needed'
+    r'|\d\s*-\s*\d\s*-\s*\d|OD|BD|BID|TDS|TID|QID|HS|SOS|PRN|STAT)\b', re.IGNORECASE)
+DURATION = re.compile(r'\b(?:for|x)\s*(\d+\s*(?:days?|weeks?|months?))\b', re.IGNORECASE)
+BULLET = re.compile(r'^\s*(?:\d+[.)]|[-*•])\s*')
+# "Tab Azithromycin 500mg": the form goes with the dose so the medicine name stays searchable
+FORM = re.compile(r'^(?:tab|tabs|tablet|cap|caps|capsule|syp|syrup|inj)\.?\s+', re.IGNORECASE)
+LEGACY_MARKER = '--- PRESCRIPTION ---'
+
+
+def parse_line(line):
+    """One line of a prescription as an item dict"""
+    item = dict.fromkeys(ITEM_FIELDS, '')
+    item['text'] = line.strip()
+    line = BULLET.sub('', line).strip()
+    spans = []
+    for name, pattern in (('dose', DOSE), ('frequency', FREQUENCY), ('duration', DURATION)):
+        match = pattern.search(line)
+        if match:
+            item[name] = (match.group(1) if pattern is DURATION else match.group(0)).strip()
+            spans.append(match.span())
+    if not spans:
+        item['notes'] = line
+        return item
+    spans.sort()
+    medicine = line[:spans[0][0]].strip(' ,;:-')
+    form = FORM.match(medicine)
+    if form and medicine[form.end():]:
+        medicine = medicine[form.end():]
+        item['dose'] = f"{form.group(0).strip()} {item['dose']}".strip()
+    item['medicine'] = medicine
+    rest, end = [], spans[0][0]
+    for start, stop in spans:
+        rest.append(line[end:start])
+        end = max(end, stop)
+    rest.append(line[end:])
+    item['notes'] = re.sub(r'\s+', ' ', ' '.join(rest)).strip(' ,;:-')
+    return item
+
+
+def parse(text):
+    """The items of a free-text prescription, one per non-blank line"""
+    return [parse_line(line) for line in text.splitlines() if line.strip()]
+
+
+def render_item(item):
+    """The line as written; items stored before the text was kept are rebuilt from their fields"""
+    if item.get('text'):
+        return item['text']
+    duration = f"for {item['duration']}" if item['duration'] else ''
+    return ' '.join(part for part in (item['medicine'], item['dose'], item['frequency'], duration, item['notes'])
+                    if part)
+
+
+def render(items):
+    return '\n'.join(render_item(item) for item in items)
+
+
+def has_prescription(record):
+    return bool(record.get('prescription_id') or record.get('prescription'))
+
+
+def legacy_text(text):
+    """The doctor's part of a prescription stored the old way, with its header lines"""
+    head, marker, body = (text or '').partition(LEGACY_MARKER)
+    return body.strip() if marker else (text or '').strip()
+
+
+class Prescriptions:
+    def __init__(self, db_path=DB_PATH, connection_factory=sqlite3.Connection):
+        self.db_path = db_path
+        self.connection_factory = connection_factory
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, factory=self.connection_factory)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS prescription_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prescription_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                text TEXT NOT NULL DEFAULT '',
+                medicine TEXT NOT NULL COLLATE NOCASE,
+                dose TEXT NOT NULL DEFAULT '',
+                frequency TEXT NOT NULL DEFAULT '',
+                duration TEXT NOT NULL DEFAULT '',
+                notes TEXT NOT NULL DEFAULT ''
+            )
+        ''')
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(prescription_items)')}
+        if 'text' not in columns:
+            conn.execute("ALTER TABLE prescription_items ADD COLUMN text TEXT NOT NULL DEFAULT ''")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_prescription_items_prescription '
+                     'ON prescription_items (prescription_id, position)')
+        # Declared NOCASE, so both "= ?" and "LIKE 'amox%'" can use it
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_prescription_items_medicine '
+                     'ON prescription_items (medicine, kind)')
+        conn.commit()
+        conn.close()
+
+    def add(self, prescription_id, kind, record_id, items, conn):
+        """Insert the items of ``prescription_id`` on ``conn``; the caller commits"""
+        conn.executemany('''
+            INSERT INTO prescription_items
+                (prescription_id, kind, record_id, position, text, medicine, dose, frequency, duration, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(prescription_id, kind, record_id, position) + tuple(item[name] for name in ITEM_FIELDS)
+              for position, item in enumerate(items)])
+
+    def remove(self, prescription_id, conn):
+        """Delete the items of ``prescription_id`` on ``conn``; the caller commits"""
+        conn.execute('DELETE FROM prescription_items WHERE prescription_id = ?', (prescription_id,))
+
+    def items(self, prescription_id):
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT text, medicine, dose, frequency, duration, notes FROM prescription_items
+            WHERE prescription_id = ? ORDER BY position
+        ''', (prescription_id,)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def by_doctor(self, doctor_id):
+        """``{prescription_id: items}`` for everything ``doctor_id`` prescribed, in one query"""
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT i.prescription_id, i.text, i.medicine, i.dose, i.frequency, i.duration, i.notes
+            FROM doctor_records d JOIN prescription_items i ON i.prescription_id = d.id
+            WHERE d.doctor_id = ? ORDER BY i.prescription_id, i.position
+        ''', (doctor_id,)).fetchall()
+        conn.close()
+        items = {}
+        for row in rows:
+            item = dict(row)
+            items.setdefault(item.pop('prescription_id'), []).append(item)
+        return items
+
+    def items_many(self, prescription_ids):
+        """``{prescription_id: items}`` for a page of prescriptions"""
+        ids = list(prescription_ids)
+        if not ids:
+            return {}
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT prescription_id, text, medicine, dose, frequency, duration, notes FROM prescription_items
+            WHERE prescription_id IN (%s) ORDER BY prescription_id, position
+        ''' % ','.join('?' * len(ids)), ids).fetchall()
+        conn.close()
+        items = {}
+        for row in rows:
+            item = dict(row)
+            items.setdefault(item.pop('prescription_id'), []).append(item)
+        return items
+
+    def text(self, record):
+        """Display text of a patient/animal record's prescription"""
+        if record.get('prescription_id'):
+            return render(self.items(record['prescription_id']))
+        return legacy_text(record.get('prescription'))
+
+    def taking(self, medicine, kind=None, prefix=False):
+        """Prescription items for ``medicine`` (``prefix``: names starting with it), newest first"""
+        sql = '''
+            SELECT i.kind, i.record_id, i.prescription_id, i.text, i.medicine, i.dose, i.frequency, i.duration,
+                   d.doctor_id, d.patient_name, d.prescription_date
+            FROM prescription_items i JOIN doctor_records d ON d.id = i.prescription_id
+            WHERE i.medicine {} ?
+        '''.format('LIKE' if prefix else '=')
+        params = [medicine.replace('%', '').replace('_', '') + '%' if prefix else medicine]
+        if kind:
+            sql += ' AND i.kind = ?'
+            params.append(kind)
+        conn = self._connect()
+        rows = conn.execute(sql + ' ORDER BY i.prescription_id DESC', params).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def backfill(self, batch_size=1000):
+        """Parse doctor_records rows written before the items table existed.
+
+        Their text is left in place; returns how many rows were parsed.
+        Items parsed before the line text was kept get it back from there.
+        """
+        conn = self._connect()
+        self._restore_text(conn)
+        rows = conn.execute('''
+            SELECT d.id, d.patient_id, d.prescription FROM doctor_records d
+            WHERE d.prescription IS NOT NULL AND d.prescription != ''
+              AND NOT EXISTS (SELECT 1 FROM prescription_items i WHERE i.prescription_id = d.id)
+        ''').fetchall()
+        for start in range(0, len(rows), batch_size):
+            for row in rows[start:start + batch_size]:
+                kind = 'animal' if row['patient_id'].startswith('animal_') else 'patient'
+                self.add(row['id'], kind, row['patient_id'], parse(legacy_text(row['prescription'])), conn)
+            conn.commit()
+        conn.close()
+        if rows:
+            print(f"💊 Parsed {len(rows)} stored prescriptions into prescription items")
+        return len(rows)
+
+    def _restore_text(self, conn):
+        rows = conn.execute('''
+            SELECT d.id, d.prescription FROM doctor_records d
+            WHERE d.prescription IS NOT NULL AND d.prescription != ''
+              AND EXISTS (SELECT 1 FROM prescription_items i WHERE i.prescription_id = d.id AND i.text = '')
+        ''').fetchall()
+        for row in rows:
+            lines = [line.strip() for line in legacy_text(row['prescription']).splitlines() if line.strip()]
+            conn.executemany("UPDATE prescription_items SET text = ? WHERE prescription_id = ? AND position = ? "
+                             "AND text = ''", [(line, row['id'], position) for position, line in enumerate(lines)])
+        conn.commit()
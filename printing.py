@@ -0,0 +1,273 @@
+"""Printable prescription slips, rendered off the request path.
+
+A prescribed patient or animal prints as a self-contained HTML page
+(A5, no external CSS, ``?autoprint=1`` opens the print dialog) or as a
+PDF drawn with the built-in PDF fonts, so no extra library is needed.
+Renders run on a small worker pool and are cached by (kind, id, slip
+version, format, language): a reprint is a cache hit, a queue of prints
+at the counter waits on the pool instead of tying up web workers, and a
+new prescription changes the version so stale slips simply age out. The
+version is a digest of what the slip shows, so it also serves as an ETag
+that survives restarts and matches across worker processes.
+
+The PDF fonts only cover Latin-1, so PDFs are always in English; the HTML
+slip is rendered in the kiosk language.
+"""
+import hashlib
+import json
+import textwrap
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import i18n
+import prescriptions
+
+FORMATS = {'html': 'text/html; charset=utf-8', 'pdf': 'application/pdf'}
+TEMPLATE = 'print/prescription.html'
+CACHE_BYTES = 32 * 1024 * 1024
+RENDER_TIMEOUT = 10
+
+# (label key, field) pairs printed above the prescription
+PATIENT_FIELDS = (('patient_id', 'id'), ('name', 'name'), ('age', 'age'), ('city', 'city'),
+                  ('blood_group', 'blood_group'), ('bp', 'bp'), ('sugar', 'sugar'), ('oxygen', 'oxygen'),
+                  ('weight', 'weight'))
+ANIMAL_FIELDS = (('animal_name', 'animal_name'), ('animal_type', 'animal_type'), ('gender', 'gender'),
+                 ('breed', 'breed'), ('condition', 'condition'), ('owner_name', 'owner_name'),
+                 ('village', 'village'), ('contact', 'contact'))
+
+
+def slip(kind, record, t, text):
+    """Everything printed on a slip, as plain values shared by both formats"""
+    if kind == 'animal':
+        record_id, fields, doctor = record['animal_id'], ANIMAL_FIELDS, record.get('veterinarian_name')
+    else:
+        record_id, fields, doctor = record['id'], PATIENT_FIELDS, record.get('doctor_name')
+    return {
+        'kind': kind,
+        'id': record_id,
+        'fields': [(t(label), record.get(name) or '') for label, name in fields],
+        'symptoms': record.get('symptoms') or '',
+        'prescription': text,
+        'doctor': doctor or '',
+        'date': record.get('prescription_date') or '',
+        'labels': {key: t(key) for key in ('health_kiosk', 'symptoms', 'prescription_details', 'print')},
+    }
+
+
+def slip_version(kind, record):
+    """Digest of everything a slip prints; unlike Record.revision (a salted hash()) it is stable"""
+    fields = ANIMAL_FIELDS if kind == 'animal' else PATIENT_FIELDS
+    doctor = 'veterinarian_name' if kind == 'animal' else 'doctor_name'
+    parts = [record.get(name) or '' for _, name in fields]
+    parts += [record.get(name) or '' for name in ('symptoms', 'prescription_id', 'prescription', 'prescription_date',
+                                                   doctor)]
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+# PDF
+
+PAGE_WIDTH, PAGE_HEIGHT = 420, 595  # A5 in points
+MARGIN = 36
+FONTS = (('F1', 'Helvetica'), ('F2', 'Helvetica-Bold'), ('F3', 'Courier'))
+
+
+def pdf_string(text):
+    text = str(text).encode('latin-1', 'replace').decode('latin-1')
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+class PdfWriter:
+    """Just enough PDF for a slip: lines of text in the built-in fonts, rules and page breaks"""
+
+    def __init__(self, width=PAGE_WIDTH, height=PAGE_HEIGHT, margin=MARGIN):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+        self.y = self.height - self.margin
+
+    def _advance(self, leading):
+        if self.y - leading < self.margin:
+            self.new_page()
+        self.y -= leading
+
+    def text(self, text, font='F1', size=10, leading=None, x=None):
+        self._advance(leading or size * 1.4)
+        self.ops.append(f"BT /{font} {size} Tf {x or self.margin} {self.y:.1f} Td {pdf_string(text)} Tj ET")
+
+    def field(self, label, value, size=10, indent=110):
+        self.text(label, 'F2', size)
+        self.ops.append(f"BT /F1 {size} Tf {self.margin + indent} {self.y:.1f} Td {pdf_string(value)} Tj ET")
+
+    def paragraphs(self, text, size=10):
+        """Courier, so wrapping by character count is exact"""
+        columns = int((self.width - 2 * self.margin) / (0.6 * size))
+        for line in text.splitlines() or ['']:
+            for part in textwrap.wrap(line, columns) or ['']:
+                self.text(part, 'F3', size)
+
+    def rule(self, gap=8):
+        self._advance(gap)
+        self.ops.append(f"0.5 w {self.margin} {self.y:.1f} m {self.width - self.margin} {self.y:.1f} l S")
+
+    def getvalue(self):
+        objects = ['<< /Type /Catalog /Pages 2 0 R >>', None]
+        fonts = []
+        for name, base in FONTS:
+            objects.append(f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>")
+            fonts.append(f"/{name} {len(objects)} 0 R")
+        resources = f"<< /Font << {' '.join(fonts)} >> >>"
+        kids = []
+        for ops in self.pages:
+            stream = '\n'.join(ops).encode('latin-1')
+            objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode('latin-1') + stream + b"\nendstream")
+            objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.width} {self.height}] "
+                           f"/Resources {resources} /Contents {len(objects)} 0 R >>")
+            kids.append(f"{len(objects)} 0 R")
+        objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += f"{number} 0 obj\n".encode('latin-1')
+            out += body if isinstance(body, bytes) else body.encode('latin-1')
+            out += b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+        for offset in offsets:
+            out += f"{offset:010d} 00000 n \n".encode('latin-1')
+        out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+        return bytes(out)
+
+
+def render_pdf(doc):
+    pdf = PdfWriter()
+    pdf.text(doc['labels']['health_kiosk'], 'F2', 16, leading=18)
+    pdf.text(f"{doc['labels']['prescription_details']} - {doc['id']}", 'F1', 10)
+    pdf.rule()
+    for label, value in doc['fields']:
+        pdf.field(label, value)
+    if doc['symptoms']:
+        pdf.rule()
+        pdf.text(doc['labels']['symptoms'], 'F2', 11)
+        pdf.paragraphs(doc['symptoms'])
+    pdf.rule()
+    pdf.text(doc['labels']['prescription_details'], 'F2', 11)
+    pdf.paragraphs(doc['prescription'])
+    pdf.rule(16)
+    pdf.text(f"Dr. {doc['doctor']}", 'F2', 10)
+    pdf.text(doc['date'], 'F1', 9)
+    return pdf.getvalue()
+
+
+class PrintCache:
+    """LRU of rendered slips, bounded by total bytes"""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = body
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, dropped = self._entries.popitem(last=False)
+                self.bytes -= len(dropped)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Printer:
+    """Renders slips on ``workers`` threads; concurrent requests for one slip share a render.
+
+    ``prescription_text(record)`` returns the text printed as the prescription.
+    """
+
+    def __init__(self, app, prescription_text, workers=2, cache_bytes=CACHE_BYTES):
+        self.app = app
+        self.prescription_text = prescription_text
+        self.cache = PrintCache(cache_bytes)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='print')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, record, fmt, lang):
+        # PDFs are English whatever the kiosk language
+        return (kind, record.key, slip_version(kind, record), fmt, 'en' if fmt == 'pdf' else lang)
+
+    def render(self, kind, record, fmt, lang):
+        catalog = i18n.get_catalog('en' if fmt == 'pdf' else lang)
+        doc = slip(kind, record, catalog.t, self.prescription_text(record))
+        if fmt == 'pdf':
+            return render_pdf(doc)
+        template = self.app.jinja_env.get_template(TEMPLATE)
+        return template.render(doc=doc, t=catalog.t, lang=catalog.lang).encode('utf-8')
+
+    def _run(self, key, kind, record, fmt, lang):
+        body = self.render(kind, record, fmt, lang)
+        self.cache.put(key, body)
+        return body
+
+    def _forget(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def submit(self, kind, record, fmt='html', lang='en'):
+        """A future for the slip's bytes, already done on a cache hit"""
+        key = self.key(kind, record, fmt, lang)
+        body = self.cache.get(key)
+        if body is not None:
+            future = Future()
+            future.set_result(body)
+            return future
+        with self._lock:
+            future = self._pending.get(key)
+            started = future is None
+            if started:
+                future = self._pending[key] = self.executor.submit(self._run, key, kind, record, fmt, lang)
+        if started:
+            # Runs at once if the render already finished, so not under the lock
+            future.add_done_callback(lambda done: self._forget(key))
+        return future
+
+    def get(self, kind, record, fmt='html', lang='en', timeout=RENDER_TIMEOUT):
+        """The slip's bytes; raises concurrent.futures.TimeoutError if the pool is backed up"""
+        return self.submit(kind, record, fmt, lang).result(timeout)
+
+    def prefetch(self, kind, record, lang='en'):
+        """Start rendering a freshly prescribed record so its first print is a cache hit"""
+        if record is None or not prescriptions.has_prescription(record):
+            return
+        for fmt in FORMATS:
+            self.submit(kind, record, fmt, lang)
+
+    def queued(self):
+        with self._lock:
+            return len(self._pending)
@@ -0,0 +1,270 @@
+"""On-demand profiling of the live server, for doctors (admins) only.
+
+Two ways to capture a profile:
+
+* a sampling window over live traffic: ``POST /api/profile/start?seconds=30``
+  samples the stacks of the threads serving requests (``all=1``: every
+  thread, including Socket.IO handlers and scheduler jobs) every
+  ``interval`` seconds until the window ends or ``POST /api/profile/stop``;
+* a single request: send ``X-Profile: sample`` (or ``cprofile``) with it;
+  the response carries ``X-Profile-Id``.
+
+``GET /api/profile`` lists the last captures and ``GET /api/profile/<id>``
+downloads one. Sampled profiles are collapsed stacks, one ``frame;frame;...
+count`` line per stack, as read by flamegraph.pl, speedscope and inferno;
+cProfile captures are pstats files (snakeviz, flameprof, gprof2dot).
+"""
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from flask import Response, g, jsonify, request, session
+
+DEFAULT_INTERVAL = 0.005
+MIN_INTERVAL = 0.001
+MAX_WINDOW_SECONDS = 300
+KEEP_PROFILES = 20
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def frame_label(code, root=ROOT):
+    """``function (path:line)``, with paths inside the app made relative"""
+    filename = code.co_filename
+    if filename.startswith(root):
+        filename = os.path.relpath(filename, root)
+    else:
+        filename = os.path.basename(filename)
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+class Sampler:
+    """Collects thread stacks from a background thread.
+
+    ``threads`` returns the idents to sample on each tick, or is None for
+    every thread except the sampler's own. ``on_finish(sampler)`` runs on
+    the sampling thread once it stops, by ``stop()`` or after ``duration``.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, threads=None, duration=None, on_finish=None):
+        self.interval = max(MIN_INTERVAL, interval)
+        self.threads = threads
+        self.duration = duration
+        self.on_finish = on_finish
+        self.stacks = Counter()
+        self.ticks = 0
+        self.started = None
+        self.stopped = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.duration if self.duration else None
+        while not self._stop.wait(self.interval):
+            wanted = self.threads() if self.threads is not None else None
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (wanted is not None and ident not in wanted):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self.stacks[tuple(stack)] += 1
+            self.ticks += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        self.stopped = time.time()
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+    def collapsed(self):
+        """Folded stacks, outermost frame first, heaviest stack first"""
+        labels = {}
+        lines = []
+        for stack, count in self.stacks.most_common():
+            names = []
+            for code in reversed(stack):
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = frame_label(code)
+                names.append(label)
+            lines.append(f"{';'.join(names)} {count}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+class Profiles:
+    """The last KEEP_PROFILES captures, newest last"""
+
+    def __init__(self, keep=KEEP_PROFILES):
+        self.keep = keep
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, kind, fmt, data, **info):
+        profile_id = uuid.uuid4().hex[:12]
+        entry = dict(info, id=profile_id, kind=kind, format=fmt, bytes=len(data),
+                     created=time.strftime("%Y-%m-%d %H:%M:%S"))
+        with self._lock:
+            self._items[profile_id] = (entry, data)
+            while len(self._items) > self.keep:
+                self._items.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._items.get(profile_id)
+
+    def list(self):
+        with self._lock:
+            return [entry for entry, _ in reversed(self._items.values())]
+
+
+def pstats_bytes(profile):
+    """The same bytes ``Profile.dump_stats`` writes"""
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def init_app(app):
+    profiles = Profiles()
+    request_threads = set()
+    threads_lock = threading.Lock()
+    state = {'window': None, 'profile_id': None}
+    # Held while a window is claimed or released, so two start requests cannot both start a sampler
+    window_lock = threading.Lock()
+
+    def active_request_threads():
+        with threads_lock:
+            return set(request_threads)
+
+    def finish_window(sampler):
+        scope = state['window'][1]
+        seconds = sampler.stopped - sampler.started
+        state['profile_id'] = profiles.add('window', 'collapsed', sampler.collapsed().encode('utf-8'), scope=scope,
+                                           interval=sampler.interval, seconds=round(seconds, 3),
+                                           samples=sum(sampler.stacks.values()))
+        with window_lock:
+            state['window'] = None
+        print(f"🔬 Profile {state['profile_id']}: {sampler.ticks} ticks over {seconds:.1f}s")
+
+    @app.before_request
+    def start_request_profile():
+        with threads_lock:
+            request_threads.add(threading.get_ident())
+        mode = request.headers.get('X-Profile')
+        if not mode or not session.get('doctor_logged_in'):
+            return
+        if mode == 'cprofile':
+            g.profile = cProfile.Profile()
+            g.profile.enable()
+        else:
+            ident = threading.get_ident()
+            g.profile = Sampler(MIN_INTERVAL, lambda: {ident}).start()
+        g.profile_started = time.perf_counter()
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        seconds = round(time.perf_counter() - g.pop('profile_started'), 6)
+        info = {'method': request.method, 'path': request.full_path.rstrip('?'), 'status': response.status_code,
+                'seconds': seconds}
+        if isinstance(profile, Sampler):
+            profile.stop()
+            profile_id = profiles.add('request', 'collapsed', profile.collapsed().encode('utf-8'),
+                                      samples=sum(profile.stacks.values()), **info)
+        else:
+            profile.disable()
+            profile_id = profiles.add('request', 'pstats', pstats_bytes(profile), **info)
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    @app.teardown_request
+    def forget_request_thread(exc=None):
+        with threads_lock:
+            request_threads.discard(threading.get_ident())
+        # Still set if the view raised before after_request could finish the profile
+        profile = g.pop('profile', None)
+        if profile is not None:
+            g.pop('profile_started', None)
+            if isinstance(profile, Sampler):
+                profile.stop()
+            else:
+                profile.disable()
+
+    @app.route('/api/profile')
+    def list_profiles():
+        if not session.get('doctor_logged_in'):
+            return jsonify({'error': 'Not authorized'}), 401
+        window = state['window']
+        running = None
+        if window is not None:
+            sampler, scope = window
+            running = {'scope': scope, 'interval': sampler.interval, 'started': sampler.started,
+                       'seconds': sampler.duration}
+        return jsonify({'running': running, 'profiles': profiles.list()})
+
+    @app.route('/api/profile/start', methods=['POST'])
+    def start_profile():
+        if not session.get('doctor_logged_in'):
+            return jsonify({'error': 'Not authorized'}), 401
+        seconds = min(request.args.get('seconds', 30, type=float), MAX_WINDOW_SECONDS)
+        interval = request.args.get('interval', DEFAULT_INTERVAL, type=float)
+        scope = 'all' if request.args.get('all') else 'requests'
+        own = threading.get_ident()
+
+        def threads():
+            # Not the thread that asked for the profile: it has already answered
+            return None if scope == 'all' else active_request_threads() - {own}
+
+        with window_lock:
+            if state['window'] is not None:
+                return jsonify({'error': 'A profile is already running'}), 409
+            sampler = Sampler(interval, threads, duration=seconds, on_finish=finish_window)
+            state['window'] = (sampler, scope)
+        sampler.start()
+        print(f"🔬 Profiling {scope} for {seconds:g}s every {sampler.interval * 1000:g}ms")
+        return jsonify({'scope': scope, 'seconds': seconds, 'interval': sampler.interval}), 202
+
+    @app.route('/api/profile/stop', methods=['POST'])
+    def stop_profile():
+        if not session.get('doctor_logged_in'):
+            return jsonify({'error': 'Not authorized'}), 401
+        window = state['window']
+        if window is None:
+            return jsonify({'error': 'No profile is running'}), 409
+        window[0].stop()
+        return jsonify({'id': state['profile_id']})
+
+    @app.route('/api/profile/<profile_id>')
+    def get_profile(profile_id):
+        if not session.get('doctor_logged_in'):
+            return jsonify({'error': 'Not authorized'}), 401
+        found = profiles.get(profile_id)
+        if found is None:
+            return jsonify({'error': 'Unknown profile'}), 404
+        entry, data = found
+        if entry['format'] == 'pstats':
+            return Response(data, mimetype='application/octet-stream',
+                            headers={'Content-Disposition': f'attachment; filename={profile_id}.pstats'})
+        return Response(data, mimetype='text/plain',
+                        headers={'Content-Disposition': f'inline; filename={profile_id}.folded'})
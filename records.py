@@ -0,0 +1,133 @@
+"""Typed, memory-compact record classes for the JSON stores.
+
+Records use ``__slots__`` instead of a per-record dict, and the low
+cardinality fields (status, blood group, vitals, animal type, village...) are
+interned so the whole population shares one string object per value.
+They keep a small read-only mapping interface (``rec['name']``,
+``rec.get('city', '')``, ``'status' in rec``) so templates and routes
+written against the old dicts keep working unchanged.
+"""
+import sys
+
+
+class Record:
+    __slots__ = ('_extra', '_revision')
+
+    FIELDS = ()
+    INTERNED = ()
+    KEY = None
+
+    def __init__(self, **values):
+        extra = None
+        for name, value in values.items():
+            if name in self._field_set:
+                if name in self._interned_set and type(value) is str:
+                    value = sys.intern(value)
+                setattr(self, name, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[name] = value
+        for name in self.FIELDS:
+            if name not in values:
+                setattr(self, name, '')
+        self._extra = extra
+        self._revision = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+        cls._interned_set = frozenset(cls.INTERNED)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    @property
+    def key(self):
+        return getattr(self, self.KEY)
+
+    @property
+    def revision(self):
+        """Changes whenever any field does; keys cached renderings of the record"""
+        if self._revision is None:
+            values = tuple(getattr(self, name) for name in self.FIELDS)
+            try:
+                self._revision = hash(values)
+            except TypeError:
+                self._revision = hash(repr(values))
+        return self._revision
+
+    def replace(self, **changes):
+        """Return a copy with some fields changed"""
+        data = self.to_dict()
+        data.update(changes)
+        return type(self)(**data)
+
+    def __getitem__(self, name):
+        if name in self._field_set:
+            return getattr(self, name)
+        if self._extra and name in self._extra:
+            return self._extra[name]
+        raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __contains__(self, name):
+        return name in self._field_set or bool(self._extra and name in self._extra)
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.key!r})"
+
+
+class Patient(Record):
+    FIELDS = ('id', 'name', 'city', 'age', 'weight', 'bp', 'sugar', 'oxygen', 'blood_group',
+              'symptoms', 'prescription', 'timestamp', 'status', 'doctor_name',
+              'prescription_date', 'submission_date', 'prescription_id', 'contact', 'person_id')
+    INTERNED = ('city', 'age', 'weight', 'bp', 'sugar', 'oxygen', 'blood_group', 'status',
+                'doctor_name')
+    KEY = 'id'
+    __slots__ = FIELDS
+
+
+class Animal(Record):
+    FIELDS = ('animal_id', 'owner_name', 'animal_type', 'animal_name', 'gender', 'breed',
+              'condition', 'age', 'weight', 'symptoms', 'village', 'contact', 'status',
+              'prescription', 'veterinarian_name', 'submission_date', 'prescription_date', 'prescription_id')
+    INTERNED = ('animal_type', 'gender', 'breed', 'condition', 'age', 'weight', 'village', 'status',
+                'veterinarian_name')
+    KEY = 'animal_id'
+    __slots__ = FIELDS
+
+
+class DietEntry(Record):
+    FIELDS = ('diet_id', 'diet_type', 'occupation', 'age', 'weight', 'disease', 'diet_plan',
+              'generated_date')
+    INTERNED = ('diet_type', 'occupation', 'age', 'weight', 'disease')
+    KEY = 'diet_id'
+    __slots__ = FIELDS
@@ -0,0 +1,198 @@
+"""In-process scheduler for housekeeping jobs.
+
+One background task wakes up every ``tick`` seconds and runs at most one
+due job at a time. Jobs flagged ``off_peak`` only start inside the
+maintenance window. A running job calls ``ctx.pace()`` between chunks of
+work: that sleeps briefly, waits while requests are in flight, and returns
+False once the job has used its time budget, so the job stops and picks
+up where it left off on its next run. Last-run times live in healthcare.db
+so a restart does not rerun everything at once.
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+DB_PATH = 'healthcare.db'
+
+
+def parse_window(spec):
+    """``"1-5"`` -> (1, 5): hours [1, 5) local time. ``"22-4"`` wraps midnight."""
+    start, _, end = spec.partition('-')
+    return int(start) % 24, int(end or start) % 24
+
+
+def in_window(window, now=None):
+    start, end = window
+    hour = (now or datetime.now()).hour
+    if start == end:
+        return True
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+class RequestGauge:
+    """Counts requests in flight so background work can yield to them"""
+
+    def __init__(self):
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.active += 1
+
+    def leave(self, *_):
+        with self._lock:
+            self.active = max(0, self.active - 1)
+
+    def init_app(self, app):
+        app.before_request(self.enter)
+        app.teardown_request(self.leave)
+
+
+class Job:
+    def __init__(self, name, func, every, off_peak=True, budget=60.0, pause=0.2):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.off_peak = off_peak
+        self.budget = budget
+        self.pause = pause
+
+
+class JobContext:
+    def __init__(self, job, gauge, max_active=0, busy_wait=30.0):
+        self.job = job
+        self.gauge = gauge
+        self.max_active = max_active
+        self.busy_wait = busy_wait
+        self.deadline = time.monotonic() + job.budget
+        self.units = 0
+
+    def pace(self, units=1):
+        """Call between chunks; returns False when the job should stop for now"""
+        self.units += units
+        time.sleep(self.job.pause)
+        waited = 0.0
+        while self.gauge is not None and self.gauge.active > self.max_active and waited < self.busy_wait:
+            time.sleep(0.1)
+            waited += 0.1
+        return time.monotonic() < self.deadline
+
+
+class Scheduler:
+    def __init__(self, window=(1, 5), db_path=DB_PATH, gauge=None, tick=30, max_active=0):
+        self.window = window
+        self.db_path = db_path
+        self.gauge = gauge
+        self.tick = tick
+        self.max_active = max_active
+        self.jobs = {}
+        self._requested = set()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                name TEXT PRIMARY KEY,
+                last_run REAL,
+                last_status TEXT,
+                last_duration REAL,
+                last_result TEXT
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def add(self, job):
+        self.jobs[job.name] = job
+        return job
+
+    def request(self, name):
+        """Run ``name`` on the next tick, ignoring its interval and the window"""
+        if name not in self.jobs:
+            raise KeyError(name)
+        with self._lock:
+            self._requested.add(name)
+
+    def state(self):
+        conn = self._connect()
+        rows = {row[0]: row[1:] for row in conn.execute(
+            'SELECT name, last_run, last_status, last_duration, last_result FROM scheduled_jobs')}
+        conn.close()
+        states = []
+        for name, job in self.jobs.items():
+            last_run, status, duration, result = rows.get(name, (None, None, None, None))
+            states.append({
+                'name': name,
+                'every': job.every,
+                'off_peak': job.off_peak,
+                'last_run': datetime.fromtimestamp(last_run).strftime("%Y-%m-%d %H:%M:%S") if last_run else None,
+                'last_status': status,
+                'last_duration': duration,
+                'last_result': result,
+                'requested': name in self._requested,
+            })
+        return states
+
+    def due(self, now=None):
+        """Names of jobs that should run now, oldest first"""
+        now = now or time.time()
+        conn = self._connect()
+        last = dict(conn.execute('SELECT name, last_run FROM scheduled_jobs'))
+        conn.close()
+        with self._lock:
+            requested = set(self._requested)
+        off_peak = in_window(self.window)
+        due = []
+        for name, job in self.jobs.items():
+            if name in requested:
+                due.append((0, name))
+            elif (off_peak or not job.off_peak) and now - (last.get(name) or 0) >= job.every:
+                due.append((last.get(name) or 0, name))
+        return [name for _, name in sorted(due)]
+
+    def run(self, name):
+        job = self.jobs[name]
+        with self._lock:
+            self._requested.discard(name)
+        ctx = JobContext(job, self.gauge, self.max_active)
+        started = time.time()
+        try:
+            result = job.func(ctx)
+            status = 'ok'
+        except Exception as e:
+            result = str(e)
+            status = 'error'
+            print(f"❌ Job {name} failed: {e}")
+        duration = round(time.time() - started, 3)
+        conn = self._connect()
+        conn.execute('''
+            INSERT INTO scheduled_jobs (name, last_run, last_status, last_duration, last_result)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_run = excluded.last_run, last_status = excluded.last_status,
+                last_duration = excluded.last_duration, last_result = excluded.last_result
+        ''', (name, started, status, duration, None if result is None else str(result)))
+        conn.commit()
+        conn.close()
+        if result:
+            print(f"🧹 Job {name}: {result} ({duration}s)")
+        return result
+
+    def run_pending(self):
+        for name in self.due():
+            self.run(name)
+
+    def run_forever(self):
+        while True:
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"❌ Scheduler error: {e}")
+            time.sleep(self.tick)
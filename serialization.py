@@ -0,0 +1,238 @@
+"""Codecs for the record stores (patients, animals, balance diet).
+
+Every codec turns the store's top-level dict into bytes and back. Files
+are sniffed on read, so a store can switch codec without a migration:
+the old file is decoded with whatever format it is in and the next save
+writes the configured one. ``python serialization.py convert`` rewrites
+a file eagerly.
+"""
+import argparse
+import json
+import struct
+import sys
+from array import array
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BINARY_MAGIC = b'HKB1'
+MSGPACK_MAGIC = b'HKM1'
+
+# Records whose values are all plain strings (the common case for patients
+# and animals) are stored as a schema index plus NUL-separated values, which
+# decode with a single str.split. Anything else falls back to GENERAL.
+GENERAL = 0xFFFF
+MAX_SCHEMAS = 0xFFFE
+SEPARATOR = '\x00'
+
+_U32 = struct.Struct('<I')
+_COMPACT = (',', ':')
+
+
+class CodecError(ValueError):
+    """Raised when bytes cannot be decoded by any codec"""
+
+
+class JsonCodec:
+    name = 'json'
+
+    def __init__(self, indent=None):
+        self.indent = indent
+        self.separators = (',', ':') if indent is None else None
+
+    def encode(self, data):
+        return json.dumps(data, indent=self.indent, separators=self.separators,
+                          ensure_ascii=False).encode('utf-8')
+
+    def decode(self, raw):
+        return json.loads(raw)
+
+
+class PrettyJsonCodec(JsonCodec):
+    """The original indent=2 layout, handy when the files are read by hand"""
+    name = 'json-pretty'
+
+    def __init__(self):
+        JsonCodec.__init__(self, indent=2)
+
+
+def _is_flat(record):
+    for value in record.values():
+        if type(value) is not str or SEPARATOR in value:
+            return False
+    return True
+
+
+class BinaryCodec:
+    """Length-prefixed binary format implemented with struct.
+
+    Field names are stored once per schema instead of once per record, and
+    flat string values are a single NUL-joined blob. Nested records (diet
+    plans) are kept as compact JSON, which the C json decoder reads faster
+    than any pure-Python tagged format. Layout (little endian)::
+
+        'HKB1'
+        u32 len | JSON list of schemas (each a list of field names)
+        u32 record count | u16 schema index per record
+        u32 len | NUL-joined UTF-8 of every record id and flat field value
+        u32 len | JSON list of the records that are not flat
+    """
+    name = 'binary'
+
+    def encode(self, data):
+        if not isinstance(data, dict):
+            raise TypeError("BinaryCodec stores a dict of records")
+        schema_ids = {}
+        schemas = []
+        kinds = array('H')
+        strings = []
+        general = []
+        for record_id, record in data.items():
+            record_id = str(record_id)
+            if SEPARATOR in record_id:
+                raise TypeError("Record ids cannot contain NUL characters")
+            strings.append(record_id)
+            if isinstance(record, dict) and _is_flat(record):
+                keys = tuple(record)
+                index = schema_ids.get(keys)
+                if index is None and len(schemas) < MAX_SCHEMAS:
+                    index = schema_ids[keys] = len(schemas)
+                    schemas.append(list(keys))
+                if index is not None:
+                    kinds.append(index)
+                    strings.extend(record.values())
+                    continue
+            kinds.append(GENERAL)
+            general.append(record)
+        if sys.byteorder == 'big':
+            kinds.byteswap()
+
+        out = [BINARY_MAGIC]
+        schema_bytes = json.dumps(schemas, separators=_COMPACT, ensure_ascii=False).encode('utf-8')
+        out.append(_U32.pack(len(schema_bytes)))
+        out.append(schema_bytes)
+        out.append(_U32.pack(len(kinds)))
+        out.append(kinds.tobytes())
+        blob = SEPARATOR.join(strings).encode('utf-8')
+        out.append(_U32.pack(len(blob)))
+        out.append(blob)
+        general_bytes = json.dumps(general, separators=_COMPACT, ensure_ascii=False).encode('utf-8')
+        out.append(_U32.pack(len(general_bytes)))
+        out.append(general_bytes)
+        return b''.join(out)
+
+    def decode(self, raw):
+        buf = memoryview(raw)
+        if bytes(buf[:4]) != BINARY_MAGIC:
+            raise CodecError("Not a binary record file")
+        try:
+            pos = 4
+            size = _U32.unpack_from(buf, pos)[0]
+            schemas = [tuple(keys) for keys in json.loads(str(buf[pos + 4:pos + 4 + size], 'utf-8'))]
+            pos += 4 + size
+            count = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            kinds = array('H')
+            kinds.frombytes(buf[pos:pos + 2 * count])
+            if sys.byteorder == 'big':
+                kinds.byteswap()
+            pos += 2 * count
+            size = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            strings = str(buf[pos:pos + size], 'utf-8').split(SEPARATOR) if count else []
+            pos += size
+            size = _U32.unpack_from(buf, pos)[0]
+            general = json.loads(str(buf[pos + 4:pos + 4 + size], 'utf-8'))
+        except (struct.error, IndexError, ValueError) as e:
+            raise CodecError(f"Truncated or damaged binary record file: {e}")
+
+        result = {}
+        cursor = 0
+        general_iter = iter(general)
+        for kind in kinds:
+            record_id = strings[cursor]
+            cursor += 1
+            if kind == GENERAL:
+                result[record_id] = next(general_iter)
+            else:
+                keys = schemas[kind]
+                end = cursor + len(keys)
+                result[record_id] = dict(zip(keys, strings[cursor:end]))
+                cursor = end
+        return result
+
+
+class MsgpackCodec:
+    """Uses the msgpack package when it is installed"""
+    name = 'msgpack'
+
+    def encode(self, data):
+        return MSGPACK_MAGIC + msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, raw):
+        return msgpack.unpackb(memoryview(raw)[4:], raw=False, strict_map_key=False)
+
+
+CODECS = {
+    'json': JsonCodec(),
+    'json-pretty': PrettyJsonCodec(),
+    'binary': BinaryCodec(),
+}
+if msgpack is not None:
+    CODECS['msgpack'] = MsgpackCodec()
+
+
+def get_codec(name):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown store codec {name!r}, expected one of {', '.join(sorted(CODECS))}")
+
+
+def sniff(raw):
+    """Return the codec that wrote ``raw``"""
+    head = bytes(raw[:4])
+    if head == BINARY_MAGIC:
+        return CODECS['binary']
+    if head == MSGPACK_MAGIC:
+        if msgpack is None:
+            raise CodecError("File was written with msgpack, which is not installed")
+        return CODECS['msgpack']
+    return CODECS['json']
+
+
+def decode(raw):
+    return sniff(raw).decode(raw)
+
+
+def convert_file(src, dst, codec_name):
+    """Re-encode a store file; returns (bytes before, bytes after)"""
+    from storage import JsonStore
+
+    data = JsonStore(src).read()
+    store = JsonStore(dst, codec=codec_name)
+    with open(src, 'rb') as f:
+        before = len(f.read())
+    store.save(data)
+    with open(dst, 'rb') as f:
+        after = len(f.read())
+    return before, after
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Health Kiosk record stores between formats")
+    sub = parser.add_subparsers(dest='command', required=True)
+    convert = sub.add_parser('convert', help="re-encode a store file")
+    convert.add_argument('src')
+    convert.add_argument('dst', nargs='?', help="defaults to rewriting SRC in place")
+    convert.add_argument('--codec', default='binary', choices=sorted(CODECS))
+    args = parser.parse_args(argv)
+
+    before, after = convert_file(args.src, args.dst or args.src, args.codec)
+    print(f"✅ {args.src} -> {args.dst or args.src} ({args.codec}): {before} -> {after} bytes")
+
+
+if __name__ == '__main__':
+    main()
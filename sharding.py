@@ -0,0 +1,373 @@
+"""Record stores split into one file per region.
+
+Patients carry a ``city`` and animals a ``village``, and a kiosk or a
+doctor mostly works with one of them at a time. A ShardedStore keeps a
+JsonStore per region under its directory::
+
+    patients_shards/koppal.json        every patient whose city is Koppal
+    patients_shards/_unknown.json      records without a city
+    patients_shards/index.lock         store-wide version counter
+    patients_shards/key-07.lock        serializes placing ids with this hash
+
+It has the same interface as a JsonStore, so listeners, the change feed,
+HTTP caching, archiving and bulk import work unchanged. A write decodes
+and rewrites only its own region's file and locks only that region, so a
+busy village never makes the others wait, and ``records(region)`` reads
+a single shard. ``map()``/``search()`` fan out over the shards on a
+thread pool; a shard that changed is reloaded on its own worker while the
+others answer from their cached records.
+"""
+import os
+import threading
+import unicodedata
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import chain
+from types import MappingProxyType
+
+from storage import FileLock, JsonStore, StoreConflict, VersionCounter
+
+UNKNOWN_REGION = '_unknown'
+EXTENSION = '.json'
+KEY_LOCKS = 16
+EMPTY = MappingProxyType({})
+
+
+def region_key(value):
+    """File-safe region name: casefolded letters, marks and digits joined by '-'"""
+    text = unicodedata.normalize('NFKC', value or '').casefold()
+    text = ''.join(ch if unicodedata.category(ch)[0] in 'LMN' else ' ' for ch in text)
+    return '-'.join(text.split()) or UNKNOWN_REGION
+
+
+def _submitted(item):
+    return item[1].get('submission_date') or ''
+
+
+def _in_order(items):
+    """``{id: record}`` of ``(id, record)`` pairs, oldest submission first (ties keep their order)"""
+    return dict(sorted(items, key=_submitted))
+
+
+class ShardedStore:
+    """A JsonStore-compatible store keeping each region in its own JsonStore.
+
+    ``region_field`` names the record field that picks the shard. Listeners
+    are called with the shard that committed, whose records() hold the
+    changed ids. Writes that go through any ShardedStore (in any process)
+    bump the store-wide version, which is all signature() has to read.
+    """
+
+    def __init__(self, directory, region_field, codec=None, record_class=None, workers=4):
+        self.path = directory
+        self.region_field = region_field
+        self.codec = codec
+        self.record_class = record_class
+        os.makedirs(directory, exist_ok=True)
+        self.counter = VersionCounter(os.path.join(directory, 'index.lock'))
+        self.lock = self.counter.lock
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shards')
+        self._shards = {}
+        self._shards_lock = threading.Lock()
+        self._listeners = []
+        self._timer = None
+        # key -> region, refreshed per shard when the store version moves
+        self._index_lock = threading.Lock()
+        self._index_version = None
+        self._owners = {}
+        self._indexed = {}
+        self._generation = 0
+        self._merged = (0, EMPTY)
+
+    # Shards
+
+    def region_of(self, record):
+        return region_key(record.get(self.region_field))
+
+    def regions(self):
+        """Regions with a shard file, sorted"""
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return sorted(name[:-len(EXTENSION)] for name in names
+                      if name.endswith(EXTENSION) and not name.startswith('.'))
+
+    def shard(self, region):
+        """The JsonStore of ``region`` (a region_key()), created on first use"""
+        with self._shards_lock:
+            store = self._shards.get(region)
+            if store is None:
+                store = JsonStore(os.path.join(self.path, region + EXTENSION), codec=self.codec,
+                                  record_class=self.record_class)
+                store.timer = self._timer
+                store.add_listener(self._on_commit)
+                self._shards[region] = store
+            return store
+
+    def _on_commit(self, shard, keys, data):
+        self.counter.bump()
+        for listener in self._listeners:
+            try:
+                listener(shard, keys, data)
+            except Exception as e:
+                print(f"❌ Store listener failed for {shard.path}: {e}")
+
+    def add_listener(self, listener):
+        """Call ``listener(shard, keys, data)`` after every shard commit in this process"""
+        self._listeners.append(listener)
+
+    @property
+    def timer(self):
+        return self._timer
+
+    @timer.setter
+    def timer(self, timer):
+        self._timer = timer
+        with self._shards_lock:
+            for store in self._shards.values():
+                store.timer = timer
+
+    # Change tokens
+
+    @property
+    def version(self):
+        return self.counter.value
+
+    def signature(self):
+        """The store-wide version plus the directory's mtime, which moves on every shard rename"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        return (self.version, mtime)
+
+    def last_modified(self):
+        return self.counter.last_modified()
+
+    # Reading
+
+    def _refresh(self):
+        """Bring the key -> region index up to date; only shards that changed are re-read"""
+        signature = self.signature()
+        if signature == self._index_version:
+            return
+        with self._index_lock:
+            if signature == self._index_version:
+                return
+            for region in self.regions():
+                records = self.shard(region).records()
+                old = self._indexed.get(region)
+                if old is records:
+                    continue
+                for key in old or ():
+                    if self._owners.get(key) == region:
+                        del self._owners[key]
+                for key in records:
+                    self._owners[key] = region
+                self._indexed[region] = records
+                self._generation += 1
+            self._index_version = signature
+
+    def locate(self, key):
+        """Region holding ``key``, or None"""
+        self._refresh()
+        return self._owners.get(key)
+
+    def records(self, region=None):
+        """Read-only ``{id: record}`` of one region, or of every region oldest first.
+
+        The merged mapping is rebuilt only after a write, from the shards'
+        cached records; never mutate the records it holds.
+        """
+        if region is not None:
+            region = region_key(region)
+            return self.shard(region).records() if region in self.regions() else EMPTY
+        self._refresh()
+        with self._index_lock:
+            generation, merged = self._merged
+            if generation != self._generation:
+                # Sorted rather than merged, so a shard written out of order cannot reorder the dashboards;
+                # the shards are sorted runs, which the sort just stitches together
+                merged = MappingProxyType(_in_order(chain.from_iterable(records.items()
+                                                                        for records in self._indexed.values())))
+                self._merged = (self._generation, merged)
+            return merged
+
+    def map(self, fn, regions=None):
+        """``{region: fn(region, records)}`` for every shard (or ``regions``), run on the thread pool"""
+        existing = self.regions()
+        if regions is not None:
+            wanted = {region_key(region) for region in regions}
+            existing = [region for region in existing if region in wanted]
+        if len(existing) <= 1:
+            return {region: fn(region, self.shard(region).records()) for region in existing}
+        futures = [(region, self.executor.submit(lambda region: fn(region, self.shard(region).records()), region))
+                   for region in existing]
+        return {region: future.result() for region, future in futures}
+
+    def search(self, match, regions=None):
+        """``{id: record}`` where ``match(key, record)`` is true, searched shard by shard in parallel"""
+        found = self.map(lambda region, records: [(key, record) for key, record in records.items()
+                                                  if match(key, record)], regions)
+        return _in_order(chain.from_iterable(found.values()))
+
+    def read(self):
+        """Every region's raw records in one dict, raising StoreError if a shard cannot be read"""
+        data = {}
+        for region in self.regions():
+            data.update(self.shard(region).read())
+        return data
+
+    def snapshot(self):
+        version = self.version
+        return version, self.read()
+
+    def load(self, default=None):
+        data = {}
+        for region in self.regions():
+            data.update(self.shard(region).load())
+        return data if data or default is None else default
+
+    # Writing
+
+    def _split(self, data, keys=None):
+        """``{region: {id: record}}`` of ``data`` (only ``keys`` when given)"""
+        parts = {}
+        for key in data if keys is None else keys:
+            if key in data:
+                parts.setdefault(self.region_of(data[key]), {})[key] = data[key]
+        return parts
+
+    def save(self, data, expected_version=None, changed=None):
+        """Replace the whole store, region by region; returns the new version"""
+        def replace(current):
+            current.clear()
+            current.update(data)
+        if expected_version is not None and self.version != expected_version:
+            raise StoreConflict(f"{self.path} changed since version {expected_version}")
+        self.update(replace, changed)
+        return self.version
+
+    def update(self, mutate, changed=None):
+        """Apply ``mutate(data)`` to every region at once under all the shard locks.
+
+        Only the regions holding a ``changed`` id before or after the
+        mutation are rewritten (all of them when ``changed`` is None).
+        Meant for bulk jobs; single records go through put/patch/delete,
+        which lock one region.
+        """
+        with ExitStack() as stack:
+            before = {}
+
+            def locked(region):
+                # A region created since the listing is locked and read before it is written
+                if region not in before:
+                    stack.enter_context(self.shard(region).lock)
+                    before[region] = self.shard(region).read()
+                return before[region]
+
+            for region in self.regions():
+                locked(region)
+            data = {}
+            owners = {}
+            for region, part in before.items():
+                data.update(part)
+                owners.update(dict.fromkeys(part, region))
+            result = mutate(data)
+
+            if changed is None:
+                after = self._split(data)
+                for region in set(before) | set(after):
+                    locked(region)
+                    self.shard(region).save(_in_order(after.get(region, {}).items()))
+                return result
+            keys = set(changed)
+            moved = self._split(data, keys)
+            for region in {owners[key] for key in keys if key in owners} | set(moved):
+                arrived = moved.get(region, {})
+                part = [(key, arrived.get(key, record)) for key, record in locked(region).items()
+                        if key not in keys or key in arrived]
+                part.extend((key, record) for key, record in arrived.items() if owners.get(key) != region)
+                self.shard(region).save(_in_order(part), changed=tuple(key for key in keys
+                                                                       if owners.get(key) == region or
+                                                                       key in arrived))
+            return result
+
+    def _key_lock(self, key):
+        """Held while an id is placed, so two writers cannot put it into two regions.
+
+        Striped by a stable hash of the id, so unrelated writes rarely share one.
+        Taken before any shard lock.
+        """
+        stripe = zlib.crc32(str(key).encode('utf-8')) % KEY_LOCKS
+        return FileLock.for_path(os.path.join(self.path, f'key-{stripe:02d}.lock'))
+
+    def put(self, key, record):
+        region = self.region_of(record)
+        with self._key_lock(key):
+            # Writers bump the version before letting go of the key lock, so this is current
+            old = self.locate(key)
+            if old is None or old == region:
+                self.shard(region).put(key, record)
+                return
+
+            def arrive(data):
+                data[key] = record
+                ordered = _in_order(data.items())
+                data.clear()
+                data.update(ordered)
+
+            first, second = sorted((old, region))
+            with self.shard(first).lock, self.shard(second).lock:
+                # Into the new region before out of the old one: a crash in between leaves a copy, not nothing.
+                # The record keeps its place in submission order there instead of going to the end
+                self.shard(region).update(arrive, changed=(key,))
+                self.shard(old).delete(key)
+
+    def patch(self, key, changes):
+        """Merge ``changes`` into one record; returns False if it does not exist"""
+        with self._key_lock(key):
+            # Even in place: a move of this id between locate() and the shard write would lose the patch
+            region = self.locate(key)
+            if self.region_field not in changes:
+                return region is not None and self.shard(region).patch(key, changes)
+            record = self.shard(region).records().get(key) if region is not None else None
+            if record is None:
+                return False
+            record = record.to_dict()
+            record.update(changes)
+            self.put(key, record)
+            return True
+
+    def delete(self, key):
+        """Remove one record; returns False if it did not exist"""
+        with self._key_lock(key):
+            region = self.locate(key)
+            return region is not None and self.shard(region).delete(key)
+
+    def clear(self):
+        for region in self.regions():
+            self.shard(region).clear()
+
+    def migrate(self, legacy_path):
+        """Split a single-file store from before sharding into region files, once.
+
+        The old file is kept next to it with a ``.pre-shard`` suffix.
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+        legacy = JsonStore(legacy_path, codec=self.codec)
+        with legacy.lock:
+            if not os.path.exists(legacy_path):
+                return 0
+            if self.regions():
+                print(f"⚠️ {legacy_path} left as is: {self.path} already has region shards")
+                return 0
+            data = legacy.read()
+            for region, part in self._split(data).items():
+                self.shard(region).save(part)
+            os.replace(legacy_path, legacy_path + '.pre-shard')
+        print(f"🗂️ Split {len(data)} records from {legacy_path} into {len(self.regions())} region shards")
+        return len(data)
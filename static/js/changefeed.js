@@ -0,0 +1,77 @@
+// Keeps a dashboard card list in step with /api/changes/<stream>.
+// The page renders with the change sequence it was built from; afterwards only
+// the cards that changed since that sequence are fetched and swapped in place.
+class ChangeFeed {
+  constructor({ stream, seq, container, socket = null, newestFirst = false, interval = 30000, onChange = null }) {
+    this.stream = stream;
+    this.seq = seq;
+    this.container = container;
+    this.socket = socket;
+    this.newestFirst = newestFirst;
+    this.onChange = onChange;
+    this.pending = null;
+
+    if (socket) {
+      socket.on('records_changed', (data) => {
+        if (data.stream === this.stream && data.seq > this.seq) {
+          this.sync();
+        }
+      });
+      socket.on('changes', (payload) => {
+        if (payload.stream === this.stream) {
+          this.apply(payload);
+        }
+      });
+    }
+    // Polling stays as a fallback for missed socket events; 0 leaves it to the page
+    if (interval) {
+      setInterval(() => this.sync(), interval);
+    }
+  }
+
+  sync() {
+    if (this.socket && this.socket.connected) {
+      this.socket.emit('sync_changes', { stream: this.stream, since: this.seq });
+      return Promise.resolve();
+    }
+    if (!this.pending) {
+      this.pending = fetch(`/api/changes/${this.stream}?since=${this.seq}`)
+        .then(response => {
+          if (!response.ok) throw new Error('Network error');
+          return response.json();
+        })
+        .then(payload => this.apply(payload))
+        .catch(error => console.error('Error syncing changes:', error))
+        .finally(() => { this.pending = null; });
+    }
+    return this.pending;
+  }
+
+  apply(payload) {
+    if (payload.seq <= this.seq) {
+      return;
+    }
+    if (payload.reset) {
+      window.location.reload();
+      return;
+    }
+    for (const change of payload.changes) {
+      const card = this.container && this.container.querySelector(`[data-record-id="${CSS.escape(change.id)}"]`);
+      if (change.op === 'delete') {
+        if (card) card.remove();
+      } else if (card) {
+        card.outerHTML = change.html;
+      } else if (this.container) {
+        this.container.insertAdjacentHTML(this.newestFirst ? 'afterbegin' : 'beforeend', change.html);
+      } else {
+        // The page showed the empty-state message; it has no list to insert into
+        window.location.reload();
+        return;
+      }
+    }
+    this.seq = payload.seq;
+    if (this.onChange && payload.changes.length) {
+      this.onChange(this.container ? this.container.querySelectorAll('[data-record-id]').length : 0);
+    }
+  }
+}
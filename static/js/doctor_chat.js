@@ -0,0 +1,438 @@
+    let currentPatientId = null;
+    let currentPatientType = null;
+    let stream = null;
+    let capturedPhoto = null;
+    let currentChatRoom = null;
+
+document.addEventListener('DOMContentLoaded', function() {
+    initializeDoctorSocket();
+});
+
+function initializeDoctorSocket() {
+    const doctorId = CHAT_CONFIG.doctorId;
+
+    // Join doctor room
+    socket.emit('join_doctor_room', { doctor_id: doctorId });
+    socket.emit('join_doctors_room');
+
+    // Listen for new patients
+    socket.on('new_patient_alert', function(data) {
+        showNotification(`🆕 New patient: ${data.patient_name}`, 'info');
+        refreshPatients(); // Refresh patient list
+    });
+
+    socket.on('new_animal_patient_alert', function(data) {
+        showNotification(`🐾 New animal patient: ${data.animal_name}`, 'info');
+        refreshPatients();
+    });
+
+    // Message handling
+    socket.on('new_message', function(data) {
+        if (data.doctor_id === doctorId && data.patient_id === currentPatientId) {
+            displayNewMessage(data);
+            scrollToBottom();
+        }
+    });
+
+    socket.on('message_notification', function(data) {
+        if (data.doctor_id === doctorId) {
+            // Update patient list to show new message
+            refreshPatients();
+        }
+    });
+}
+
+function joinChatRoom(patientId) {
+    const doctorId = CHAT_CONFIG.doctorId;
+
+    if (currentChatRoom) {
+        socket.emit('leave_room', { room: currentChatRoom });
+    }
+
+    currentChatRoom = `chat_${patientId}_${doctorId}`;
+    socket.emit('join_chat_room', {
+        patient_id: patientId,
+        doctor_id: doctorId
+    });
+}
+
+function sendMessageRealTime(message, imageData = null) {
+    const doctorId = CHAT_CONFIG.doctorId;
+
+    const messageData = {
+        patient_id: currentPatientId,
+        doctor_id: doctorId,
+        message: message,
+        sender_type: 'doctor',
+        image_data: imageData
+    };
+
+    socket.emit('send_message', messageData);
+
+    fetch('/api/chat/send', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(messageData)
+    }).catch(console.error);
+}
+
+    function setLanguage(lang) {
+        window.location.href = `/set_language/${lang}`;
+    }
+
+    async function loadPatients() {
+        try {
+            const response = await fetch('/api/doctor/chat-patients');
+            const patients = await response.json();
+
+            const patientList = document.getElementById('patientList');
+
+            if (!patients || patients.length === 0) {
+                patientList.innerHTML = `<div style="text-align: center; padding: 20px; color: #7f8c8d;">${CHAT_CONFIG.strings.no_patients}</div>`;
+                return;
+            }
+
+            let html = '';
+            patients.forEach(patient => {
+                const lastMessage = patient.last_message ? 
+                    (patient.last_message.length > 30 ? patient.last_message.substring(0, 30) + '...' : patient.last_message) : 
+                    CHAT_CONFIG.strings.new_message;
+
+                html += `
+                    <div class="patient-item" onclick="selectPatient('${patient.id}', '${patient.type}')" id="patient-${patient.id}">
+                        <div class="patient-id">${patient.name}</div>
+                        <div class="patient-type">${patient.type === 'human' ? CHAT_CONFIG.strings.human_patient : CHAT_CONFIG.strings.animal_patient}</div>
+                        <div style="font-size: 0.8em; color: #7f8c8d; margin-top: 5px;">${lastMessage}</div>
+                    </div>
+                `;
+            });
+
+            patientList.innerHTML = html;
+        } catch (error) {
+            console.error('Error loading patients:', error);
+            patientList.innerHTML = `<div style="text-align: center; padding: 20px; color: #e74c3c;">Error loading patients</div>`;
+        }
+    }
+
+    function selectPatient(patientId, patientType) {
+        currentPatientId = patientId;
+        currentPatientType = patientType;
+
+        // Update UI
+        document.querySelectorAll('.patient-item').forEach(item => {
+            item.classList.remove('active');
+        });
+        const patientElement = document.getElementById(`patient-${patientId}`);
+        if (patientElement) {
+            patientElement.classList.add('active');
+        }
+
+        document.getElementById('currentPatient').textContent = `Chat with ${patientId}`;
+        document.getElementById('inputArea').style.display = 'flex';
+        document.querySelector('.no-patient-selected').style.display = 'none';
+
+        // Load messages
+        loadMessages();
+    }
+
+    async function loadMessages() {
+        if (!currentPatientId) return;
+
+        try {
+            const doctorId = CHAT_CONFIG.doctorId;
+            const response = await fetch(`/api/chat/messages/${currentPatientId}/${doctorId}`);
+            const result = await response.json();
+
+            if (result.success) {
+                displayMessages(result.messages);
+            } else {
+                console.error('Error loading messages:', result.error);
+            }
+        } catch (error) {
+            console.error('Error loading messages:', error);
+        }
+    }
+
+    function displayMessages(messages) {
+        const container = document.getElementById('messagesContainer');
+        container.innerHTML = '';
+
+        if (!messages || messages.length === 0) {
+            container.innerHTML = `<div style="text-align: center; padding: 40px; color: #7f8c8d;">${CHAT_CONFIG.strings.no_messages}</div>`;
+            return;
+        }
+
+        messages.forEach(message => {
+            const messageDiv = document.createElement('div');
+            messageDiv.className = `message ${message.sender_type}`;
+
+            const senderName = message.sender_type === 'doctor' ? CHAT_CONFIG.strings.you : CHAT_CONFIG.strings.patient;
+
+            let content = `
+                <div class="message-bubble">
+                    <div><strong>${senderName}:</strong> ${message.content}</div>
+            `;
+
+            if (message.image_data) {
+                content += `<img src="data:image/jpeg;base64,${message.image_data}" class="message-image" onclick="viewImage('${message.image_data}')">`;
+            }
+
+            content += `
+                    <div class="message-time">
+                        ${new Date(message.timestamp).toLocaleString()}
+                    </div>
+                </div>
+            `;
+
+            messageDiv.innerHTML = content;
+            container.appendChild(messageDiv);
+        });
+
+        container.scrollTop = container.scrollHeight;
+    }
+
+    async function sendMessage() {
+        if (!currentPatientId) return;
+
+        const messageInput = document.getElementById('messageInput');
+        const message = messageInput.value.trim();
+
+        if (!message) return;
+
+        try {
+            const doctorId = CHAT_CONFIG.doctorId;
+            const response = await fetch('/api/chat/send', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    patient_id: currentPatientId,
+                    doctor_id: doctorId,
+                    message: message,
+                    sender_type: 'doctor'
+                })
+            });
+
+            const result = await response.json();
+
+            if (result.success) {
+                messageInput.value = '';
+                loadMessages();
+                loadPatients(); // Refresh patient list to update last message
+            } else {
+                alert(CHAT_CONFIG.strings.error_sending);
+            }
+        } catch (error) {
+            console.error('Error sending message:', error);
+            alert(CHAT_CONFIG.strings.error_sending);
+        }
+    }
+
+    async function sendPhoto() {
+        if (!currentPatientId || !capturedPhoto) return;
+
+        try {
+            const doctorId = CHAT_CONFIG.doctorId;
+            const response = await fetch('/api/chat/send', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    patient_id: currentPatientId,
+                    doctor_id: doctorId,
+                    message: CHAT_CONFIG.strings.photo_sent,
+                    image_data: capturedPhoto,
+                    sender_type: 'doctor'
+                })
+            });
+
+            const result = await response.json();
+
+            if (result.success) {
+                closeCamera();
+                loadMessages();
+                loadPatients();
+            } else {
+                alert(CHAT_CONFIG.strings.error_sending);
+            }
+        } catch (error) {
+            console.error('Error sending photo:', error);
+            alert(CHAT_CONFIG.strings.error_sending);
+        }
+    }
+
+    async function openCamera() {
+        const modal = document.getElementById('cameraModal');
+        const video = document.getElementById('cameraVideo');
+
+        modal.style.display = 'flex';
+
+        try {
+            stream = await navigator.mediaDevices.getUserMedia({ video: true });
+            video.srcObject = stream;
+
+            // Reset UI
+            document.getElementById('capturedImage').style.display = 'none';
+            document.getElementById('captureBtn').style.display = 'block';
+            document.getElementById('sendPhotoBtn').style.display = 'none';
+            video.style.display = 'block';
+        } catch (error) {
+            console.error('Camera error:', error);
+            alert(CHAT_CONFIG.strings.camera_error);
+            closeCamera();
+        }
+    }
+
+    function closeCamera() {
+        const modal = document.getElementById('cameraModal');
+        modal.style.display = 'none';
+
+        if (stream) {
+            stream.getTracks().forEach(track => track.stop());
+            stream = null;
+        }
+
+        capturedPhoto = null;
+    }
+
+    function capturePhoto() {
+        const video = document.getElementById('cameraVideo');
+        const canvas = document.getElementById('cameraCanvas');
+        const image = document.getElementById('capturedImage');
+
+        canvas.width = video.videoWidth;
+        canvas.height = video.videoHeight;
+        canvas.getContext('2d').drawImage(video, 0, 0);
+
+        capturedPhoto = canvas.toDataURL('image/jpeg').split(',')[1];
+        image.src = 'data:image/jpeg;base64,' + capturedPhoto;
+        image.style.display = 'block';
+        video.style.display = 'none';
+
+        document.getElementById('captureBtn').style.display = 'none';
+        document.getElementById('sendPhotoBtn').style.display = 'block';
+
+        if (stream) {
+            stream.getTracks().forEach(track => track.stop());
+            stream = null;
+        }
+    }
+
+    function viewImage(imageData) {
+        const img = new Image();
+        img.src = 'data:image/jpeg;base64,' + imageData;
+        img.style.maxWidth = '90vw';
+        img.style.maxHeight = '90vh';
+
+        const modal = document.getElementById('cameraModal');
+        const content = modal.querySelector('.camera-content');
+        content.innerHTML = '';
+        content.appendChild(img);
+
+        const closeBtn = document.createElement('button');
+        closeBtn.className = 'close-camera';
+        closeBtn.textContent = CHAT_CONFIG.strings.cancel;
+        closeBtn.onclick = closeCamera;
+        content.appendChild(closeBtn);
+
+        modal.style.display = 'flex';
+    }
+
+    function openPrescriptionModal() {
+        document.getElementById('prescriptionModal').style.display = 'flex';
+    }
+
+    function closePrescriptionModal() {
+        document.getElementById('prescriptionModal').style.display = 'none';
+    }
+
+    async function sendPrescription() {
+        if (!currentPatientId) return;
+
+        const prescriptionText = document.getElementById('prescriptionText').value.trim();
+
+        if (!prescriptionText) {
+            alert('Please enter prescription details');
+            return;
+        }
+
+        try {
+            const response = await fetch('/api/doctor/prescribe', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    record_id: currentPatientId,
+                    record_type: currentPatientType,
+                    prescription: prescriptionText
+                })
+            });
+
+            const result = await response.json();
+
+            if (result.success) {
+                closePrescriptionModal();
+                document.getElementById('prescriptionText').value = '';
+
+                // Also send as chat message
+                const doctorId = CHAT_CONFIG.doctorId;
+                await fetch('/api/chat/send', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        patient_id: currentPatientId,
+                        doctor_id: doctorId,
+                        message: `📋 Prescription: ${prescriptionText}`,
+                        sender_type: 'doctor'
+                    })
+                });
+
+                loadMessages();
+                loadPatients();
+                alert(CHAT_CONFIG.strings.prescription_sent);
+            } else {
+                alert(CHAT_CONFIG.strings.error_sending);
+            }
+        } catch (error) {
+            console.error('Error sending prescription:', error);
+            alert(CHAT_CONFIG.strings.error_sending);
+        }
+    }
+
+    function refreshPatients() {
+        loadPatients();
+        if (currentPatientId) {
+            loadMessages();
+        }
+    }
+
+    // Allow Enter key to send message
+    document.getElementById('messageInput').addEventListener('keypress', function(e) {
+        if (e.key === 'Enter' && !e.shiftKey) {
+            e.preventDefault();
+            sendMessage();
+        }
+    });
+
+    // Auto-resize textarea
+    document.getElementById('messageInput').addEventListener('input', function() {
+        this.style.height = 'auto';
+        this.style.height = Math.min(this.scrollHeight, 100) + 'px';
+    });
+
+    // Auto-refresh messages every 3 seconds when a patient is selected
+    setInterval(() => {
+        if (currentPatientId) {
+            loadMessages();
+        }
+    }, 3000);
+
+    // Initialize
+    document.addEventListener('DOMContentLoaded', () => {
+        loadPatients();
+    });
@@ -0,0 +1,355 @@
+class DoctorDashboard {
+  constructor() {
+    this.currentChatPatient = null;
+    this.init();
+  }
+
+  init() {
+    this.connectSocket();
+    this.loadDoctorRecords();
+    this.loadChatPatients();
+    setInterval(() => {
+      if (this.currentChatPatient) {
+        this.loadChatMessages(this.currentChatPatient);
+      }
+    }, 10000);
+  }
+
+  connectSocket() {
+    if (typeof io === 'undefined') return;
+    this.socket = io();
+    this.socket.on('connect', () => {
+      this.socket.emit('join_doctors_room');
+      if (this.feed) this.feed.sync();
+    });
+    if (DASHBOARD_CONFIG.changeSeq !== null) {
+      this.feed = new ChangeFeed({
+        stream: 'patients',
+        seq: DASHBOARD_CONFIG.changeSeq,
+        container: document.getElementById('patients-container'),
+        socket: this.socket,
+        onChange: (count) => {
+          const countElement = document.getElementById('patient-count');
+          if (countElement) countElement.textContent = count;
+        }
+      });
+    }
+  }
+
+  async loadDoctorRecords() {
+    try {
+      const response = await fetch('/api/doctor/records');
+      if (!response.ok) throw new Error('Network error');
+
+      const records = await response.json();
+      this.renderDoctorRecords(records);
+    } catch (error) {
+      document.getElementById('doctorRecords').innerHTML = `
+        <div class="p-6 text-center">
+          <div class="bg-red-50 text-red-700 p-4 rounded-lg">
+            <i class="fas fa-exclamation-triangle mr-2"></i>
+            Failed to load prescription records. Please try again.
+          </div>
+        </div>
+      `;
+    }
+  }
+
+  renderDoctorRecords(records) {
+    const container = document.getElementById('doctorRecords');
+
+    if (!records || records.length === 0) {
+      container.innerHTML = `
+        <div class="text-center py-12">
+          <i class="fas fa-file-medical text-4xl text-gray-300 mb-4"></i>
+          <h3 class="text-xl font-semibold text-gray-600">No Prescription Records</h3>
+          <p class="text-gray-500 mt-2">Your prescription records will appear here.</p>
+        </div>
+      `;
+      return;
+    }
+
+    let html = `
+      <div class="overflow-x-auto">
+        <table class="w-full">
+          <thead class="bg-gray-50">
+            <tr>
+              <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Patient ID</th>
+              <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Patient Name</th>
+              <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Village</th>
+              <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Prescription Date</th>
+              <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Status</th>
+              <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Actions</th>
+            </tr>
+          </thead>
+          <tbody class="bg-white divide-y divide-gray-200">
+    `;
+
+    records.forEach(record => {
+      html += `
+        <tr>
+          <td class="px-6 py-4 whitespace-nowrap text-sm font-medium text-gray-900">${record.patient_id}</td>
+          <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${record.patient_name}</td>
+          <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${record.village}</td>
+          <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${new Date(record.prescription_date).toLocaleString()}</td>
+          <td class="px-6 py-4 whitespace-nowrap">
+            <span class="px-2 inline-flex text-xs leading-5 font-semibold rounded-full bg-green-100 text-green-800">
+              Prescribed
+            </span>
+          </td>
+          <td class="px-6 py-4 whitespace-nowrap text-sm font-medium">
+            <button class="text-blue-600 hover:text-blue-900 mr-3" onclick="window.doctorDashboard.viewPrescription('${record.id}')">
+              <i class="fas fa-eye mr-1"></i>View
+            </button>
+          </td>
+        </tr>
+      `;
+    });
+
+    html += `</tbody></table></div>`;
+    container.innerHTML = html;
+  }
+
+  async loadChatPatients() {
+    try {
+      const response = await fetch('/api/doctor/chat-patients');
+      if (!response.ok) throw new Error('Network error');
+
+      const patients = await response.json();
+      this.renderChatPatients(patients);
+    } catch (error) {
+      document.getElementById('chatPatientList').innerHTML = `
+        <div class="p-4 text-center">
+          <div class="bg-red-50 text-red-700 p-4 rounded-lg">
+            <i class="fas fa-exclamation-triangle mr-2"></i>
+            Failed to load chat patients. Please try again.
+          </div>
+        </div>
+      `;
+    }
+  }
+
+  renderChatPatients(patients) {
+    const container = document.getElementById('chatPatientList');
+
+    if (!patients || patients.length === 0) {
+      container.innerHTML = `
+        <div class="text-center py-12">
+          <i class="fas fa-users text-4xl text-gray-300 mb-4"></i>
+          <h3 class="text-xl font-semibold text-gray-600">No Chat Patients</h3>
+          <p class="text-gray-500 mt-2">When patients send messages, they will appear here.</p>
+        </div>
+      `;
+      return;
+    }
+
+    let html = '';
+    patients.forEach(patient => {
+      html += `
+        <div class="p-4 border-b border-gray-200 hover:bg-gray-50 cursor-pointer" 
+             onclick="window.doctorDashboard.selectChatPatient('${patient.patient_id}', '${patient.type}')" 
+             id="chat-patient-${patient.patient_id}">
+          <div class="font-bold text-gray-800">${patient.name}</div>
+          <div class="text-sm text-gray-600 mt-1">
+            ${patient.type === 'human' ? 'Human Patient' : 'Animal Patient'}
+            ${patient.village ? ` | ${patient.village}` : ''}
+          </div>
+          <div class="text-xs text-gray-500 mt-2">
+            Last activity: ${patient.last_message_time ? new Date(patient.last_message_time).toLocaleString() : 'No messages'}
+          </div>
+        </div>
+      `;
+    });
+
+    container.innerHTML = html;
+  }
+
+  selectChatPatient(patientId, patientType) {
+    this.currentChatPatient = patientId;
+
+    document.querySelectorAll('#chatPatientList > div').forEach(item => {
+      item.classList.remove('bg-blue-50');
+    });
+    document.getElementById(`chat-patient-${patientId}`).classList.add('bg-blue-50');
+
+    document.getElementById('currentChatPatient').textContent = `Chat with ${patientId}`;
+    document.getElementById('chatInput').classList.remove('hidden');
+
+    this.loadChatMessages(patientId);
+  }
+
+  startChatWithPatient(patientId, patientType) {
+    showSection('chat');
+    setTimeout(() => {
+      this.selectChatPatient(patientId, patientType);
+    }, 100);
+  }
+
+  async loadChatMessages(patientId) {
+    if (!patientId) return;
+
+    try {
+      const doctorId = DASHBOARD_CONFIG.doctorId;
+      const response = await fetch(`/api/chat/messages/${patientId}/${doctorId}`);
+      const result = await response.json();
+
+      if (result.success) {
+        this.renderChatMessages(result.messages);
+      }
+    } catch (error) {
+      console.error('Error loading messages:', error);
+    }
+  }
+
+  renderChatMessages(messages) {
+    const container = document.getElementById('chatMessages');
+
+    if (!messages || messages.length === 0) {
+      container.innerHTML = `
+        <div class="text-center py-12">
+          <i class="fas fa-comments text-4xl text-gray-300 mb-4"></i>
+          <h3 class="text-xl font-semibold text-gray-600">No messages yet</h3>
+          <p class="text-gray-500 mt-2">Start the conversation!</p>
+        </div>
+      `;
+      return;
+    }
+
+    let html = '';
+    messages.forEach(message => {
+      const messageClass = message.sender_type === 'doctor' ? 
+        'bg-blue-600 text-white ml-auto' : 
+        'bg-gray-200 text-gray-800 mr-auto';
+
+      const senderName = message.sender_type === 'doctor' ? 'You' : 'Patient';
+
+      html += `
+        <div class="mb-4">
+          <div class="max-w-xs md:max-w-md p-3 rounded-lg ${messageClass}">
+            <div class="font-medium">${senderName}</div>
+            <div class="mt-1">${message.content}</div>
+            <div class="text-xs mt-2 opacity-70">
+              ${new Date(message.timestamp).toLocaleString()}
+            </div>
+          </div>
+        </div>
+      `;
+    });
+
+    container.innerHTML = html;
+    container.scrollTop = container.scrollHeight;
+  }
+
+  async sendChatMessage() {
+    if (!this.currentChatPatient) return;
+
+    const messageInput = document.getElementById('messageInput');
+    const message = messageInput.value.trim();
+
+    if (!message) return;
+
+    try {
+      const doctorId = DASHBOARD_CONFIG.doctorId;
+      const response = await fetch('/api/chat/send', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          patient_id: this.currentChatPatient,
+          doctor_id: doctorId,
+          message: message,
+          sender_type: 'doctor'
+        })
+      });
+
+      const result = await response.json();
+
+      if (result.success) {
+        messageInput.value = '';
+        this.loadChatMessages(this.currentChatPatient);
+        this.loadChatPatients();
+      } else {
+        alert('Error sending message');
+      }
+    } catch (error) {
+      console.error('Error sending message:', error);
+      alert('Network error. Please try again.');
+    }
+  }
+
+  viewPrescription(recordId) {
+    // Implementation for viewing prescription details
+    alert('View prescription: ' + recordId);
+  }
+}
+
+function showSection(sectionName) {
+  // Hide all sections
+  document.querySelectorAll('#dashboard, #records, #chat').forEach(section => {
+    section.classList.remove('section-active');
+    section.classList.add('section-hidden');
+  });
+
+  // Show selected section
+  document.getElementById(sectionName).classList.remove('section-hidden');
+  document.getElementById(sectionName).classList.add('section-active');
+
+  // Update navigation tabs
+  document.querySelectorAll('[id^="nav-"]').forEach(nav => {
+    nav.classList.remove('nav-active');
+    nav.classList.add('text-gray-700', 'hover:bg-gray-100');
+  });
+
+  document.getElementById(`nav-${sectionName}`).classList.add('nav-active');
+  document.getElementById(`nav-${sectionName}`).classList.remove('text-gray-700', 'hover:bg-gray-100');
+}
+
+function loadDoctorRecords() {
+  window.doctorDashboard.loadDoctorRecords();
+}
+
+function loadChatPatients() {
+  window.doctorDashboard.loadChatPatients();
+}
+
+function startChatWithPatient(patientId) {
+  window.doctorDashboard.startChatWithPatient(patientId);
+}
+
+function sendChatMessage() {
+  window.doctorDashboard.sendChatMessage();
+}
+
+function confirmClear() {
+  if (confirm('Are you sure you want to clear ALL patient data? This action cannot be undone!')) {
+    fetch('/api/doctor/clear', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      }
+    }).then(response => {
+      if (response.ok) {
+        window.location.reload();
+      }
+    });
+  }
+}
+
+// Allow Enter key to send message
+document.addEventListener('DOMContentLoaded', () => {
+  const messageInput = document.getElementById('messageInput');
+  if (messageInput) {
+    messageInput.addEventListener('keypress', function(e) {
+      if (e.key === 'Enter' && !e.shiftKey) {
+        e.preventDefault();
+        sendChatMessage();
+      }
+    });
+  }
+});
+
+// Initialize dashboard
+document.addEventListener('DOMContentLoaded', () => {
+  window.doctorDashboard = new DoctorDashboard();
+});
@@ -0,0 +1,428 @@
+// Global variables
+let currentSection = 'dashboard';
+let socket = null;
+
+class VeterinarianDashboard {
+    constructor() {
+        this.currentChatOwner = null;
+        this.init();
+    }
+
+    init() {
+        this.connectSocket();
+        this.loadVeterinarianRecords();
+        this.loadChatOwners();
+
+        // Auto-refresh every 30 seconds
+        setInterval(() => {
+            if (currentSection === 'dashboard') {
+                this.refreshAnimalList();
+            }
+            if (this.currentChatOwner) {
+                this.loadChatMessages(this.currentChatOwner);
+            }
+        }, 30000);
+    }
+
+    connectSocket() {
+        socket = io();
+
+        socket.on('connect', () => {
+            console.log('🔌 Connected to server');
+            socket.emit('join_veterinarians_room');
+            if (this.feed) this.feed.sync();
+        });
+
+        if (DASHBOARD_CONFIG.changeSeq !== null) {
+            this.feed = new ChangeFeed({
+                stream: 'animals',
+                seq: DASHBOARD_CONFIG.changeSeq,
+                container: document.getElementById('animals-container'),
+                socket: socket,
+                newestFirst: true,
+                interval: 0,
+                onChange: (count) => this.updateAnimalCount(count)
+            });
+        }
+
+        socket.on('new_animal_patient_notification', (data) => {
+            console.log('🆕 New animal notification:', data);
+            this.showNewAnimalNotification(data);
+            this.refreshAnimalList();
+        });
+
+        socket.on('new_animal_patient_alert', (data) => {
+            console.log('🐾 New animal alert:', data);
+            this.showNewAnimalNotification(data);
+            this.refreshAnimalList();
+        });
+    }
+
+    showNewAnimalNotification(data) {
+        // Create notification
+        const notification = document.createElement('div');
+        notification.className = 'fixed top-4 right-4 bg-green-500 text-white p-4 rounded-lg shadow-lg z-50 animate-bounce';
+        notification.innerHTML = `
+            <div class="flex items-center">
+                <i class="fas fa-paw mr-2"></i>
+                <div>
+                    <strong>New Animal Patient!</strong>
+                    <div class="text-sm">${data.animal_name} (${data.animal_type})</div>
+                </div>
+            </div>
+        `;
+        document.body.appendChild(notification);
+
+        // Remove notification after 5 seconds
+        setTimeout(() => {
+            notification.remove();
+        }, 5000);
+    }
+
+    async refreshAnimalList() {
+        // Only the cards changed since the page was rendered are fetched
+        if (this.feed) {
+            return this.feed.sync();
+        }
+    }
+
+    updateAnimalCount(count) {
+        const countElement = document.getElementById('animal-count');
+        if (countElement) {
+            countElement.textContent = count;
+        }
+    }
+
+    async loadVeterinarianRecords() {
+        try {
+            const response = await fetch('/api/doctor/records');
+            if (!response.ok) throw new Error('Network error');
+
+            const records = await response.json();
+            this.renderVeterinarianRecords(records);
+        } catch (error) {
+            document.getElementById('veterinarianRecords').innerHTML = `
+                <div class="p-6 text-center">
+                    <div class="bg-red-50 text-red-700 p-4 rounded-lg">
+                        <i class="fas fa-exclamation-triangle mr-2"></i>
+                        Failed to load prescription records. Please try again.
+                    </div>
+                </div>
+            `;
+        }
+    }
+
+    renderVeterinarianRecords(records) {
+        const container = document.getElementById('veterinarianRecords');
+
+        if (!records || records.length === 0) {
+            container.innerHTML = `
+                <div class="text-center py-12">
+                    <i class="fas fa-file-medical text-4xl text-gray-300 mb-4"></i>
+                    <h3 class="text-xl font-semibold text-gray-600">No Prescription Records</h3>
+                    <p class="text-gray-500 mt-2">Your prescription records will appear here.</p>
+                </div>
+            `;
+            return;
+        }
+
+        let html = `
+            <div class="overflow-x-auto">
+                <table class="w-full">
+                    <thead class="bg-gray-50">
+                        <tr>
+                            <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Animal ID</th>
+                            <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Animal Name</th>
+                            <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Owner Name</th>
+                            <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Village</th>
+                            <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Prescription Date</th>
+                            <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Status</th>
+                            <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Actions</th>
+                        </tr>
+                    </thead>
+                    <tbody class="bg-white divide-y divide-gray-200">
+        `;
+
+        records.forEach(record => {
+            html += `
+                <tr>
+                    <td class="px-6 py-4 whitespace-nowrap text-sm font-medium text-gray-900">${record.patient_id}</td>
+                    <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${record.patient_name}</td>
+                    <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${record.owner_name || 'N/A'}</td>
+                    <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${record.village}</td>
+                    <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${new Date(record.prescription_date).toLocaleString()}</td>
+                    <td class="px-6 py-4 whitespace-nowrap">
+                        <span class="px-2 inline-flex text-xs leading-5 font-semibold rounded-full bg-green-100 text-green-800">
+                            Prescribed
+                        </span>
+                    </td>
+                    <td class="px-6 py-4 whitespace-nowrap text-sm font-medium">
+                        <button class="text-green-600 hover:text-green-900 mr-3" onclick="window.veterinarianDashboard.viewPrescription('${record.id}')">
+                            <i class="fas fa-eye mr-1"></i>View
+                        </button>
+                    </td>
+                </tr>
+            `;
+        });
+
+        html += `</tbody></table></div>`;
+        container.innerHTML = html;
+    }
+
+    async loadChatOwners() {
+        try {
+            const response = await fetch('/api/veterinarian/chat-animals');
+            if (!response.ok) throw new Error('Network error');
+
+            const owners = await response.json();
+            this.renderChatOwners(owners);
+        } catch (error) {
+            document.getElementById('chatOwnerList').innerHTML = `
+                <div class="p-4 text-center">
+                    <div class="bg-red-50 text-red-700 p-4 rounded-lg">
+                        <i class="fas fa-exclamation-triangle mr-2"></i>
+                        Failed to load animal owners. Please try again.
+                    </div>
+                </div>
+            `;
+        }
+    }
+
+    renderChatOwners(owners) {
+        const container = document.getElementById('chatOwnerList');
+
+        if (!owners || owners.length === 0) {
+            container.innerHTML = `
+                <div class="text-center py-12">
+                    <i class="fas fa-users text-4xl text-gray-300 mb-4"></i>
+                    <h3 class="text-xl font-semibold text-gray-600">No Chat Owners</h3>
+                    <p class="text-gray-500 mt-2">When animal owners send messages, they will appear here.</p>
+                </div>
+            `;
+            return;
+        }
+
+        let html = '';
+        owners.forEach(owner => {
+            html += `
+                <div class="p-4 border-b border-gray-200 hover:bg-gray-50 cursor-pointer" 
+                     onclick="window.veterinarianDashboard.selectChatOwner('${owner.id}')" 
+                     id="chat-owner-${owner.id}">
+                    <div class="font-bold text-gray-800">${owner.name}</div>
+                    <div class="text-sm text-gray-600 mt-1">
+                        ${owner.type === 'animal' ? 'Animal Patient' : 'Human Patient'}
+                        ${owner.village ? ` | Village: ${owner.village}` : ''}
+                    </div>
+                    <div class="text-xs text-gray-500 mt-2">
+                        Last message: ${owner.last_message ? owner.last_message.substring(0, 50) + '...' : 'No messages yet'}
+                    </div>
+                </div>
+            `;
+        });
+
+        container.innerHTML = html;
+    }
+
+    selectChatOwner(animalId) {
+        this.currentChatOwner = animalId;
+
+        document.querySelectorAll('#chatOwnerList > div').forEach(item => {
+            item.classList.remove('bg-green-50');
+        });
+        document.getElementById(`chat-owner-${animalId}`).classList.add('bg-green-50');
+
+        document.getElementById('currentChatOwner').textContent = `Chat with ${animalId}`;
+        document.getElementById('chatInput').classList.remove('hidden');
+
+        this.loadChatMessages(animalId);
+    }
+
+    startChatWithOwner(animalId) {
+        showSection('chat');
+        setTimeout(() => {
+            this.selectChatOwner(animalId);
+        }, 100);
+    }
+
+    async loadChatMessages(animalId) {
+        if (!animalId) return;
+
+        try {
+            const veterinarianId = DASHBOARD_CONFIG.doctorId;
+            const response = await fetch(`/api/chat/messages/${animalId}/${veterinarianId}`);
+            const result = await response.json();
+
+            if (result.success) {
+                this.renderChatMessages(result.messages);
+            }
+        } catch (error) {
+            console.error('Error loading messages:', error);
+        }
+    }
+
+    renderChatMessages(messages) {
+        const container = document.getElementById('chatMessages');
+
+        if (!messages || messages.length === 0) {
+            container.innerHTML = `
+                <div class="text-center py-12">
+                    <i class="fas fa-comments text-4xl text-gray-300 mb-4"></i>
+                    <h3 class="text-xl font-semibold text-gray-600">No messages yet</h3>
+                    <p class="text-gray-500 mt-2">Start the conversation!</p>
+                </div>
+            `;
+            return;
+        }
+
+        let html = '';
+        messages.forEach(message => {
+            const messageClass = message.sender_type === 'veterinarian' || message.sender_type === 'doctor' ? 
+                'bg-green-600 text-white ml-auto' : 
+                'bg-gray-200 text-gray-800 mr-auto';
+
+            const senderName = (message.sender_type === 'veterinarian' || message.sender_type === 'doctor') ? 'You' : 'Owner';
+
+            html += `
+                <div class="mb-4">
+                    <div class="max-w-xs md:max-w-md p-3 rounded-lg ${messageClass}">
+                        <div class="font-medium">${senderName}</div>
+                        <div class="mt-1">${message.content}</div>
+                        <div class="text-xs mt-2 opacity-70">
+                            ${new Date(message.timestamp).toLocaleString()}
+                        </div>
+                    </div>
+                </div>
+            `;
+        });
+
+        container.innerHTML = html;
+        container.scrollTop = container.scrollHeight;
+    }
+
+    async sendChatMessage() {
+        if (!this.currentChatOwner) return;
+
+        const messageInput = document.getElementById('messageInput');
+        const message = messageInput.value.trim();
+
+        if (!message) return;
+
+        try {
+            const veterinarianId = DASHBOARD_CONFIG.doctorId;
+            const response = await fetch('/api/chat/send', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    patient_id: this.currentChatOwner,
+                    doctor_id: veterinarianId,
+                    message: message,
+                    sender_type: 'doctor'
+                })
+            });
+
+            const result = await response.json();
+
+            if (result.success) {
+                messageInput.value = '';
+                this.loadChatMessages(this.currentChatOwner);
+                this.loadChatOwners();
+            } else {
+                alert('Error sending message');
+            }
+        } catch (error) {
+            console.error('Error sending message:', error);
+            alert('Network error. Please try again.');
+        }
+    }
+
+    viewPrescription(recordId) {
+        // Implementation for viewing prescription details
+        alert('View prescription: ' + recordId);
+    }
+}
+
+function showSection(sectionName) {
+    currentSection = sectionName;
+
+    // Hide all sections
+    document.querySelectorAll('#dashboard, #records, #chat').forEach(section => {
+        section.classList.remove('section-active');
+        section.classList.add('section-hidden');
+    });
+
+    // Show selected section
+    document.getElementById(sectionName).classList.remove('section-hidden');
+    document.getElementById(sectionName).classList.add('section-active');
+
+    // Update navigation tabs
+    document.querySelectorAll('[id^="nav-"]').forEach(nav => {
+        nav.classList.remove('nav-active');
+        nav.classList.add('text-gray-700', 'hover:bg-gray-100');
+    });
+
+    document.getElementById(`nav-${sectionName}`).classList.add('nav-active');
+    document.getElementById(`nav-${sectionName}`).classList.remove('text-gray-700', 'hover:bg-gray-100');
+}
+
+function refreshDashboard() {
+    window.location.reload();
+}
+
+function loadVeterinarianRecords() {
+    window.veterinarianDashboard.loadVeterinarianRecords();
+}
+
+function loadChatOwners() {
+    window.veterinarianDashboard.loadChatOwners();
+}
+
+function startChatWithOwner(animalId) {
+    window.veterinarianDashboard.startChatWithOwner(animalId);
+}
+
+function sendChatMessage() {
+    window.veterinarianDashboard.sendChatMessage();
+}
+
+// FIXED: Clear animals function
+function confirmClearAnimals() {
+    if (confirm('Are you sure you want to clear ALL animal data? This action cannot be undone!')) {
+        fetch('/api/veterinarian/clear', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            }
+        }).then(response => {
+            if (response.ok) {
+                window.location.reload();
+            } else {
+                alert('Error clearing animal data');
+            }
+        }).catch(error => {
+            alert('Network error: ' + error);
+        });
+    }
+}
+
+// Allow Enter key to send message
+document.addEventListener('DOMContentLoaded', () => {
+    const messageInput = document.getElementById('messageInput');
+    if (messageInput) {
+        messageInput.addEventListener('keypress', function(e) {
+            if (e.key === 'Enter' && !e.shiftKey) {
+                e.preventDefault();
+                sendChatMessage();
+            }
+        });
+    }
+
+    // Update last updated time
+    document.getElementById('last-updated').textContent = new Date().toLocaleString();
+});
+
+// Initialize dashboard
+document.addEventListener('DOMContentLoaded', () => {
+    window.veterinarianDashboard = new VeterinarianDashboard();
+});
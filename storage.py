@@ -0,0 +1,397 @@
+import os
+import tempfile
+import threading
+import time
+from types import MappingProxyType
+
+import config
+import serialization
+
+try:
+    import fcntl
+except ImportError:  # Windows kiosks
+    fcntl = None
+    import msvcrt
+
+VERSION_WIDTH = 20
+
+# os.umask() can only be read by setting it, which is not thread-safe, so read it once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class StoreError(Exception):
+    """Base class for record store failures"""
+
+
+class StoreCorrupt(StoreError):
+    """The store file exists but could not be decoded"""
+
+
+class StoreConflict(StoreError):
+    """The store changed between reading a snapshot and saving it"""
+
+
+class FileLock:
+    """Exclusive inter-process lock backed by a sidecar ``.lock`` file.
+
+    The lock file also holds the store's version counter, so readers can
+    check the version without taking the lock.
+    """
+
+    _instances = {}
+    _registry_lock = threading.Lock()
+    # Per thread: how many FileLocks are held and what waits for them all to be released
+    _local = threading.local()
+
+    @classmethod
+    def for_path(cls, path):
+        """One shared lock object per file, so nested use in a thread is safe"""
+        key = os.path.abspath(path)
+        with cls._registry_lock:
+            lock = cls._instances.get(key)
+            if lock is None:
+                lock = cls._instances[key] = cls(path)
+            return lock
+
+    @classmethod
+    def defer(cls, callback):
+        """Run ``callback()`` once this thread holds no FileLock, right away if it holds none now.
+
+        For slow follow-up work of a commit (other databases, sockets) that
+        must not keep every other writer waiting.
+        """
+        if getattr(cls._local, 'held', 0):
+            cls._local.deferred.append(callback)
+        else:
+            callback()
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._handle = None
+        self._depth = 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            handle = open(self.path, 'a+b')
+            try:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            except Exception:
+                handle.close()
+                self._thread_lock.release()
+                raise
+            self._handle = handle
+        self._depth += 1
+        local = FileLock._local
+        if not getattr(local, 'held', 0):
+            local.held, local.deferred = 0, []
+        local.held += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            handle, self._handle = self._handle, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                handle.close()
+        self._thread_lock.release()
+        local = FileLock._local
+        local.held -= 1
+        if local.held == 0 and local.deferred:
+            deferred, local.deferred = local.deferred, []
+            for callback in deferred:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"❌ Deferred work after {self.path} failed: {e}")
+
+    def read_version(self):
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read(VERSION_WIDTH)
+            return int(raw) if raw.strip() else 0
+        except (OSError, ValueError):
+            return 0
+
+    def write_version(self, version):
+        """Must be called while holding the lock"""
+        with open(self.path, 'r+b') as f:
+            f.write(str(version).rjust(VERSION_WIDTH).encode('ascii'))
+            f.flush()
+
+
+class VersionCounter:
+    """Cross-process version number for data kept outside a JsonStore,
+    such as SQLite tables. Stored in a ``.lock`` file like store versions.
+    """
+
+    def __init__(self, path):
+        self.lock = FileLock.for_path(path)
+
+    @property
+    def value(self):
+        return self.lock.read_version()
+
+    def bump(self):
+        with self.lock:
+            version = self.lock.read_version() + 1
+            self.lock.write_version(version)
+            return version
+
+    def last_modified(self):
+        try:
+            return os.stat(self.lock.path).st_mtime
+        except OSError:
+            return None
+
+
+def _file_mode(path):
+    """Permissions for a rewrite of ``path``: its current mode, or what open() would give a new file"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write(path, payload):
+    """Write bytes to a temp file, fsync it and rename it over ``path``.
+
+    A crash at any point leaves either the old or the new file, never a
+    truncated one. The file keeps its permissions rather than taking the
+    temp file's owner-only mode.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class JsonStore:
+    """A dict-of-records file with crash-safe, versioned writes.
+
+    Readers never lock: every save replaces the file atomically, so a read
+    always sees a complete snapshot. Writers use optimistic concurrency via
+    ``update()``: the mutation is applied to a snapshot and only committed
+    if nobody else saved in between, otherwise it is re-applied to the
+    fresh data.
+
+    Files are written with ``codec`` (see serialization.py) and read back
+    in whatever format they were written in. With a ``record_class`` (see
+    records.py) the store also keeps the decoded population in memory as
+    typed records, refreshed only when the file changes.
+    """
+
+    def __init__(self, path, codec=None, record_class=None, max_retries=5):
+        self.path = path
+        self.codec = serialization.get_codec(codec or config.STORE_CODEC)
+        self.record_class = record_class
+        self.max_retries = max_retries
+        self.lock = FileLock.for_path(path + '.lock')
+        self._cache_lock = threading.Lock()
+        self._cache_signature = None
+        self._cache = MappingProxyType({})
+        self._listeners = []
+        # Optional ``timer(store, operation, seconds)`` for 'load', 'build' and 'save'
+        self.timer = None
+
+    def add_listener(self, listener):
+        """Call ``listener(store, keys, data)`` after every commit in this process.
+
+        ``keys`` is the tuple of record ids that changed, or None when the
+        whole store was replaced. ``data`` is the dict just written, so a
+        listener needing the new records reads them from it instead of
+        reloading the store while the lock is still held.
+        """
+        self._listeners.append(listener)
+
+    @property
+    def version(self):
+        return self.lock.read_version()
+
+    def signature(self):
+        """Cheap change token: the version counter plus the file's identity"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return (self.version, None)
+        return (self.version, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def last_modified(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def records(self):
+        """Return a read-only ``{id: record}`` mapping of typed records.
+
+        The mapping is shared between callers and rebuilt only when the
+        store's signature changes; never mutate the records it holds.
+        """
+        signature = self.signature()
+        if signature == self._cache_signature:
+            return self._cache
+        with self._cache_lock:
+            if signature != self._cache_signature:
+                try:
+                    data = self.read()
+                except StoreError as e:
+                    print(f"❌ Error loading {self.path}: {e}")
+                    return MappingProxyType({})
+                started = time.perf_counter()
+                from_dict = self.record_class.from_dict
+                population = {}
+                for key, value in data.items():
+                    record = from_dict(value)
+                    # Share one string between the mapping key and the record id
+                    population[record.key if record.key == key else key] = record
+                self._cache = MappingProxyType(population)
+                self._cache_signature = signature
+                if self.timer is not None:
+                    self.timer(self, 'build', time.perf_counter() - started)
+            return self._cache
+
+    def read(self):
+        """Return the stored records, raising StoreError if they cannot be read"""
+        if not os.path.exists(self.path):
+            return {}
+        started = time.perf_counter()
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+        except OSError as e:
+            raise StoreError(f"Cannot read {self.path}: {e}")
+        if not raw.strip():
+            raise StoreCorrupt(f"{self.path} is empty")
+        try:
+            data = serialization.decode(raw)
+        except ValueError as e:
+            raise StoreCorrupt(f"{self.path} cannot be decoded: {e}")
+        if not isinstance(data, dict):
+            raise StoreCorrupt(f"{self.path} does not contain an object")
+        if self.timer is not None:
+            self.timer(self, 'load', time.perf_counter() - started)
+        return data
+
+    def snapshot(self):
+        """Return ``(version, data)`` without taking the lock"""
+        version = self.version
+        return version, self.read()
+
+    def load(self, default=None):
+        """Return the stored records, or ``default`` ({}) if unreadable"""
+        try:
+            return self.read()
+        except StoreError as e:
+            print(f"❌ Error loading {self.path}: {e}")
+            return {} if default is None else default
+
+    def _commit(self, data, changed):
+        started = time.perf_counter()
+        payload = self.codec.encode(data)
+        atomic_write(self.path, payload)
+        version = self.lock.read_version() + 1
+        self.lock.write_version(version)
+        if self.timer is not None:
+            self.timer(self, 'save', time.perf_counter() - started)
+        for listener in self._listeners:
+            try:
+                listener(self, changed, data)
+            except Exception as e:
+                print(f"❌ Store listener failed for {self.path}: {e}")
+        return version
+
+    def save(self, data, expected_version=None, changed=None):
+        """Replace the whole store; returns the new version.
+
+        With ``expected_version`` the save fails with StoreConflict if
+        another writer committed since that version was read. ``changed``
+        names the record ids that differ, for listeners.
+        """
+        with self.lock:
+            if expected_version is not None and self.lock.read_version() != expected_version:
+                raise StoreConflict(f"{self.path} changed since version {expected_version}")
+            return self._commit(data, changed)
+
+    def update(self, mutate, changed=None):
+        """Apply ``mutate(data)`` and commit it without losing concurrent writes.
+
+        ``mutate`` edits the dict in place and may return a value, which is
+        passed back to the caller. It can be called more than once, so it
+        must not have side effects outside the data it is given. Raises
+        StoreCorrupt instead of overwriting a file that cannot be read.
+        ``changed`` is passed on to listeners (None means "anything").
+        """
+        for _ in range(self.max_retries):
+            version, data = self.snapshot()
+            result = mutate(data)
+            try:
+                self.save(data, expected_version=version, changed=changed)
+                return result
+            except StoreConflict:
+                continue
+        # Heavily contended: fall back to doing the read-modify-write under the lock
+        with self.lock:
+            data = self.read()
+            result = mutate(data)
+            self._commit(data, changed)
+            return result
+
+    def put(self, key, record):
+        def apply(data):
+            data[key] = record
+        self.update(apply, changed=(key,))
+
+    def patch(self, key, changes):
+        """Merge ``changes`` into one record; returns False if it does not exist"""
+        def apply(data):
+            if key not in data:
+                return False
+            data[key].update(changes)
+            return True
+        return self.update(apply, changed=(key,))
+
+    def delete(self, key):
+        """Remove one record; returns False if it did not exist"""
+        def apply(data):
+            return data.pop(key, None) is not None
+        return self.update(apply, changed=(key,))
+
+    def clear(self):
+        with self.lock:
+            self._commit({}, None)
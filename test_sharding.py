@@ -0,0 +1,58 @@
+from records import Patient
+from sharding import ShardedStore
+
+CITIES = ('Koppal', 'Hubli')
+
+
+def patient(n, city=None):
+    return {'id': f'p{n}', 'name': f'Patient {n}', 'city': city or CITIES[n % 2],
+            'submission_date': f'2024-01-01 10:{n:02d}:00'}
+
+
+def make_store(tmp_path, count=8):
+    store = ShardedStore(str(tmp_path / 'patients_shards'), 'city', record_class=Patient)
+    for n in range(count):
+        store.put(f'p{n}', patient(n))
+    return store
+
+
+def in_order(count=8):
+    return [f'p{n}' for n in range(count)]
+
+
+def test_records_are_oldest_first_across_regions(tmp_path):
+    store = make_store(tmp_path)
+    assert list(store.records()) == in_order()
+    assert list(store.search(lambda key, record: True)) == in_order()
+
+
+def test_update_keeps_submission_order(tmp_path):
+    store = make_store(tmp_path)
+
+    def touch(data):
+        for record in data.values():
+            record['person_id'] = 'person-' + record['id']
+
+    store.update(touch, changed=in_order())
+    assert list(store.records()) == in_order()
+    assert list(store.records('Koppal')) == ['p0', 'p2', 'p4', 'p6']
+    store.update(touch)
+    assert list(store.records()) == in_order()
+
+
+def test_move_keeps_submission_order(tmp_path):
+    store = make_store(tmp_path)
+    store.put('p2', patient(2, 'Hubli'))
+    assert store.locate('p2') == 'hubli'
+    assert list(store.records('Hubli')) == ['p1', 'p2', 'p3', 'p5', 'p7']
+    assert list(store.records()) == in_order()
+    assert store.patch('p4', {'city': 'Hubli'})
+    assert list(store.records('Hubli')) == ['p1', 'p2', 'p3', 'p4', 'p5', 'p7']
+    assert list(store.records()) == in_order()
+
+
+def test_patch_in_place_and_missing(tmp_path):
+    store = make_store(tmp_path)
+    assert store.patch('p3', {'name': 'Renamed'})
+    assert store.records()['p3'].get('name') == 'Renamed'
+    assert not store.patch('missing', {'name': 'Nobody'})
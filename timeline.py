@@ -0,0 +1,114 @@
+"""One patient's (or animal's) history as a single stream, newest first.
+
+Three sources are read for a record id, each already in time order:
+
+    submission    the record itself (JSON store or archive), one event
+    prescription  doctor_records rows, by (patient_id, prescription_date, id)
+    message       chat messages, by (patient_id, timestamp, id)
+
+Each SQL source reads at most ``limit + 1`` rows older than the cursor
+straight off its index, and heapq.merge interleaves them lazily, so a
+page costs a few index range scans whatever the length of the history.
+Events sort by (time, kind, id); the cursor is the last event's key, so
+a page boundary between events stamped in the same second loses nothing.
+
+Times are UTC, as SQLite's CURRENT_TIMESTAMP writes them; submission
+dates are stored in local time and converted.
+"""
+import heapq
+from datetime import datetime, timezone
+from itertools import islice
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Order of kinds stamped in the same second: a chat follows the prescription that follows a submission
+RANK = {'submission': 0, 'prescription': 1, 'message': 2}
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def local_to_utc(text):
+    try:
+        return datetime.strptime(text, TIME_FORMAT).astimezone(timezone.utc).strftime(TIME_FORMAT)
+    except (TypeError, ValueError):
+        return text or ''
+
+
+def sort_key(event):
+    return event['time'], RANK[event['type']], event['id']
+
+
+def encode_cursor(event):
+    return f"{event['time']}|{event['type']}|{event['id']}"
+
+
+def decode_cursor(text):
+    """``(time, kind, id)`` from encode_cursor(); None for the first page. Raises ValueError"""
+    if not text:
+        return None
+    time, kind, event_id = text.rsplit('|', 2)
+    if kind not in RANK:
+        raise ValueError(f"unknown event type {kind}")
+    return time, kind, int(event_id) if kind != 'submission' else event_id
+
+
+def older_than(kind, cursor, column):
+    """SQL condition and params keeping a source's rows older than ``cursor`` (indexable)"""
+    if cursor is None:
+        return '', ()
+    time, cursor_kind, cursor_id = cursor
+    if RANK[kind] < RANK[cursor_kind]:
+        return f' AND {column} <= ?', (time,)
+    if RANK[kind] > RANK[cursor_kind]:
+        return f' AND {column} < ?', (time,)
+    return f' AND ({column}, id) < (?, ?)', (time, cursor_id)
+
+
+def submissions(kind, record, archived, cursor):
+    event = {
+        'type': 'submission', 'id': record[record.KEY], 'time': local_to_utc(record.get('submission_date')),
+        'status': record.get('status', ''), 'symptoms': record.get('symptoms', ''), 'archived': archived,
+    }
+    if kind == 'animal':
+        event.update(condition=record.get('condition', ''), owner_name=record.get('owner_name', ''))
+    else:
+        event.update({name: record.get(name, '') for name in ('bp', 'sugar', 'oxygen', 'weight')})
+    if cursor is None or sort_key(event) < (cursor[0], RANK[cursor[1]], cursor[2]):
+        yield event
+
+
+def prescriptions(conn, record_id, cursor, limit):
+    bound, params = older_than('prescription', cursor, 'prescription_date')
+    rows = conn.execute(f'''
+        SELECT id, doctor_id, prescription_date, prescription FROM doctor_records
+        WHERE patient_id = ?{bound} ORDER BY prescription_date DESC, id DESC LIMIT ?
+    ''', (record_id,) + params + (limit,))
+    for row in rows:
+        yield {'type': 'prescription', 'id': row['id'], 'time': row['prescription_date'],
+               'doctor_id': row['doctor_id'], 'legacy_text': row['prescription']}
+
+
+def messages(conn, record_id, cursor, limit):
+    bound, params = older_than('message', cursor, 'timestamp')
+    rows = conn.execute(f'''
+        SELECT id, doctor_id, timestamp, content, sender_type, image_data IS NOT NULL AS has_image FROM messages
+        WHERE patient_id = ?{bound} ORDER BY timestamp DESC, id DESC LIMIT ?
+    ''', (record_id,) + params + (limit,))
+    for row in rows:
+        yield {'type': 'message', 'id': row['id'], 'time': row['timestamp'], 'doctor_id': row['doctor_id'],
+               'sender_type': row['sender_type'], 'content': row['content'], 'has_image': bool(row['has_image'])}
+
+
+def page(conn, kind, record, archived=False, cursor=None, limit=DEFAULT_LIMIT):
+    """``(events, next cursor or None)``; prescription events still need their text filled in"""
+    record_id = record[record.KEY]
+    # One row past the page from every source tells whether another page exists
+    merged = heapq.merge(
+        submissions(kind, record, archived, cursor),
+        prescriptions(conn, record_id, cursor, limit + 1),
+        messages(conn, record_id, cursor, limit + 1),
+        key=sort_key, reverse=True)
+    events = list(islice(merged, limit + 1))
+    if len(events) > limit:
+        events = events[:limit]
+        return events, encode_cursor(events[-1])
+    return events, None